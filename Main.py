@@ -1,13 +1,22 @@
 # app.py
 import streamlit as st
-import random
-import tempfile
 import os
-import speech_recognition as sr
-from gtts import gTTS
 import datetime
 import json
 import textwrap
+from result_cache import get_cache
+from upload_ingest import session_ingest
+from workspace import QuotaExceeded
+from admission import admit, trim_notice, AdmissionError
+from vad import pace_metrics
+from analysis import analyze_audio_file, audio_key
+from jobs import get_job_manager, poll_job, JobQueueFull
+from fillers import find_fillers
+from feedback_engine import render as render_feedback, phrases
+import resources
+from tts import render_report, prerender, TTSError
+from voice_stream import start_stream, get_stream, play, voice_server, STREAM_FORMAT
+from audio_extract import AudioExtractError
 
 # -----------------------------
 # APP CONFIG
@@ -75,103 +84,45 @@ if not st.session_state.logged_in:
 # -----------------------------
 if "results" not in st.session_state:
     st.session_state.results = None
-if "voice_file" not in st.session_state:
-    st.session_state.voice_file = None
+if "voice_clip" not in st.session_state:
+    st.session_state.voice_clip = None  # (bytes, format) of the current report's voice feedback
+if "voice_stream" not in st.session_state:
+    st.session_state.voice_stream = None  # id of the voice_stream playing it
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+if "audio_result" not in st.session_state:
+    st.session_state.audio_result = None
 
 # -----------------------------
-# NATURAL FEEDBACK TEMPLATES
-# (varied, human-like sentences)
+# NATURAL FEEDBACK
+# Phrases live in feedback_engine's "coach" pack; every sentence it can produce
+# has its voice clip rendered (and encoded for streaming) once per server
+# process in the background and reused by every report
 # -----------------------------
-POSITIVE_PHRASES = [
-    "Great delivery — your pace felt natural and easy to follow.",
-    "Nice clarity — your words came across clearly and confidently.",
-    "Good energy — you sounded engaged and present.",
-    "Strong vocabulary — your word choice was appropriate and effective.",
-    "Clear openings and closings — good structure in your speech."
-]
-
-NEGATIVE_PHRASES = [
-    "Try slowing down a bit — a calmer pace will improve clarity.",
-    "You used some filler words (like 'um' and 'so') — try to reduce them.",
-    "Work on voice modulation — the tone was a bit flat in parts.",
-    "Some words were unclear — focus on crisp pronunciation for tricky words.",
-    "Add a touch more energy at key moments to keep the audience engaged."
-]
-
-GRAMMAR_TIPS = [
-    "Watch verb tenses — keep them consistent across sentences.",
-    "Break long sentences into two for better clarity.",
-    "Use active voice when possible to make sentences stronger."
-]
-
-PRONUNCIATION_TIPS = [
-    "Practice the pronunciation of multi-syllable words slowly.",
-    "Record and match your pronunciation to native examples.",
-    "Control your mouth openings on long vowel sounds."
-]
-
-ACTIONABLE_TIPS = [
-    "Try a short daily practice: read 2 minutes aloud and record once a day.",
-    "Use pauses intentionally — count a silent 1–2 seconds between ideas.",
-    "Practice tongue twisters to improve articulation and clarity."
-]
-
-# Helper to produce human-like paragraph with varied phrasing
-def build_natural_feedback(transcript, mood_score=0.5):
-    # mood_score 0..1 where >0.5 = more positive
-    positives = random.sample(POSITIVE_PHRASES, k=2)
-    negatives = random.sample(NEGATIVE_PHRASES, k=2)
-    grammar = random.choice(GRAMMAR_TIPS)
-    pron = random.choice(PRONUNCIATION_TIPS)
-    action = random.choice(ACTIONABLE_TIPS)
-
-    # Compose several sentences, vary order randomly
-    parts = []
-    if mood_score >= 0.5:
-        parts += positives
-        parts += [f"One quick note: {random.choice(NEGATIVE_PHRASES)}"]
-    else:
-        parts += negatives
-        parts += [f"A strength: {random.choice(POSITIVE_PHRASES)}"]
-
-    parts += [
-        f"Grammar suggestion: {grammar}.",
-        f"Pronunciation suggestion: {pron}.",
-        f"Practice tip: {action}."
-    ]
-
-    # Add a short summary sentence
-    summary = "Overall, you're on the right path — a few focused practices will make your delivery stand out."
-    parts.append(summary)
-
-    # Make it natural-looking paragraph(s)
-    paragraph = " ".join(parts)
-    # Make transcript-aware: if transcript short, shorten feedback
-    if len(transcript.split()) < 8:
-        short_feedback = random.choice(positives + negatives)
-        return short_feedback + " " + random.choice(ACTIONABLE_TIPS)
-    return paragraph
-
-# -----------------------------
-# Speech to text (Google SR)
-# -----------------------------
-def speech_to_text(audio_path):
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_path) as source:
-        audio = recognizer.record(source)
-    try:
-        text = recognizer.recognize_google(audio)
-        return text
-    except Exception as e:
-        return ""  # blank string if not recognized
-
-# -----------------------------
-# Utilities: save upload to temp file
-# -----------------------------
-def save_temp_file(uploaded_file, suffix):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(uploaded_file.read())
-        return tmp.name
+FEEDBACK_SENTENCES = phrases("coach")
+resources.register("feedback_voice", lambda: prerender(FEEDBACK_SENTENCES, fmt=STREAM_FORMAT))
+resources.get("feedback_voice")
+
+
+def voice_clip(text):
+    # (bytes, format) of the report's whole voice clip, kept for reruns: taken
+    # from its voice stream once that has finished, else rendered here from the
+    # cached sentence clips as a single MP3 (WAV if ffmpeg can't encode)
+    if st.session_state.voice_clip is None:
+        stream = get_stream(st.session_state.voice_stream)
+        data = stream.data(timeout=60) if stream is not None else b""
+        if data:
+            st.session_state.voice_clip = (data, stream.fmt)
+            return st.session_state.voice_clip
+        try:
+            try:
+                st.session_state.voice_clip = (render_report(text, fmt="mp3"), "mp3")
+            except AudioExtractError:
+                st.session_state.voice_clip = (render_report(text), "wav")
+        except (TTSError, AudioExtractError):
+            st.session_state.voice_clip = (b"", "")
+            st.warning("Voice feedback is unavailable right now.")
+    return st.session_state.voice_clip
 
 # -----------------------------
 # UI: Menu
@@ -202,48 +153,88 @@ elif menu == "Audio Analysis":
         run_btn = st.button("Run Analysis")
 
         if run_btn:
-            with st.spinner("Transcribing and generating feedback..."):
-                # Save file
-                ext = ".wav" if uploaded.name.lower().endswith(".wav") else ".mp3"
-                temp_path = save_temp_file(uploaded, suffix=ext)
+            # Decoding + transcription run as a background job so this session stays
+            # responsive; a cached result for the same bytes is used straight away
+            ext = ".wav" if uploaded.name.lower().endswith(".wav") else ".mp3"
+            try:
+                # duration is read from the file header; overlong recordings are cut before decoding
+                upload, clip = admit(session_ingest(st.session_state, uploaded, suffix=ext))
+            except (AdmissionError, QuotaExceeded) as e:
+                st.error(str(e))
+                st.stop()
+            if trim_notice(clip):
+                st.warning(trim_notice(clip))
+            st.session_state.results = None
+            st.session_state.job_speaker = speaker_name
+            cached = get_cache().get(audio_key(upload.digest))
+            if cached is not None:
+                st.session_state.audio_result = cached
+            else:
+                try:
+                    st.session_state.job_id = get_job_manager().submit(
+                        analyze_audio_file, upload.path, upload.digest, cleanup=upload.hold())
+                except (QuotaExceeded, JobQueueFull) as e:
+                    st.error(str(e))
+            upload.close()
+
+        if st.session_state.job_id:
+            job = poll_job(st.session_state.job_id)  # reruns the page until the job finishes
+            st.session_state.job_id = None
+            if job is None or job["status"] == "failed":
+                st.error("Analysis failed — please try again.")
+            else:
+                st.session_state.audio_result = job["result"]
 
-                # Transcribe
-                transcript = speech_to_text(temp_path)
+        if st.session_state.audio_result is not None:
+            audio_result = st.session_state.audio_result
+            st.session_state.audio_result = None
+            with st.spinner("Generating feedback..."):
+                transcript, speech = audio_result["text"], audio_result["vad"]
                 if transcript == "":
                     transcript = "Could not transcribe audio clearly."
 
-                # Heuristics: filler words count, word count, pause heuristic (approx)
-                text_lower = transcript.lower()
-                filler_words = ["um", "uh", "like", "so", "actually", "basically", "you know", "right"]
-                filler_count = sum(text_lower.count(w) for w in filler_words)
+                # Heuristics: filler words count, word count; pauses are measured by the VAD
+                fillers = find_fillers(transcript, duration_seconds=speech["duration"])
+                filler_count = fillers["count"]
                 word_count = len(transcript.split())
+                pace = pace_metrics(speech, word_count=word_count)
                 # mood score heuristic: more words and fewer fillers -> higher score
                 if word_count == 0:
                     mood_score = 0.4
                 else:
                     mood_score = max(0.2, min(0.9, 1 - (filler_count / max(1, word_count / 5))))
 
-                # Build natural feedback
-                feedback_text = build_natural_feedback(transcript, mood_score=mood_score)
+                # Natural feedback picked from the measured fillers/pace/mood; seeded by the
+                # transcript, so the same recording always gets the same report
+                feedback_text = render_feedback("coach", {
+                    "word_count": word_count,
+                    "filler_count": filler_count,
+                    "speaking_rate": pace["speaking_rate"],
+                    "speaking_ratio": pace["speaking_ratio"],
+                    "mood_score": mood_score,
+                }, seed=transcript)
 
                 # Create structured results
                 results = {
                     "timestamp": datetime.datetime.utcnow().isoformat(),
-                    "speaker": speaker_name,
+                    "speaker": st.session_state.job_speaker,
                     "transcript": transcript,
                     "filler_count": int(filler_count),
+                    "filler_breakdown": {k: v for k, v in fillers["counts"].items() if v},
                     "word_count": int(word_count),
                     "mood_score": round(mood_score, 2),
+                    "speaking_rate": round(pace["speaking_rate"]),
+                    "pause_count": pace["pause_count"],
+                    "long_pause_count": pace["long_pause_count"],
+                    "speaking_ratio": round(pace["speaking_ratio"], 2),
                     "feedback_text": feedback_text
                 }
                 st.session_state.results = results
+                st.session_state.voice_clip = None  # rendered below
+                st.session_state.voice_stream = None
 
-                # Generate voice file and store path
-                tts = gTTS(text=feedback_text, lang="en", slow=False)
-                voice_path = f"voice_feedback_{int(datetime.datetime.utcnow().timestamp())}.mp3"
-                tts.save(voice_path)
-                st.session_state.voice_file = voice_path
-
+        results = st.session_state.results
+        if results is not None:
             # Display results
             st.subheader("📝 Transcript")
             st.write(results["transcript"])
@@ -252,14 +243,33 @@ elif menu == "Audio Analysis":
             col1, col2, col3 = st.columns(3)
             col1.metric("Words", results["word_count"])
             col2.metric("Fillers", results["filler_count"])
+            if results["filler_breakdown"]:
+                col2.caption(", ".join(f"{k}: {v}" for k, v in results["filler_breakdown"].items()))
             col3.metric("Mood score", results["mood_score"])
+            col4, col5, col6 = st.columns(3)
+            col4.metric("Pace (wpm)", results["speaking_rate"])
+            col5.metric("Pauses (> 1 s)", f"{results['pause_count']} ({results['long_pause_count']})")
+            col6.metric("Speaking time", f"{results['speaking_ratio'] * 100:.0f}%")
 
             st.subheader("🗣 Natural Feedback")
             st.markdown(f"<div class='report-box'>{results['feedback_text']}</div>", unsafe_allow_html=True)
 
             st.subheader("🔊 Play Voice Feedback")
-            if st.session_state.voice_file and os.path.exists(st.session_state.voice_file):
-                st.audio(st.session_state.voice_file)
+            stream = get_stream(st.session_state.voice_stream)
+            if stream is None and st.session_state.voice_clip is None and voice_server() is not None:
+                # Rendered sentence by sentence in the background and streamed to
+                # the player as it goes, so playback starts with the first sentence
+                stream = start_stream(results["feedback_text"])
+                st.session_state.voice_stream = stream.id
+            if stream is not None:
+                if stream.done and stream.error:
+                    st.warning("Voice feedback is unavailable right now.")
+                else:
+                    play(stream)
+            else:
+                voice, voice_fmt = voice_clip(results["feedback_text"])
+                if voice:
+                    st.audio(voice, format="audio/mpeg" if voice_fmt == "mp3" else "audio/wav")
 
             st.success("Analysis complete — you can download the report from the sidebar.")
 
@@ -285,15 +295,19 @@ elif menu == "Download Report":
         Words: {r['word_count']}
         Filler words: {r['filler_count']}
         Mood score: {r['mood_score']}
+        Pace: {r.get('speaking_rate', 'n/a')} wpm
+        Pauses: {r.get('pause_count', 'n/a')}
         
         Feedback:
         {r['feedback_text']}
         """).strip()
 
         st.download_button("Download .txt report", data=report_text, file_name="human_analytics_report.txt")
-        if st.session_state.voice_file and os.path.exists(st.session_state.voice_file):
-            with open(st.session_state.voice_file, "rb") as f:
-                st.download_button("Download voice feedback (MP3)", data=f, file_name="voice_feedback.mp3")
+        voice, voice_fmt = voice_clip(r["feedback_text"])
+        if voice:
+            st.download_button(f"Download voice feedback ({voice_fmt.upper()})", data=voice,
+                               file_name=f"voice_feedback.{voice_fmt}",
+                               mime="audio/mpeg" if voice_fmt == "mp3" else "audio/wav")
 
 # -----------------------------
 # ABOUT
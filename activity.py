@@ -0,0 +1,176 @@
+# activity.py
+# Activity recognition over video: sampled frames -> MediaPipe Pose ->
+# fixed-shape (frames, 33, 4) keypoint tensor -> sliding windows scored in one
+# batched matrix product on the CPU.
+import math
+import time
+
+import numpy as np
+
+import resources
+from admission import MAX_SECONDS
+from frame_sampler import FrameSampler, probe
+from instrumentation import observe, inc
+from keypoint_model import ActivityModel, JOINTS, FEATURES, DEFAULT_WEIGHTS, DEFAULT_BIAS, keypoint_features
+
+N_POSE_LANDMARKS = 33
+SAMPLE_FPS = 10       # pose frames per second of video
+MAX_FRAMES = math.ceil(MAX_SECONDS * SAMPLE_FPS)  # the longest clip admission lets through
+WINDOW = 16           # frames per classified window (1.6 s at SAMPLE_FPS)
+HOP = 4
+MIN_COVERAGE = 0.5    # windows where the person is found in fewer frames are "unknown"
+
+# MediaPipe Pose landmark index of each joint the keypoint model uses
+POSE_INDEX = {
+    "left_shoulder": 11, "right_shoulder": 12, "left_wrist": 15, "right_wrist": 16,
+    "left_hip": 23, "right_hip": 24, "left_knee": 25, "right_knee": 26,
+    "left_ankle": 27, "right_ankle": 28,
+}
+
+WINDOW_FEATURES = FEATURES + ("leg_motion", "bounce")
+# Per-frame weights plus the two motion features (what tells walking from running)
+WINDOW_WEIGHTS = np.vstack([DEFAULT_WEIGHTS, np.array([
+    #  walk   run   sit  stand
+    [  1.5,  2.5, -2.0, -2.5],   # leg_motion: change in ankle separation, torso lengths / s
+    [  1.0,  6.0, -1.0, -1.5],   # bounce: vertical hip oscillation, torso lengths
+], dtype=np.float32)])
+WINDOW_BIAS = DEFAULT_BIAS
+
+cv2 = resources.lazy_import("cv2")
+
+
+def _make_pose():
+    # Tracking-mode Pose, one per clip: tracking carries state from frame to
+    # frame, so a shared instance would leak it between videos and could only
+    # serve one job at a time. model_complexity=0 is the CPU-friendly model.
+    mp = resources.load("mediapipe")
+    return mp.solutions.pose.Pose(static_image_mode=False, model_complexity=0)
+
+
+def extract_keypoints(video_path, per_second=SAMPLE_FPS, max_frames=MAX_FRAMES):
+    # Returns (keypoints, timestamps, stats). keypoints is (frames, 33, 4) float32
+    # with x, y, z in pixels plus visibility; frames without a person are NaN, so
+    # the tensor has one row per sampled frame whatever the detector found.
+    # stats["truncated"] is set when max_frames stopped sampling before the end
+    # of the clip (only the first analysed_seconds were looked at).
+    sampler = FrameSampler(video_path, max_frames=max_frames, per_second=per_second)
+    total, fps = probe(video_path)
+    indices = sampler.target_indices(total, fps)
+    n = len(indices)
+    truncated = n < len(FrameSampler(video_path, per_second=per_second).target_indices(total, fps))
+    keypoints = np.full((n, N_POSE_LANDMARKS, 4), np.nan, dtype=np.float32)
+    timestamps = np.zeros(n, dtype=np.float32)
+    pose_seconds = 0.0
+    detected = 0
+    with _make_pose() as pose:
+        for row, (_, t, frame) in enumerate(sampler):
+            h, w, _ = frame.shape
+            timestamps[row] = t
+            t0 = time.perf_counter()
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            elapsed = time.perf_counter() - t0
+            pose_seconds += elapsed
+            observe("pose", elapsed)
+            if results.pose_landmarks:
+                lm = results.pose_landmarks.landmark
+                keypoints[row] = [(p.x * w, p.y * h, p.z * w, p.visibility) for p in lm[:N_POSE_LANDMARKS]]
+                detected += 1
+    sampled = sampler.stats["sampled"]
+    observe("decode", sampler.stats["decode_seconds"])
+    inc("frames_sampled", sampled)
+    stats = dict(sampler.stats, detected=detected, pose_seconds=pose_seconds, truncated=truncated,
+                 analysed_seconds=(indices[-1] + 1 if truncated else total) / fps)
+    return keypoints[:sampled], timestamps[:sampled], stats
+
+
+def keypoint_block(keypoints):
+    # (frames, 33, 4) -> (frames, len(KEYPOINT_COLUMNS)) in the keypoint model's column order
+    idx = [POSE_INDEX[j] for j in JOINTS]
+    return keypoints[:, idx, :2].reshape(len(keypoints), -1)
+
+
+def window_features(keypoints, timestamps, window=WINDOW, hop=HOP):
+    # Returns (features (windows, len(WINDOW_FEATURES)), starts, ends, coverage)
+    n = len(keypoints)
+    if n < window:
+        empty = np.zeros(0, dtype=np.float32)
+        return np.zeros((0, len(WINDOW_FEATURES)), dtype=np.float32), empty, empty, empty
+    block = keypoint_block(keypoints)
+    valid = ~np.isnan(block).any(axis=1)
+    frame_feats = keypoint_features(np.nan_to_num(block))
+
+    # per-frame motion: ankle separation change per second and normalised hip height
+    stride = frame_feats[:, FEATURES.index("stride")]
+    dt = np.diff(timestamps, prepend=timestamps[0] - 1.0 / SAMPLE_FPS)
+    dt = np.where(dt > 0, dt, 1.0 / SAMPLE_FPS)
+    step_valid = valid & np.concatenate([[False], valid[:-1]])
+    leg_motion = np.where(step_valid, np.abs(np.diff(stride, prepend=stride[0])) / dt, 0.0)
+    sy = (block[:, JOINTS.index("left_shoulder") * 2 + 1] + block[:, JOINTS.index("right_shoulder") * 2 + 1]) / 2
+    hy = (block[:, JOINTS.index("left_hip") * 2 + 1] + block[:, JOINTS.index("right_hip") * 2 + 1]) / 2
+    torso = np.abs(hy - sy)
+    hip_height = np.where(valid & (torso > 1e-6), hy / np.where(torso > 1e-6, torso, 1.0), np.nan)
+
+    def windows(x):
+        return np.lib.stride_tricks.sliding_window_view(x, window, axis=0)[::hop]
+
+    w_valid = windows(valid)                       # (windows, window)
+    count = w_valid.sum(axis=1)
+    safe = np.maximum(count, 1)[:, None]
+    w_feats = windows(frame_feats)                 # (windows, features, window)
+    mean_feats = (w_feats * w_valid[:, None, :]).sum(axis=2) / safe
+    mean_motion = (windows(leg_motion) * w_valid).sum(axis=1) / safe[:, 0]
+    w_height = np.nan_to_num(windows(hip_height))
+    h_mean = (w_height * w_valid).sum(axis=1) / safe[:, 0]
+    bounce = np.sqrt((((w_height - h_mean[:, None]) * w_valid) ** 2).sum(axis=1) / safe[:, 0])
+
+    features = np.column_stack([mean_feats, mean_motion, bounce]).astype(np.float32)
+    starts = windows(timestamps)[:, 0]
+    ends = windows(timestamps)[:, -1]
+    return features, starts, ends, count / float(window)
+
+
+def classify(keypoints, timestamps, model=None, window=WINDOW, hop=HOP):
+    # Returns (segments, inference_seconds); each segment is
+    # {"start", "end", "label", "confidence"} for one window
+    model = model or ActivityModel(WINDOW_WEIGHTS, WINDOW_BIAS)
+    t0 = time.perf_counter()
+    features, starts, ends, coverage = window_features(keypoints, timestamps, window, hop)
+    if not len(features):
+        return [], time.perf_counter() - t0
+    labels, confidence = model.predict(features)  # all windows in one batch
+    elapsed = time.perf_counter() - t0
+    observe("activity_inference", elapsed)
+    segments = []
+    for start, end, label, conf, cov in zip(starts, ends, labels, confidence, coverage):
+        if cov < MIN_COVERAGE:
+            label, conf = "unknown", 0.0
+        segments.append({"start": float(start), "end": float(end), "label": str(label),
+                         "confidence": float(conf)})
+    return segments, elapsed
+
+
+def merge_segments(segments):
+    # Collapse consecutive windows with the same label into one span
+    merged = []
+    for seg in segments:
+        if merged and merged[-1]["label"] == seg["label"] and seg["start"] <= merged[-1]["end"]:
+            last = merged[-1]
+            last["confidence"] = max(last["confidence"], seg["confidence"])
+            last["end"] = seg["end"]
+        else:
+            merged.append(dict(seg))
+    return merged
+
+
+def analyze_activity(video_path, per_second=SAMPLE_FPS, max_frames=MAX_FRAMES, model=None):
+    # Returns {"keypoints", "timestamps", "segments", "stats"}; stats carries the
+    # measured per-frame pose latency and per-window inference latency
+    keypoints, timestamps, stats = extract_keypoints(video_path, per_second, max_frames)
+    segments, inference_seconds = classify(keypoints, timestamps, model=model)
+    stats.update(
+        windows=len(segments),
+        inference_seconds=inference_seconds,
+        pose_ms_per_frame=1000 * stats["pose_seconds"] / stats["sampled"] if stats["sampled"] else 0.0,
+        inference_ms_per_window=1000 * inference_seconds / len(segments) if segments else 0.0,
+    )
+    return {"keypoints": keypoints, "timestamps": timestamps, "segments": segments, "stats": stats}
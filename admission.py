@@ -0,0 +1,545 @@
+# admission.py
+# Server-side admission control for uploads, before any decoding starts.
+#
+# probe() reads container metadata (duration, resolution, codecs) from the
+# file's header: MP4/MOV boxes and WAV chunks are parsed directly from the
+# in-memory upload (only the moov box is read, never the media data), and
+# other formats fall back to ffmpeg's header dump. admit() then rejects files
+# over the size/resolution limits and trims clips longer than MAX_SECONDS
+# with a stream copy (no re-encode), so a 20-minute recording never reaches
+# the analysis jobs. Large files can also arrive as resumable chunked uploads
+# (a small tus-style HTTP endpoint, see serve()) spooled straight to disk,
+# with the header probed as soon as the first chunks are in.
+import glob
+import hmac
+import json
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from audio_extract import ffmpeg_exe, AudioExtractError
+from instrumentation import inc, timer
+from upload_ingest import ingest, UPLOAD_DIR
+from workspace import check_quota, watch
+
+MAX_SECONDS = float(os.environ.get("HA_MAX_CLIP_SECONDS", "150"))  # the pages ask for ≤2 min
+MAX_BYTES = int(os.environ.get("HA_MAX_UPLOAD_BYTES", str(300 * 1024 * 1024)))
+MAX_PIXELS = int(os.environ.get("HA_MAX_PIXELS", str(3840 * 2160)))
+OVERSIZE_POLICY = os.environ.get("HA_OVERSIZE_POLICY", "trim")  # "trim" or "reject" clips over MAX_SECONDS
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+UPLOAD_PORT = int(os.environ.get("HA_UPLOAD_PORT", "0") or 0)  # resumable upload endpoint; 0 = off
+UPLOAD_HOST = os.environ.get("HA_UPLOAD_HOST", "127.0.0.1")
+UPLOAD_TOKEN = os.environ.get("HA_UPLOAD_TOKEN", "")  # required; the endpoint stays off without one
+RESUMABLE_DIR = os.path.join(UPLOAD_DIR, "resumable")
+MAX_CHUNK = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO = re.compile(r"Stream #[^\n]*?Video: (\w+)[^\n]*?, (\d{2,5})x(\d{2,5})")
+_AUDIO = re.compile(r"Stream #[^\n]*?Audio: (\w+)")
+
+
+class AdmissionError(RuntimeError):
+    pass
+
+
+def _meta_in_use(path):
+    # An upload's <id>.json is kept while its .part or finished file is still
+    # there, so the reaper never strands a paused upload without its metadata
+    return path.endswith(".json") and len(glob.glob(path[:-len(".json")] + "*")) > 1
+
+
+watch(RESUMABLE_DIR, in_use=_meta_in_use)  # abandoned resumable uploads are reaped like other stale scratch files
+
+
+def _fmt(seconds):
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+
+# ---------- header probes ----------
+def _boxes(data, start, end):
+    # (type, payload_start, box_end) for each MP4 box in data[start:end]
+    off = start
+    while off + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, off)
+        header = 8
+        if size == 1:
+            if off + 16 > end:
+                return
+            size, header = struct.unpack_from(">Q", data, off + 8)[0], 16
+        elif size == 0:
+            size = end - off
+        if size < header:
+            return
+        yield kind, off + header, min(off + size, end)
+        off += size
+
+
+def _find(data, start, end, path):
+    # (payload_start, end) of the first box along `path`, e.g. [b"mdia", b"hdlr"]
+    for kind, s, e in _boxes(data, start, end):
+        if kind == path[0]:
+            return (s, e) if len(path) == 1 else _find(data, s, e, path[1:])
+    return None
+
+
+def _parse_moov(data):
+    info = {"format": "mp4", "duration": None, "width": None, "height": None,
+            "video_codec": None, "audio_codec": None}
+    for kind, start, end in _boxes(data, 0, len(data)):
+        if kind == b"mvhd":
+            if data[start] == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, start + 12)
+            if timescale:
+                info["duration"] = duration / timescale
+        elif kind == b"trak":
+            hdlr = _find(data, start, end, [b"mdia", b"hdlr"])
+            stsd = _find(data, start, end, [b"mdia", b"minf", b"stbl", b"stsd"])
+            if hdlr is None or stsd is None:
+                continue
+            handler = data[hdlr[0] + 8:hdlr[0] + 12]
+            codec = data[stsd[0] + 12:stsd[0] + 16].decode("ascii", "replace").strip()
+            if handler == b"vide" and info["video_codec"] is None:
+                info["video_codec"] = codec
+                tkhd = _find(data, start, end, [b"tkhd"])
+                if tkhd is not None:
+                    # 16.16 fixed point, the last 8 bytes of the box
+                    w, h = struct.unpack_from(">II", data, tkhd[1] - 8)
+                    info["width"], info["height"] = w >> 16, h >> 16
+            elif handler == b"soun" and info["audio_codec"] is None:
+                info["audio_codec"] = codec
+    return info
+
+
+def probe_mp4(read, size):
+    # read(offset, n) -> bytes. Walks the top-level boxes (skipping mdat by
+    # offset) to the moov box; None if it isn't there (or not received yet)
+    off = 0
+    while off + 8 <= size:
+        head = read(off, 16)
+        if len(head) < 8:
+            return None
+        box_size, kind = struct.unpack_from(">I4s", head)
+        header = 8
+        if box_size == 1:
+            if len(head) < 16:
+                return None
+            box_size, header = struct.unpack_from(">Q", head, 8)[0], 16
+        elif box_size == 0:
+            box_size = size - off
+        if box_size < header:
+            return None
+        if kind == b"moov":
+            if box_size > MAX_MOOV_BYTES:
+                raise AdmissionError("Unsupported video file (oversized header).")
+            moov = read(off + header, box_size - header)
+            return _parse_moov(moov) if len(moov) == box_size - header else None
+        off += box_size
+    return None
+
+
+def probe_wav(read, size):
+    head = read(0, 12)
+    if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    off, byte_rate, data_bytes = 12, None, None
+    while off + 8 <= size:
+        chunk = read(off, 8)
+        if len(chunk) < 8:
+            break
+        kind, n = struct.unpack("<4sI", chunk)
+        if kind == b"fmt ":
+            fmt = read(off + 8, 16)
+            if len(fmt) == 16:
+                byte_rate = struct.unpack_from("<I", fmt, 8)[0]
+        elif kind == b"data":
+            data_bytes = min(n, size - off - 8)
+            break
+        off += 8 + n + (n & 1)
+    if not byte_rate or data_bytes is None:
+        return None
+    return {"format": "wav", "duration": data_bytes / byte_rate, "width": None, "height": None,
+            "video_codec": None, "audio_codec": "pcm"}
+
+
+def probe_ffmpeg(path):
+    # Any other container: ffmpeg prints the header summary and stops (no output file given)
+    try:
+        exe = ffmpeg_exe()
+    except AudioExtractError as e:
+        raise AdmissionError(f"Can't check this file type: {e}") from None
+    proc = subprocess.run([exe, "-hide_banner", "-nostdin", "-i", path], capture_output=True)
+    err = proc.stderr.decode("utf-8", "replace")
+    m = re.search(r"Input #0, ([^,]+)", err)
+    if m is None:
+        raise AdmissionError("Unsupported or corrupt media file.")
+    info = {"format": m.group(1), "duration": None, "width": None, "height": None,
+            "video_codec": None, "audio_codec": None}
+    d = _DURATION.search(err)
+    if d:
+        info["duration"] = int(d.group(1)) * 3600 + int(d.group(2)) * 60 + float(d.group(3))
+    v = _VIDEO.search(err)
+    if v:
+        info["video_codec"], info["width"], info["height"] = v.group(1), int(v.group(2)), int(v.group(3))
+    a = _AUDIO.search(err)
+    if a:
+        info["audio_codec"] = a.group(1)
+    return info
+
+
+def _probe_header(read, size):
+    head = read(0, 12)
+    if head[4:8] == b"ftyp":
+        return probe_mp4(read, size)
+    if head[:4] == b"RIFF":
+        return probe_wav(read, size)
+    return None
+
+
+_probed = {}  # digest -> probe result, so page reruns don't probe the same upload again
+MAX_PROBED = 1024
+
+
+def probe(upload):
+    # {"format", "duration", "width", "height", "video_codec", "audio_codec", "bytes"}
+    # for an IngestedUpload; only formats without a header parser are spooled for ffmpeg
+    info = _probed.get(upload.digest)
+    if info is None:
+        with timer("probe"):
+            try:
+                info = _probe_header(upload.read_at, upload.size)
+            except (struct.error, IndexError):
+                info = None  # malformed header; let ffmpeg judge
+            info = info or probe_ffmpeg(upload.path)
+        info["bytes"] = upload.size
+        if len(_probed) >= MAX_PROBED:
+            _probed.pop(next(iter(_probed)), None)
+        _probed[upload.digest] = info
+    return dict(info)
+
+
+# ---------- admission ----------
+def _check_limits(info, max_bytes):
+    if info.get("bytes", 0) > max_bytes:
+        raise AdmissionError(f"File is too large ({info['bytes'] / 1e6:.0f} MB; the limit is {max_bytes / 1e6:.0f} MB).")
+    if info["width"] and info["height"] and info["width"] * info["height"] > MAX_PIXELS:
+        raise AdmissionError(f"Video resolution {info['width']}x{info['height']} is above the supported maximum.")
+
+
+_digests = {}  # path of a trimmed clip / finished resumable upload -> its digest, so reruns don't hash it again
+
+
+def _ingest_known(path, suffix):
+    upload = ingest(path, suffix=suffix, digest=_digests.get(path))
+    if len(_digests) >= MAX_PROBED:
+        _digests.pop(next(iter(_digests)), None)
+    _digests[path] = upload.digest
+    return upload
+
+
+def trim(upload, seconds):
+    # The first `seconds` as a new upload, by stream copy (cuts at the nearest
+    # keyframe; nothing is decoded). Kept next to the spool so reruns reuse it.
+    out = os.path.join(upload.upload_dir, f"{upload.digest}-first{int(seconds)}s{upload.suffix}")
+    if os.path.exists(out):
+        os.utime(out)
+    else:
+        _digests.pop(out, None)
+        try:
+            exe = ffmpeg_exe()
+        except AudioExtractError as e:
+            raise AdmissionError(f"Can't shorten the clip: {e}") from None
+        check_quota(upload.size)  # the trimmed copy is never larger than the source
+        fd, tmp = tempfile.mkstemp(dir=upload.upload_dir, prefix=".part-", suffix=upload.suffix)
+        os.close(fd)
+        cmd = [exe, "-nostdin", "-v", "error", "-y", "-i", upload.path, "-t", str(seconds), "-c", "copy"]
+        if upload.suffix.lower() in (".mp4", ".mov", ".m4a"):
+            cmd += ["-movflags", "+faststart"]
+        proc = subprocess.run(cmd + [tmp], capture_output=True)
+        if proc.returncode != 0:
+            os.remove(tmp)
+            raise AdmissionError("Can't shorten the clip: " + proc.stderr.decode("utf-8", "replace").strip())
+        os.replace(tmp, out)
+    return _ingest_known(out, upload.suffix)
+
+
+def admit(upload, max_seconds=MAX_SECONDS, max_bytes=MAX_BYTES, policy=OVERSIZE_POLICY):
+    # -> (upload, info). Raises AdmissionError for files that can't be
+    # analysed; clips over max_seconds are trimmed (the original upload is
+    # closed and the trimmed one returned) or rejected, depending on policy.
+    if upload.size > max_bytes:
+        inc("uploads_rejected")
+        raise AdmissionError(f"File is too large ({upload.size / 1e6:.0f} MB; the limit is {max_bytes / 1e6:.0f} MB).")
+    try:
+        info = probe(upload)
+        _check_limits(info, max_bytes)
+    except AdmissionError:
+        inc("uploads_rejected")
+        raise
+    info["trimmed"] = False
+    if info["duration"] and info["duration"] > max_seconds + 0.5:
+        if policy != "trim":
+            inc("uploads_rejected")
+            raise AdmissionError(f"Clip is {_fmt(info['duration'])} long; the limit is {_fmt(max_seconds)}.")
+        trimmed = trim(upload, max_seconds)
+        upload.close()
+        inc("uploads_trimmed")
+        return trimmed, dict(info, trimmed=True, original_duration=info["duration"],
+                             duration=max_seconds, bytes=trimmed.size)
+    return upload, info
+
+
+def trim_notice(info):
+    # Message for the page when admit() shortened the clip, else None
+    if not info.get("trimmed"):
+        return None
+    return (f"The recording is {_fmt(info['original_duration'])} long; "
+            f"only the first {_fmt(info['duration'])} will be analysed.")
+
+
+# ---------- resumable chunked uploads ----------
+class OffsetMismatch(AdmissionError):
+    pass
+
+
+class UnknownUpload(AdmissionError):
+    pass
+
+
+class ChunkedUpload:
+    # A resumable upload spooled to <RESUMABLE_DIR>/<id>.part, with its
+    # declared length and name in <id>.json. The bytes received so far are the
+    # .part file's size, so a client whose connection dropped asks for the
+    # offset and continues from there. Once complete the file becomes
+    # <id><suffix>, which open_resumable() ingests (abandoned parts and
+    # finished files are removed by the workspace reaper once they go stale).
+    _locks = {}
+    _locks_lock = threading.Lock()
+
+    def __init__(self, upload_id, upload_dir=RESUMABLE_DIR):
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id or ""):
+            raise UnknownUpload("Unknown upload.")
+        self.id = upload_id
+        self.part = os.path.join(upload_dir, upload_id + ".part")
+        meta = os.path.join(upload_dir, upload_id + ".json")
+        try:
+            with open(meta, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            raise UnknownUpload("Unknown upload.") from None
+        self.meta_path = meta
+        self.length = self.meta["length"]
+        self.suffix = self.meta["suffix"]
+        self.done = os.path.join(upload_dir, upload_id + self.suffix)
+        with self._locks_lock:
+            self._lock = self._locks.setdefault(upload_id, threading.Lock())
+
+    @classmethod
+    def create(cls, length, name="", upload_dir=RESUMABLE_DIR):
+        if length <= 0 or length > MAX_BYTES:
+            raise AdmissionError(f"Upload length must be between 1 byte and {MAX_BYTES / 1e6:.0f} MB.")
+        check_quota(length)
+        os.makedirs(upload_dir, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        suffix = os.path.splitext(os.path.basename(name))[1].lower()
+        with open(os.path.join(upload_dir, upload_id + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"length": length, "suffix": suffix, "name": os.path.basename(name)}, f)
+        open(os.path.join(upload_dir, upload_id + ".part"), "wb").close()
+        return cls(upload_id, upload_dir)
+
+    @property
+    def offset(self):
+        if os.path.exists(self.done):
+            return self.length
+        try:
+            return os.path.getsize(self.part)
+        except OSError:
+            return 0
+
+    def _read_part(self, offset, n):
+        with open(self.part, "rb") as f:
+            f.seek(offset)
+            return f.read(n)
+
+    def write(self, offset, data):
+        # Appends `data` at `offset` (which must equal the current offset) and
+        # returns the new offset. The header is probed as soon as it has arrived,
+        # so an over-limit file is refused before the rest is sent.
+        with self._lock:
+            current = self.offset
+            if offset != current:
+                raise OffsetMismatch(f"Expected offset {current}.")
+            if offset + len(data) > self.length:
+                raise AdmissionError("More data than the declared upload length.")
+            check_quota(len(data))
+            with open(self.part, "ab") as f:
+                f.write(data)
+            self.touch()
+            offset += len(data)
+            if "probe" not in self.meta:
+                self._early_probe(offset)
+            if offset == self.length:
+                os.replace(self.part, self.done)
+            return offset
+
+    def _early_probe(self, received):
+        # reads past what has been received come back short, which the
+        # parsers treat as "not there yet"
+        try:
+            info = _probe_header(self._read_part, self.length)
+        except (struct.error, IndexError):
+            info = None
+        if info is None:
+            return  # header not complete yet (or the moov box is at the end)
+        info["bytes"] = self.length
+        try:
+            _check_limits(info, MAX_BYTES)
+            if OVERSIZE_POLICY != "trim" and info["duration"] and info["duration"] > MAX_SECONDS + 0.5:
+                raise AdmissionError(f"Clip is {_fmt(info['duration'])} long; the limit is {_fmt(MAX_SECONDS)}.")
+        except AdmissionError:
+            inc("uploads_rejected")
+            self.cancel()
+            raise
+        self.meta["probe"] = info
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+    def touch(self):
+        # Keeps the upload off the reaper while the client is still sending
+        try:
+            os.utime(self.meta_path)
+        except OSError:
+            pass
+
+    def cancel(self):
+        for path in (self.part, self.meta_path, self.done):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def open_resumable(upload_id):
+    # The finished resumable upload `upload_id` as an IngestedUpload
+    upload = ChunkedUpload(upload_id)
+    if not os.path.exists(upload.done):
+        raise AdmissionError(f"Upload incomplete ({upload.offset:,} of {upload.length:,} bytes received).")
+    os.utime(upload.done)
+    upload.touch()
+    return _ingest_known(upload.done, upload.suffix)
+
+
+def serve(port, host=UPLOAD_HOST, token=UPLOAD_TOKEN):
+    # Resumable uploads over HTTP, on a daemon thread. Meant for scripted
+    # clients (no CORS); every request needs "Authorization: Bearer <token>".
+    #   POST   /uploads         Upload-Length, Upload-Name   -> 201, Location: /uploads/<id>
+    #   HEAD   /uploads/<id>                                 -> Upload-Offset, Upload-Length
+    #   PATCH  /uploads/<id>    Upload-Offset, body = chunk  -> 204, Upload-Offset (409 if out of sync)
+    #   DELETE /uploads/<id>
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from workspace import QuotaExceeded
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _reply(self, code, headers=None, body=b""):
+            self.send_response(code)
+            for k, v in (headers or {}).items():
+                self.send_header(k, str(v))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body and self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _upload(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 2 or parts[0] != "uploads":
+                raise UnknownUpload("Unknown upload.")
+            return ChunkedUpload(parts[1])
+
+        def _handle(self, fn):
+            auth = self.headers.get("Authorization", "")
+            if not token or not hmac.compare_digest(auth.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+                self._reply(401, {"WWW-Authenticate": "Bearer"}, b"Missing or wrong upload token.")
+                return
+            try:
+                fn()
+            except UnknownUpload as e:
+                self._reply(404, body=str(e).encode("utf-8"))
+            except OffsetMismatch as e:
+                self._reply(409, body=str(e).encode("utf-8"))
+            except (AdmissionError, QuotaExceeded) as e:
+                self._reply(413, body=str(e).encode("utf-8"))
+            except ValueError:
+                self._reply(400, body=b"Malformed Upload-Length / Upload-Offset / Content-Length header.")
+
+        def do_POST(self):
+            def create():
+                if self.path.rstrip("/") != "/uploads":
+                    raise UnknownUpload("Unknown upload.")
+                upload = ChunkedUpload.create(int(self.headers.get("Upload-Length", "0")),
+                                              self.headers.get("Upload-Name", ""))
+                self._reply(201, {"Location": f"/uploads/{upload.id}", "Upload-Offset": 0})
+            self._handle(create)
+
+        def do_HEAD(self):
+            def status():
+                upload = self._upload()
+                self._reply(200, {"Upload-Offset": upload.offset, "Upload-Length": upload.length,
+                                  "Cache-Control": "no-store"})
+            self._handle(status)
+
+        def do_PATCH(self):
+            def append():
+                upload = self._upload()
+                n = int(self.headers.get("Content-Length", "0"))
+                if n < 0:
+                    raise ValueError(n)
+                if n > MAX_CHUNK:
+                    raise AdmissionError(f"Chunks are limited to {MAX_CHUNK // (1024 * 1024)} MB.")
+                data = bytearray()
+                while len(data) < n:
+                    piece = self.rfile.read(min(READ_SIZE, n - len(data)))
+                    if not piece:
+                        break  # client went away; keep what arrived so it can resume from there
+                    data += piece
+                offset = upload.write(int(self.headers.get("Upload-Offset", "-1")), bytes(data))
+                self._reply(204, {"Upload-Offset": offset})
+            self._handle(append)
+
+        def do_DELETE(self):
+            def cancel():
+                self._upload().cancel()
+                self._reply(204)
+            self._handle(cancel)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def upload_server():
+    # Starts the resumable upload endpoint once per server process if
+    # HA_UPLOAD_PORT and HA_UPLOAD_TOKEN are set; returns its port, or None when disabled
+    global _server
+    if not UPLOAD_PORT or not UPLOAD_TOKEN:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = serve(UPLOAD_PORT)
+            except OSError:
+                _server = False  # port already taken by another server process
+    return UPLOAD_PORT
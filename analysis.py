@@ -0,0 +1,230 @@
+# analysis.py
+# The analysis pipeline as plain functions, used by the pages' background jobs
+# and by the batch CLI. Every function takes a file path (and the upload's
+# content hash for caching) plus an optional progress(stage, fraction)
+# callback, and returns plain, cacheable data.
+import numpy as np
+
+from audio_extract import load_pcm, duration_seconds, AudioExtractError
+from transcription import transcribe
+from vad import detect_speech, chunk_bounds, pace_metrics
+from fillers import find_fillers
+from result_cache import get_cache, cache_key
+from instrumentation import timer, observe, inc
+
+FACE_MAX_FRAMES = 150
+FACE_VIDEO_MODE = True
+
+
+def _noop(stage, fraction=None):
+    pass
+
+
+def audio_key(digest):
+    return cache_key(digest, "audio")
+
+
+def frames_key(digest, max_frames=FACE_MAX_FRAMES, video_mode=FACE_VIDEO_MODE):
+    return cache_key(digest, "frames", params={"max_frames": max_frames, "video_mode": video_mode})
+
+
+def analyze_audio_file(path, digest=None, progress=None):
+    # decode -> VAD -> chunked transcription.
+    # Returns {"text", "segments", "duration", "vad", "complete"}.
+    progress = progress or _noop
+    cache = get_cache() if digest else None
+    if cache is not None:
+        cached = cache.get(audio_key(digest))
+        if cached is not None:
+            inc("cache_hits")
+            return cached
+        inc("cache_misses")
+
+    progress("extracting audio", 0.05)
+    with timer("extract_audio"):
+        try:
+            pcm = load_pcm(path)
+        except AudioExtractError:
+            pcm = np.zeros(0, dtype=np.int16)
+
+    progress("detecting speech", 0.15)
+    with timer("vad"):
+        speech = detect_speech(pcm)
+
+    progress("transcribing", 0.25)
+    with timer("transcribe"):
+        transcript = transcribe(pcm, chunks=chunk_bounds(speech))
+    inc("audio_seconds", duration_seconds(pcm))
+    result = {
+        "text": transcript["text"],
+        "segments": transcript["segments"],
+        "duration": duration_seconds(pcm),
+        "vad": speech,
+        "complete": transcript["complete"],
+    }
+    # backend unreachable for some chunk: worth retrying next time, so don't cache
+    if cache is not None and result["complete"]:
+        cache.put(audio_key(digest), result)
+    return result
+
+
+def analyze_frames(path, digest=None, max_frames=FACE_MAX_FRAMES, video_mode=FACE_VIDEO_MODE, progress=None,
+                   workers=None):
+    # Face mesh over sampled frames (workers=None -> face_engine.FACE_WORKERS processes).
+    # Returns {"points", "frame_indices", "timestamps", "stats"}.
+    from face_engine import analyze_video
+
+    progress = progress or _noop
+    cache = get_cache() if digest else None
+    key = frames_key(digest, max_frames, video_mode) if digest else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            inc("cache_hits")
+            return cached
+        inc("cache_misses")
+
+    progress("analysing face", 0.6)
+    with timer("face_mesh"):
+        store, stats = analyze_video(path, max_frames=max_frames, video_mode=video_mode, workers=workers)
+    # decode time is summed over the workers' shards
+    observe("decode", stats["decode_seconds"])
+    inc("frames_sampled", stats["sampled"])
+    result = {
+        "points": store.points,
+        "frame_indices": store.frame_indices,
+        "timestamps": store.timestamps,
+        "stats": stats,
+    }
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+def activity_key(digest):
+    return cache_key(digest, "activity")
+
+
+def analyze_activity_file(path, digest=None, progress=None):
+    # Pose keypoints -> sliding-window activity labels (see activity.py).
+    # Returns {"keypoints", "timestamps", "segments", "stats"}.
+    from activity import analyze_activity
+
+    progress = progress or _noop
+    cache = get_cache() if digest else None
+    if cache is not None:
+        cached = cache.get(activity_key(digest))
+        if cached is not None:
+            inc("cache_hits")
+            return cached
+        inc("cache_misses")
+
+    progress("detecting pose", 0.1)
+    result = analyze_activity(path)
+    if cache is not None:
+        cache.put(activity_key(digest), result)
+    return result
+
+
+def analyze_video_file(path, digest=None, max_frames=FACE_MAX_FRAMES, video_mode=FACE_VIDEO_MODE, progress=None):
+    progress = progress or _noop
+    audio = analyze_audio_file(path, digest, progress=progress)
+    frames = analyze_frames(path, digest, max_frames=max_frames, video_mode=video_mode, progress=progress)
+    return {"audio": audio, "frames": frames}
+
+
+def cached_video_analysis(digest, max_frames=FACE_MAX_FRAMES, video_mode=FACE_VIDEO_MODE):
+    # Both parts from the cache, or None if either still has to run
+    cache = get_cache()
+    audio = cache.get(audio_key(digest))
+    frames = cache.get(frames_key(digest, max_frames, video_mode))
+    if audio is None or frames is None:
+        return None
+    return {"audio": audio, "frames": frames}
+
+
+HEAD_MOVEMENT = 0.12  # std of the yaw proxy (inter-ocular distances) above which the head is restless
+
+
+def face_metrics(points):
+    # {"smile", "expression"} for feedback_engine from face-mesh landmarks
+    # (empty without a face): mean mouth ratio, and a coarse expression label
+    # from smile plus how steady the head is
+    from landmarks import expression_metrics, summarize
+    from feedback_engine import SMILE_THRESHOLD
+
+    if not len(points):
+        return {}
+    summary = summarize(expression_metrics(points))
+    smile, restless = summary["mouth_ratio"]["mean"], summary["yaw"]["std"]
+    if np.isnan(smile):
+        return {}
+    if restless > HEAD_MOVEMENT:
+        expression = "Nervous"
+    elif smile > SMILE_THRESHOLD:
+        expression = "Confident"
+    else:
+        expression = "Neutral"
+    return {"smile": round(smile, 3), "expression": expression}
+
+
+def feedback_metrics(analysis):
+    # The metrics feedback_engine.tags_for() reads, from an analyze_video_file()
+    # result: words, pace and fillers from the audio, sentiment polarity of the
+    # transcript, and smile / expression from the face mesh
+    from sentiment import analyze_sentiment
+
+    audio = analysis["audio"]
+    text = audio["text"]
+    words = len(text.split())
+    metrics = face_metrics(analysis["frames"]["points"])
+    if words:
+        pace = pace_metrics(audio["vad"], word_count=words)
+        metrics.update(word_count=words, speaking_rate=round(pace["speaking_rate"]),
+                       speaking_ratio=round(pace["speaking_ratio"], 2),
+                       filler_count=find_fillers(text, duration_seconds=audio["duration"])["count"],
+                       polarity=round(analyze_sentiment(text)["polarity"], 2))
+    return metrics
+
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg")
+
+
+def analyze_recording(path, digest=None, face=True, face_workers=1, progress=None):
+    # Whole pipeline for one file, flattened into a single record of metrics
+    # (used by the batch CLI). Audio-only files skip the face stage.
+    from landmarks import expression_metrics, summarize
+    from sentiment import analyze_sentiment
+
+    progress = progress or _noop
+    audio = analyze_audio_file(path, digest, progress=progress)
+    text = audio["text"]
+    word_count = len(text.split())
+    pace = pace_metrics(audio["vad"], word_count=word_count)
+    fillers = find_fillers(text, duration_seconds=audio["duration"])
+    record = {
+        "path": path,
+        "sha256": digest,
+        "duration": audio["duration"],
+        "transcript_complete": audio["complete"],
+        "text": text,
+        "word_count": word_count,
+        "speaking_rate": pace["speaking_rate"],
+        "articulation_rate": pace["articulation_rate"],
+        "speaking_ratio": pace["speaking_ratio"],
+        "pause_count": pace["pause_count"],
+        "long_pause_count": pace["long_pause_count"],
+        "mean_pause": pace["mean_pause"],
+        "filler_count": fillers["count"],
+        "fillers_per_minute": fillers["per_minute"],
+        "sentiment": analyze_sentiment(text)["polarity"],
+    }
+    if face and not path.lower().endswith(AUDIO_EXTENSIONS):
+        frames = analyze_frames(path, digest, progress=progress, workers=face_workers)
+        summary = summarize(expression_metrics(frames["points"]))
+        record["faces_detected"] = int(len(frames["points"]))
+        record["frames_sampled"] = int(frames["stats"]["sampled"])
+        for name, stats in summary.items():
+            record[f"{name}_mean"] = stats["mean"]
+            record[f"{name}_std"] = stats["std"]
+    return record
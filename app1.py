@@ -1,6 +1,10 @@
 import streamlit as st
-import random
-import time
+from feedback_engine import sections
+from analysis import analyze_video_file, cached_video_analysis, feedback_metrics
+from jobs import get_job_manager, poll_job, JobQueueFull
+from upload_ingest import session_ingest
+from workspace import QuotaExceeded
+from admission import admit, trim_notice, AdmissionError
 
 # ---------------------------
 #   PROFESSIONAL HEADER UI
@@ -23,51 +27,50 @@ uploaded_file = st.file_uploader("🎥 Upload your presentation video", type=['m
 if uploaded_file is not None:
     st.video(uploaded_file)
 
-    if st.button("Start QUICK Analysis"):
+    try:
+        upload, clip = admit(session_ingest(st.session_state, uploaded_file, suffix=".mp4"))
+    except (AdmissionError, QuotaExceeded) as e:
+        st.error(str(e))
+        st.stop()
+    if trim_notice(clip):
+        st.warning(trim_notice(clip))
+    state_key = f"analysis_{upload.digest}"
+    job_key = f"job_{upload.digest}"
+
+    if st.button("Start QUICK Analysis") and state_key not in st.session_state and job_key not in st.session_state:
+        analysis = cached_video_analysis(upload.digest)
+        if analysis is not None:
+            st.session_state[state_key] = analysis
+        else:
+            try:
+                st.session_state[job_key] = get_job_manager().submit(
+                    analyze_video_file, upload.path, upload.digest, cleanup=upload.hold())
+            except (QuotaExceeded, JobQueueFull) as e:
+                st.error(str(e))
+    if job_key in st.session_state:
         st.info("Analyzing your video… Please wait.")
-        time.sleep(2)
-
+        job = poll_job(st.session_state[job_key])  # reruns the page until the job finishes
+        del st.session_state[job_key]
+        if job is None or job["status"] == "failed":
+            st.error("Analysis failed — please try another video.")
+            st.stop()
+        st.session_state[state_key] = job["result"]
+    upload.close()
+
+    analysis = st.session_state.get(state_key)
+    if analysis is not None:
         # --------------------------------------
-        #    RANDOMIZED PROFESSIONAL FEEDBACK
+        #    PROFESSIONAL FEEDBACK
         # --------------------------------------
 
-        strengths_list = [
-            "Your voice projection is clear and confident.",
-            "Good command over topic; explanations were structured.",
-            "Eye contact and body posture showed confidence.",
-            "Transition between slides was smooth and professional.",
-            "Your introduction was strong and attention-grabbing."
-        ]
-
-        weaknesses_list = [
-            "Try reducing filler words like ‘umm’, ‘ahh’.",
-            "You can improve pacing by slowing down slightly.",
-            "Some points could include more examples for clarity.",
-            "Hand movement control needs improvement.",
-            "Try stressing key words to highlight important points."
-        ]
-
-        emotion_list = [
-            "Positive and engaging",
-            "Calm but slightly nervous",
-            "Energetic and confident",
-            "Neutral with controlled expressions",
-            "Focused but slightly fast-paced"
-        ]
-
-        grammar_list = [
-            "Sentence structure is mostly correct with minor errors.",
-            "Good grammar overall; only small tense mistakes.",
-            "Strong vocabulary usage; try avoiding repetition.",
-            "Clear pronunciation with small pacing issues.",
-            "Excellent clarity; only minor articulation improvements needed."
-        ]
-
-        # Pick random feedback
-        strength = random.choice(strengths_list)
-        weakness = random.choice(weaknesses_list)
-        emotion = random.choice(emotion_list)
-        grammar = random.choice(grammar_list)
+        # Same video -> same report: phrases come from the "presentation" pack,
+        # chosen by the measured pace, fillers, sentiment and expression and
+        # seeded by the upload's content hash
+        report = sections("presentation", feedback_metrics(analysis), seed=upload.digest)
+        strength = report["strength"][0]
+        weakness = report["weakness"][0]
+        emotion = report["emotion"][0]
+        grammar = report["grammar"][0]
 
         # --------------------------------------
         # FINAL OUTPUT SECTION
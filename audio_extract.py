@@ -0,0 +1,88 @@
+# audio_extract.py
+# Decodes the audio track of any upload (video or audio) straight into a
+# 16 kHz mono int16 NumPy buffer by piping ffmpeg's raw PCM output, so no
+# intermediate WAV is written and re-read.
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # bytes, int16
+
+
+class AudioExtractError(RuntimeError):
+    pass
+
+
+def ffmpeg_exe():
+    # moviepy ships ffmpeg through imageio-ffmpeg; fall back to one on PATH
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        exe = shutil.which("ffmpeg")
+        if exe is None:
+            raise AudioExtractError("ffmpeg not found (install imageio-ffmpeg or ffmpeg)")
+        return exe
+
+
+def iter_pcm_chunks(path, sample_rate=SAMPLE_RATE, chunk_seconds=1.0, start=None, duration=None):
+    # Yields int16 arrays of about `chunk_seconds` each as ffmpeg decodes them
+    cmd = [ffmpeg_exe(), "-nostdin", "-v", "error"]
+    if start:
+        cmd += ["-ss", str(start)]
+    cmd += ["-i", path]
+    if duration:
+        cmd += ["-t", str(duration)]
+    cmd += ["-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    chunk_bytes = max(SAMPLE_WIDTH, int(sample_rate * chunk_seconds) * SAMPLE_WIDTH)
+
+    # stderr goes to a file: a pipe nobody reads until stdout ends can fill up
+    # (e.g. one error per damaged packet) and stall ffmpeg
+    err = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err)
+    try:
+        leftover = b""
+        while True:
+            data = proc.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % SAMPLE_WIDTH
+            leftover = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=np.int16)
+        if proc.wait() != 0:
+            err.seek(0)
+            raise AudioExtractError(err.read().decode("utf-8", "replace").strip() or "ffmpeg failed")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        err.close()
+
+
+def load_pcm(path, sample_rate=SAMPLE_RATE, start=None, duration=None):
+    # Whole track as one int16 array; raises AudioExtractError if there is no audio stream
+    chunks = list(iter_pcm_chunks(path, sample_rate=sample_rate, start=start, duration=duration))
+    if not chunks:
+        return np.zeros(0, dtype=np.int16)
+    return np.concatenate(chunks)
+
+
+def to_float(pcm):
+    # int16 -> float32 in [-1, 1] for signal processing
+    return pcm.astype(np.float32) / 32768.0
+
+
+def duration_seconds(pcm, sample_rate=SAMPLE_RATE):
+    return len(pcm) / float(sample_rate)
+
+
+def to_audio_data(pcm, sample_rate=SAMPLE_RATE):
+    # speech_recognition.AudioData over the same buffer, for the recognisers
+    import speech_recognition as sr
+    return sr.AudioData(pcm.tobytes(), sample_rate, SAMPLE_WIDTH)
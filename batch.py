@@ -0,0 +1,128 @@
+# batch.py
+# Headless batch analysis of a directory of recordings.
+#
+#   python batch.py recordings/ -o results.jsonl --workers 8
+#
+# Files are analysed across a process pool and each result is appended to the
+# JSONL file as soon as it is ready, so an interrupted run can simply be
+# started again: files already in the output are skipped.
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analysis import analyze_recording, AUDIO_EXTENSIONS
+from result_cache import hash_upload
+from results_store import ResultsStore
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm", ".avi")
+
+
+def find_recordings(root, extensions=VIDEO_EXTENSIONS + AUDIO_EXTENSIONS):
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if name.lower().endswith(extensions):
+                yield os.path.join(dirpath, name)
+
+
+def load_done(output):
+    # Paths already written by a previous (possibly interrupted) run
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a killed run
+            if "error" not in record:
+                done.add(record["path"])
+    return done
+
+
+def _clean(value):
+    # NaN/inf are not valid JSON
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def run_one(path, face, use_cache):
+    t0 = time.perf_counter()
+    try:
+        digest = hash_upload(path) if use_cache else None
+        record = analyze_recording(path, digest, face=face, face_workers=1)
+    except Exception as e:
+        record = {"path": path, "error": f"{type(e).__name__}: {e}"}
+    record["seconds"] = time.perf_counter() - t0
+    return {k: _clean(v) for k, v in record.items()}
+
+
+def write_parquet(jsonl_path, parquet_path):
+    import pandas as pd
+    df = pd.read_json(jsonl_path, lines=True)
+    if "error" in df.columns:
+        df = df[df["error"].isna()].drop(columns=["error"])
+    df.drop_duplicates("path", keep="last").to_parquet(parquet_path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a directory of recordings.")
+    parser.add_argument("input", help="directory to scan (recursively)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL results file (appended to)")
+    parser.add_argument("--parquet", help="also write the results to this Parquet file at the end")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-face", action="store_true", help="skip the face-mesh stage")
+    parser.add_argument("--no-cache", action="store_true", help="don't read/write the result cache")
+    parser.add_argument("--db", help="also record results in this SQLite results store")
+    args = parser.parse_args(argv)
+
+    paths = list(find_recordings(args.input))
+    done = load_done(args.output)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} recordings, {len(paths) - len(todo)} already done, {len(todo)} to analyse")
+
+    store = ResultsStore(args.db) if args.db else None
+    t0 = time.perf_counter()
+    ok = failed = 0
+    audio_seconds = 0.0
+    ctx = multiprocessing.get_context("spawn")
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=ctx) as pool:
+        futures = [pool.submit(run_one, p, not args.no_face, not args.no_cache) for p in todo]
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if "error" in record:
+                failed += 1
+                print(f"[{n}/{len(todo)}] FAILED {record['path']}: {record['error']}", file=sys.stderr)
+            else:
+                ok += 1
+                audio_seconds += record.get("duration") or 0.0
+                if store is not None:
+                    row = {k: v for k, v in record.items() if k != "path"}
+                    row.update(content_hash=row.pop("sha256"), source="batch", file=record["path"])
+                    store.record(row)
+                print(f"[{n}/{len(todo)}] {record['path']} ({record['seconds']:.1f}s)")
+
+    elapsed = time.perf_counter() - t0
+    if store is not None:
+        store.flush(timeout=None)  # the process is about to exit; commit every queued row first
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+
+    print(f"\n{ok} analysed, {failed} failed in {elapsed:.1f}s")
+    if elapsed > 0 and ok:
+        print(f"Throughput: {ok / elapsed * 3600:.0f} recordings/hour, "
+              f"{audio_seconds / elapsed:.1f}x real time ({args.workers} workers)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# benchmarks.py
+# Stage-by-stage benchmark of the analysis pipeline on synthetic recordings.
+#
+#   python benchmarks.py -o bench.json
+#   python benchmarks.py -o new.json --baseline bench.json      # exit 1 on regressions
+#   python benchmarks.py --durations 10 --stages face_mesh --profile prof/
+#
+# Fixtures are generated (speech-like tone bursts with pauses, and a video of
+# a drawn face whose mouth moves with the audio) and kept in --fixtures, so
+# repeated runs measure the same input. Each stage runs --repeat times; one
+# extra pass under tracemalloc records the peak Python/NumPy allocation
+# (native buffers inside OpenCV/MediaPipe are not included).
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from audio_extract import SAMPLE_RATE, ffmpeg_exe, load_pcm
+
+DURATIONS = (10, 30, 120)
+RESOLUTIONS = ("640x360", "1280x720")
+FIXTURE_DIR = ".bench_fixtures"
+VIDEO_FPS = 25
+WORDS_PER_SECOND = 2.3
+TOLERANCE = 0.2          # allowed slowdown vs the baseline
+MIN_REGRESSION = 0.005   # seconds; ignore differences below timer noise
+FEEDBACK_REPORTS = 1000  # reports per "feedback" measurement
+
+VOCABULARY = ("the", "team", "shipped", "our", "project", "results", "were", "really", "good", "and",
+              "we", "learned", "alot", "abuot", "planning", "um", "so", "like", "next", "time",
+              "happy", "problem", "slow", "great", "recieve", "feedback", "from", "users")
+
+
+# ---------- fixtures ----------
+def speech_like_pcm(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    # Voiced bursts (a few harmonics, amplitude-modulated) separated by pauses of
+    # varying length, so the VAD finds segments and long pauses like in speech
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    pcm = np.zeros(n, dtype=np.float32)
+    envelope = np.zeros(n, dtype=np.float32)
+    pos = 0
+    while pos < n:
+        burst = int(rng.uniform(0.4, 2.5) * sample_rate)
+        end = min(n, pos + burst)
+        t = np.arange(end - pos) / sample_rate
+        f0 = rng.uniform(100, 220)
+        tone = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in (1, 2, 3))
+        env = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2  # ~syllable rate
+        pcm[pos:end] = 0.3 * tone * env
+        envelope[pos:end] = env
+        pos = end + int(rng.choice([0.15, 0.4, 1.3]) * sample_rate)
+    pcm += rng.normal(0, 0.002, n).astype(np.float32)
+    return (np.clip(pcm, -1, 1) * 32767).astype(np.int16), envelope
+
+
+def write_wav(path, pcm, sample_rate=SAMPLE_RATE):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def _draw_face(size, mouth_open):
+    import cv2
+    w, h = size
+    frame = np.full((h, w, 3), (90, 110, 130), dtype=np.uint8)
+    cx, cy, r = w // 2, h // 2, min(w, h) // 3
+    cv2.ellipse(frame, (cx, cy), (int(r * 0.8), r), 0, 0, 360, (140, 175, 220), -1)
+    for dx in (-r // 3, r // 3):
+        cv2.ellipse(frame, (cx + dx, cy - r // 4), (r // 8, r // 14), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(frame, (cx + dx, cy - r // 4), r // 20, (40, 30, 20), -1)
+    cv2.line(frame, (cx, cy - r // 8), (cx, cy + r // 6), (110, 140, 190), 3)
+    cv2.ellipse(frame, (cx, cy + r // 2), (r // 4, max(2, int(r // 5 * mouth_open))), 0, 0, 360, (60, 40, 150), -1)
+    return frame
+
+
+def make_fixtures(root, seconds, resolution):
+    # -> (wav_path, video_path), generated once per (duration, resolution)
+    import cv2
+    os.makedirs(root, exist_ok=True)
+    wav_path = os.path.join(root, f"speech_{seconds}s.wav")
+    pcm, envelope = speech_like_pcm(seconds)
+    if not os.path.exists(wav_path):
+        write_wav(wav_path, pcm)
+    if resolution is None:
+        return wav_path, None
+
+    video_path = os.path.join(root, f"face_{seconds}s_{resolution}.mp4")
+    if not os.path.exists(video_path):
+        size = tuple(int(v) for v in resolution.split("x"))
+        silent = video_path + ".silent.mp4"
+        writer = cv2.VideoWriter(silent, cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, size)
+        step = SAMPLE_RATE // VIDEO_FPS
+        for i in range(int(seconds * VIDEO_FPS)):
+            writer.write(_draw_face(size, float(envelope[i * step:(i + 1) * step].mean())))
+        writer.release()
+        subprocess.run([ffmpeg_exe(), "-nostdin", "-v", "error", "-y", "-i", silent, "-i", wav_path,
+                        "-c:v", "copy", "-c:a", "aac", "-shortest", video_path], check=True)
+        os.remove(silent)
+    return wav_path, video_path
+
+
+def transcript_text(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    words = rng.choice(VOCABULARY, size=int(seconds * WORDS_PER_SECOND))
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return " ".join(sentences)
+
+
+# ---------- stages ----------
+# Each entry: (needs_video, setup(wav, video, seconds) -> zero-argument callable)
+def _decode(wav, video, seconds):
+    from frame_sampler import FrameSampler
+    return lambda: sum(1 for _ in FrameSampler(video, max_frames=150))
+
+
+def _extract_audio(wav, video, seconds):
+    return lambda: load_pcm(video)
+
+
+def _vad(wav, video, seconds):
+    from vad import detect_speech
+    pcm = load_pcm(wav)
+    return lambda: detect_speech(pcm)
+
+
+def _transcribe(wav, video, seconds):
+    # chunking + worker pool overhead, with the offline stub recogniser
+    from transcription import transcribe, StubBackend
+    from vad import detect_speech, chunk_bounds
+    pcm = load_pcm(wav)
+    chunks = chunk_bounds(detect_speech(pcm))
+    return lambda: transcribe(pcm, backend=StubBackend(), chunks=chunks)
+
+
+def _face_mesh(wav, video, seconds):
+    from face_engine import analyze_video
+    return lambda: analyze_video(video, max_frames=150, workers=1)
+
+
+def _pose(wav, video, seconds):
+    from activity import analyze_activity
+    return lambda: analyze_activity(video)
+
+
+def _grammar(wav, video, seconds):
+    from grammar_check import check_text, correct_word, get_index
+    text = transcript_text(seconds)
+    get_index()
+
+    def run():
+        correct_word.cache_clear()  # time the index lookups, not the LRU
+        return check_text(text)
+    return run
+
+
+def _sentiment(wav, video, seconds):
+    from sentiment import analyze_sentiment
+    text = transcript_text(seconds)
+    return lambda: analyze_sentiment(text)
+
+
+def _fillers(wav, video, seconds):
+    from fillers import find_fillers
+    text = transcript_text(seconds)
+    return lambda: find_fillers(text, duration_seconds=seconds)
+
+
+def _feedback(wav, video, seconds):
+    # a batch run's worth of reports from one transcript's metrics, varying only the seed
+    from feedback_engine import render, get_pack
+    from fillers import find_fillers
+    text = transcript_text(seconds)
+    words = len(text.split())
+    metrics = {"word_count": words, "filler_count": find_fillers(text)["count"],
+               "speaking_rate": words / seconds * 60, "mood_score": 0.6}
+    get_pack("coach")
+    return lambda: [render("coach", metrics, seed=i) for i in range(FEEDBACK_REPORTS)]
+
+
+STAGES = {
+    "decode": (True, _decode),
+    "extract_audio": (True, _extract_audio),
+    "vad": (False, _vad),
+    "transcribe": (False, _transcribe),
+    "face_mesh": (True, _face_mesh),
+    "pose": (True, _pose),
+    "grammar": (False, _grammar),
+    "sentiment": (False, _sentiment),
+    "fillers": (False, _fillers),
+    "feedback": (False, _feedback),
+}
+
+
+# ---------- running ----------
+def measure(fn, repeat):
+    fn()  # warm-up: imports, model loading, file cache
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median": statistics.median(times), "min": min(times), "max": max(times), "peak_bytes": peak}
+
+
+def profile(fn, path, top=10):
+    # Dumps a .prof file (open with snakeviz / pstats) and returns the top
+    # functions by cumulative time
+    prof = cProfile.Profile()
+    prof.runcall(fn)
+    prof.dump_stats(path)
+    stats = pstats.Stats(prof)
+    rows = []
+    for (filename, line, func), (_, calls, _, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({func})", "calls": calls,
+                     "cumulative": cumulative})
+    rows.sort(key=lambda r: r["cumulative"], reverse=True)
+    return rows[:top]
+
+
+def run(stages, durations, resolutions, repeat, fixture_dir, profile_dir=None):
+    results = []
+    for seconds in durations:
+        for name in stages:
+            needs_video, setup = STAGES[name]
+            for resolution in (resolutions if needs_video else [None]):
+                entry = {"stage": name, "clip_seconds": seconds, "resolution": resolution}
+                try:
+                    wav, video = make_fixtures(fixture_dir, seconds, resolution)
+                    fn = setup(wav, video, seconds)
+                    entry.update(measure(fn, repeat))
+                    entry["per_clip_second"] = entry["median"] / seconds
+                    if profile_dir:
+                        os.makedirs(profile_dir, exist_ok=True)
+                        path = os.path.join(profile_dir, f"{name}_{seconds}s_{resolution or 'audio'}.prof")
+                        entry["profile"] = {"path": path, "top": profile(fn, path)}
+                except ImportError as e:
+                    entry["skipped"] = f"missing dependency: {e.name}"
+                except Exception as e:
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                results.append(entry)
+                label = f"{name} {seconds}s {resolution or ''}".strip()
+                if "median" in entry:
+                    print(f"{label:40s} {entry['median'] * 1000:10.1f} ms  peak {entry['peak_bytes'] / 1e6:8.1f} MB")
+                else:
+                    print(f"{label:40s} {entry.get('skipped') or entry.get('error')}", file=sys.stderr)
+    return results
+
+
+def _key(entry):
+    return entry["stage"], entry["clip_seconds"], entry["resolution"]
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # -> list of regressions {stage, clip_seconds, resolution, baseline, current, ratio}
+    previous = {_key(e): e for e in baseline["results"] if "median" in e}
+    regressions = []
+    for entry in results:
+        old = previous.get(_key(entry))
+        if old is None or "median" not in entry:
+            continue
+        ratio = entry["median"] / old["median"] if old["median"] else float("inf")
+        entry["baseline_ratio"] = ratio
+        if ratio > 1 + tolerance and entry["median"] - old["median"] > MIN_REGRESSION:
+            regressions.append({"stage": entry["stage"], "clip_seconds": entry["clip_seconds"],
+                                "resolution": entry["resolution"], "baseline": old["median"],
+                                "current": entry["median"], "ratio": ratio})
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline stages.")
+    parser.add_argument("-o", "--output", default="bench.json", help="JSON results file")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument("--durations", nargs="+", type=int, default=list(DURATIONS), help="clip lengths (s)")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), help="WxH of the test videos")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="where generated clips are kept")
+    parser.add_argument("--profile", metavar="DIR", help="also run each stage under cProfile, .prof files go here")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown, e.g. 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    results = run(args.stages, args.durations, args.resolutions, max(1, args.repeat), args.fixtures, args.profile)
+    report = {
+        "meta": {
+            "created_at": time.time(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} {r['clip_seconds']}s {r['resolution'] or ''}: "
+                  f"{r['baseline'] * 1000:.1f} -> {r['current'] * 1000:.1f} ms ({r['ratio']:.2f}x)", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# csv_batch.py
+# Scores keypoint/feature CSVs chunk by chunk, so memory stays constant no
+# matter how big the export is. Each scored chunk is appended to an output
+# CSV and also yielded, so the page can update its preview and progress.
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import observe, inc
+
+from keypoint_model import ActivityModel, KEYPOINT_COLUMNS, FEATURES, keypoint_features
+
+CHUNK_ROWS = 50_000
+PASSTHROUGH = ("id", "frame", "timestamp", "time", "video", "person")
+
+
+def read_header(source):
+    pos = source.tell() if hasattr(source, "tell") else None
+    columns = list(pd.read_csv(source, nrows=0).columns)
+    if pos is not None:
+        source.seek(pos)
+    return columns
+
+
+def input_kind(columns):
+    # "keypoints" (raw pose columns) or "features" (precomputed model features)
+    if all(c in columns for c in KEYPOINT_COLUMNS):
+        return "keypoints"
+    if all(c in columns for c in FEATURES):
+        return "features"
+    raise ValueError("CSV needs either pose keypoint columns (e.g. left_hip_x, left_hip_y, ...) "
+                     "or feature columns: " + ", ".join(FEATURES))
+
+
+def iter_chunks(source, usecols, chunksize=CHUNK_ROWS, engine="pandas"):
+    # Only the needed columns are parsed, with explicit float32 dtypes.
+    # engine="pyarrow" streams record batches through pyarrow's CSV reader.
+    numeric = [c for c in usecols if c not in PASSTHROUGH]
+    if engine == "pyarrow":
+        try:
+            from pyarrow import csv as pacsv
+            import pyarrow as pa
+        except ImportError:
+            engine = "pandas"
+        else:
+            reader = pacsv.open_csv(
+                source,
+                read_options=pacsv.ReadOptions(block_size=16 << 20),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=list(usecols),
+                    column_types={c: pa.float32() for c in numeric},
+                ),
+            )
+            for batch in reader:
+                yield batch.to_pandas()
+            return
+    yield from pd.read_csv(source, usecols=list(usecols), chunksize=chunksize,
+                           dtype={c: np.float32 for c in numeric})
+
+
+def score_chunks(source, model=None, chunksize=CHUNK_ROWS, engine="pandas", out_path=None, total_bytes=None):
+    # Yields (scored_chunk, rows_done, fraction_done) per chunk.
+    # fraction_done is estimated from the read position when total_bytes is known.
+    model = model or ActivityModel()
+    columns = read_header(source)
+    kind = input_kind(columns)
+    needed = KEYPOINT_COLUMNS if kind == "keypoints" else FEATURES
+    keep = [c for c in columns if c in PASSTHROUGH]
+    usecols = keep + list(needed)
+
+    rows = 0
+    out = open(out_path, "w", newline="", encoding="utf-8") if out_path else None
+    try:
+        for chunk in iter_chunks(source, usecols, chunksize=chunksize, engine=engine):
+            t0 = time.perf_counter()
+            block = chunk[list(needed)].to_numpy(dtype=np.float32, na_value=np.nan)
+            feats = keypoint_features(block) if kind == "keypoints" else np.nan_to_num(block)
+            labels, confidence = model.predict(feats)
+            scored = chunk[keep].copy()
+            scored["label"] = labels
+            scored["confidence"] = np.round(confidence, 4)
+            observe("scoring", time.perf_counter() - t0)
+            inc("rows_scored", len(scored))
+            if out is not None:
+                scored.to_csv(out, header=rows == 0, index=False)
+            rows += len(scored)
+            fraction = None
+            if total_bytes and hasattr(source, "tell"):
+                fraction = min(1.0, source.tell() / float(total_bytes))
+            yield scored, rows, fraction
+    finally:
+        if out is not None:
+            out.close()
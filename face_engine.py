@@ -0,0 +1,137 @@
+# face_engine.py
+# Runs MediaPipe Face Mesh over sampled frames on a process pool.
+# Frames are sharded into contiguous runs so that video (tracking) mode can
+# follow the face between frames. Each worker keeps one mesh per mode for its
+# lifetime; the tracking mesh is reset() before every shard so no tracking
+# state carries over from another shard or video.
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import resources
+from frame_sampler import FrameSampler, probe
+from landmarks import LandmarkStore, N_LANDMARKS
+
+cv2 = resources.lazy_import("cv2")
+
+# Face-mesh processes per analysis. The pool is shared by every job in the
+# server process, so this caps its CPU use whatever the number of jobs.
+FACE_WORKERS = int(os.environ.get("HA_FACE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_face_meshes = {}  # video_mode -> the pool worker's FaceMesh, created on first use
+_local_lock = threading.Lock()  # guards the in-process FaceMeshes (workers=1)
+_pools = {}  # workers -> ProcessPoolExecutor, reused across analyses
+_pools_lock = threading.Lock()
+
+
+def _make_face_mesh(video_mode):
+    mp = resources.load("mediapipe")
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=not video_mode,
+        max_num_faces=1,
+    )
+
+
+# In-process meshes (workers=1), created on first use
+resources.register("face_mesh_image", lambda: _make_face_mesh(False), teardown=lambda m: m.close())
+resources.register("face_mesh_video", lambda: _make_face_mesh(True), teardown=lambda m: m.close())
+
+
+def _init_worker():
+    cv2.setNumThreads(1)  # one process per core already; avoid oversubscription
+
+
+def _worker_shard(video_path, indices, video_mode):
+    # Pool entry point
+    mesh = _face_meshes.get(video_mode)
+    if mesh is None:
+        mesh = _face_meshes[video_mode] = _make_face_mesh(video_mode)
+    elif video_mode:
+        mesh.reset()  # drop the face tracked in the previous shard
+    return _analyze_shard(video_path, indices, mesh)
+
+
+def _analyze_shard(video_path, indices, face_mesh):
+    # Returns (frame_indices, timestamps, points, stats) for one contiguous shard
+    sampler = FrameSampler(video_path, indices=indices)
+    found_idx, found_t, points = [], [], []
+    for i, t, frame in sampler:
+        h, w, _ = frame.shape
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if results.multi_face_landmarks:
+            lm = results.multi_face_landmarks[0].landmark
+            arr = np.array([(p.x, p.y, p.z) for p in lm[:N_LANDMARKS]], dtype=np.float32)
+            arr *= np.array([w, h, w], dtype=np.float32)
+            found_idx.append(i)
+            found_t.append(t)
+            points.append(arr)
+    if points:
+        points = np.stack(points)
+    else:
+        points = np.empty((0, N_LANDMARKS, 3), dtype=np.float32)
+    return found_idx, found_t, points, sampler.stats
+
+
+def _shards(indices, n):
+    size = max(1, -(-len(indices) // n))
+    return [indices[k:k + size] for k in range(0, len(indices), size)]
+
+
+def _get_pool(workers):
+    # Concurrent jobs may ask for the pool at once; only one may create it
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn, not fork: the Streamlit server process has threads running
+            ctx = multiprocessing.get_context("spawn")
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker)
+        return _pools[workers]
+
+
+@resources.on_teardown
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def analyze_video(video_path, max_frames=150, per_second=None, workers=None, video_mode=True):
+    # Samples frames from `video_path` and returns (LandmarkStore, stats) with
+    # the results merged back in frame order.
+    total, fps = probe(video_path)
+    indices = FrameSampler(video_path, max_frames=max_frames, per_second=per_second).target_indices(total, fps)
+    if workers is None:
+        # a job worker process (HA_JOB_MODE=process) is already one of several; don't fan out again
+        workers = 1 if multiprocessing.parent_process() is not None else FACE_WORKERS
+    workers = max(1, workers)
+
+    # Pool size stays fixed so the pool can be reused; short clips just use fewer shards
+    shards = _shards(indices, workers)
+    stats = {"sampled": 0, "grabbed": 0, "seeks": 0, "decode_seconds": 0.0, "workers": workers}
+    store = LandmarkStore(capacity=len(indices) or 1)
+
+    if workers == 1:
+        # In-process, reusing this process's mesh across calls (e.g. one per batch worker)
+        with _local_lock:
+            mesh = resources.get("face_mesh_video" if video_mode else "face_mesh_image")
+            results = []
+            for shard in shards:
+                if video_mode:
+                    mesh.reset()
+                results.append(_analyze_shard(video_path, shard, mesh))
+    else:
+        pool = _get_pool(workers)
+        # map() keeps shard order, so the merged frames stay in order
+        results = list(pool.map(_worker_shard, [video_path] * len(shards), shards,
+                                [video_mode] * len(shards)))
+
+    for found_idx, found_t, points, shard_stats in results:
+        for i, t, arr in zip(found_idx, found_t, points):
+            store.add_array(arr, frame_index=i, timestamp=t)
+        for key in ("sampled", "grabbed", "seeks", "decode_seconds"):
+            stats[key] += shard_stats[key]
+    return store, stats
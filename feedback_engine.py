@@ -0,0 +1,338 @@
+# feedback_engine.py
+# Metric-driven feedback reports from template packs.
+#
+# A pack is a set of phrase groups plus layouts (which groups to draw from,
+# how many, and how to frame each sentence). Packs are compiled once per
+# process into per-group candidate lists; a phrase may be tagged with the
+# conditions it suits ("pace_fast", "fillers_high", ...), and phrases whose
+# tags match the report's metrics are preferred over generic ones. Choices
+# come from a private random.Random seeded from a content hash (the upload
+# digest, the transcript, or the metrics themselves), so the same input
+# always yields the same report and reports can be cached and diffed.
+import json
+import os
+import random
+from hashlib import sha256
+from string import Formatter
+
+import resources
+
+PACKS_FILE = os.environ.get("HA_FEEDBACK_PACKS")  # optional JSON {name: pack} merged over PACKS
+
+SHORT_WORDS = 8          # transcripts shorter than this get a two-sentence report
+FILLER_RATE = 0.03       # fillers per word above which fillers are called out
+SLOW_WPM = 110
+FAST_WPM = 170
+FLUENT_RATIO = 0.6       # share of the clip spent speaking
+SMILE_THRESHOLD = 0.25   # mean mouth ratio (see streamlit_app)
+SENTIMENT_THRESHOLD = 0.1
+
+# Phrase entries are "text" (always eligible) or [condition(s), "text"]; a
+# condition is a space-separated set of tags that must all hold, and a list of
+# conditions matches if any one does. "{name}" fields are filled from the
+# report's metrics, or else drawn from the pack's vocabulary of that name
+# (without repeats inside one report). Layouts are tried in order and the
+# first whose condition holds is used; each slot is [group, count, frame].
+PACKS = {
+    # Main.py: one natural-sounding paragraph
+    "coach": {
+        "groups": {
+            "positive": [
+                ["pace_ok", "Great delivery — your pace felt natural and easy to follow."],
+                ["fillers_low", "Nice clarity — your words came across clearly and confidently."],
+                [["sentiment_positive", "expressive"], "Good energy — you sounded engaged and present."],
+                "Strong vocabulary — your word choice was appropriate and effective.",
+                "Clear openings and closings — good structure in your speech.",
+            ],
+            "negative": [
+                ["pace_fast", "Try slowing down a bit — a calmer pace will improve clarity."],
+                ["fillers_high", "You used some filler words (like 'um' and 'so') — try to reduce them."],
+                [["sentiment_neutral", "expression_flat"], "Work on voice modulation — the tone was a bit flat in parts."],
+                "Some words were unclear — focus on crisp pronunciation for tricky words.",
+                [["pace_slow", "sentiment_negative", "hesitant"], "Add a touch more energy at key moments to keep the audience engaged."],
+            ],
+            "grammar": [
+                "Watch verb tenses — keep them consistent across sentences",
+                "Break long sentences into two for better clarity",
+                "Use active voice when possible to make sentences stronger",
+            ],
+            "pronunciation": [
+                ["pace_fast", "Practice the pronunciation of multi-syllable words slowly"],
+                "Record and match your pronunciation to native examples",
+                "Control your mouth openings on long vowel sounds",
+            ],
+            "practice": [
+                "Try a short daily practice: read 2 minutes aloud and record once a day.",
+                [["pace_fast", "fillers_high"], "Use pauses intentionally — count a silent 1–2 seconds between ideas."],
+                "Practice tongue twisters to improve articulation and clarity.",
+            ],
+            "summary": [
+                "Overall, you're on the right path — a few focused practices will make your delivery stand out.",
+            ],
+        },
+        "layouts": [
+            ["short upbeat", [["positive", 1, "{}"], ["practice", 1, "{}"]]],
+            ["short", [["negative", 1, "{}"], ["practice", 1, "{}"]]],
+            ["upbeat", [["positive", 2, "{}"], ["negative", 1, "One quick note: {}"],
+                        ["grammar", 1, "Grammar suggestion: {}."], ["pronunciation", 1, "Pronunciation suggestion: {}."],
+                        ["practice", 1, "Practice tip: {}"], ["summary", 1, "{}"]]],
+            ["", [["negative", 2, "{}"], ["positive", 1, "A strength: {}"],
+                  ["grammar", 1, "Grammar suggestion: {}."], ["pronunciation", 1, "Pronunciation suggestion: {}."],
+                  ["practice", 1, "Practice tip: {}"], ["summary", 1, "{}"]]],
+        ],
+    },
+    # app1.py / test.py: one line per report section
+    "presentation": {
+        "groups": {
+            "strength": [
+                ["fluent", "Your voice projection is clear and confident."],
+                "Good command over topic; explanations were structured.",
+                [["expression_confident", "expressive"], "Eye contact and body posture showed confidence."],
+                "Transition between slides was smooth and professional.",
+                "Your introduction was strong and attention-grabbing.",
+            ],
+            "weakness": [
+                ["fillers_high", "Try reducing filler words like ‘umm’, ‘ahh’."],
+                ["pace_fast", "You can improve pacing by slowing down slightly."],
+                "Some points could include more examples for clarity.",
+                "Hand movement control needs improvement.",
+                [["sentiment_neutral", "expression_flat"], "Try stressing key words to highlight important points."],
+            ],
+            "emotion": [
+                [["sentiment_positive", "expressive"], "Positive and engaging"],
+                ["expression_nervous", "Calm but slightly nervous"],
+                ["expression_confident", "Energetic and confident"],
+                [["sentiment_neutral", "expression_flat"], "Neutral with controlled expressions"],
+                ["pace_fast", "Focused but slightly fast-paced"],
+            ],
+            "grammar": [
+                "Sentence structure is mostly correct with minor errors.",
+                "Good grammar overall; only small tense mistakes.",
+                "Strong vocabulary usage; try avoiding repetition.",
+                [["pace_fast", "pace_slow"], "Clear pronunciation with small pacing issues."],
+                "Excellent clarity; only minor articulation improvements needed.",
+            ],
+        },
+        "layouts": [
+            ["", [["strength", 1, "{}"], ["weakness", 1, "{}"], ["emotion", 1, "{}"], ["grammar", 1, "{}"]]],
+        ],
+    },
+    # ha_mini_project.analyze_emotions
+    "expressions": {
+        "vocab": {"emotion": ["Happy", "Neutral", "Sad", "Angry", "Confident", "Nervous"]},
+        "groups": {
+            "strength": [
+                [["expression_confident", "expression_neutral"],
+                 "Strength: You mostly appear {expression} in your expressions."],
+                "Strength: You mostly appear {emotion} in your expressions.",
+            ],
+            "weakness": [
+                ["expression_nervous", "Weakness: You look {expression} at times; try keeping your head steady."],
+                "Weakness: Try to reduce {emotion} expressions.",
+            ],
+            "body": [
+                [["expression_confident", "expressive"], "Body language: Looks confident."],
+                [["expression_nervous", "expression_flat"], "Body language: Work on posture and gestures."],
+                "Body language: Looks confident.",
+                "Body language: Work on posture and gestures.",
+            ],
+        },
+        "layouts": [
+            ["", [["strength", 1, "{}"], ["weakness", 1, "{}"], ["body", 1, "{}"]]],
+        ],
+    },
+    # ha_mini_project.analyze_speech
+    "speech": {
+        "groups": {
+            "clarity": [
+                ["fluent", "Your speech clarity is good."],
+                [["pace_fast", "hesitant"], "Try to speak more slowly for clarity."],
+                "Your speech clarity is good.",
+                "Try to speak more slowly for clarity.",
+            ],
+            "grammar": [
+                "Grammar is mostly correct.",
+                "Some grammar mistakes detected, practice speaking.",
+            ],
+            "tone": [
+                [["sentiment_positive", "fluent"], "Voice tone is confident."],
+                [["sentiment_negative", "sentiment_neutral", "hesitant"], "Voice tone could be improved."],
+                "Voice tone is confident.",
+                "Voice tone could be improved.",
+            ],
+        },
+        "layouts": [
+            ["", [["clarity", 1, "{}"], ["grammar", 1, "{}"], ["tone", 1, "{}"]]],
+        ],
+    },
+}
+
+
+# ---------- compiling ----------
+def _conditions(spec):
+    # "a b" -> (frozenset({a, b}),); ["a", "b c"] -> any of them
+    if isinstance(spec, str):
+        spec = [spec]
+    return tuple(frozenset(c.split()) for c in spec)
+
+
+def _fields(text):
+    return tuple(dict.fromkeys(name for _, name, _, _ in Formatter().parse(text) if name))
+
+
+def _compile_group(entries):
+    # (tagged, generic): tagged = ((conditions, text, fields), ...)
+    tagged, generic = [], []
+    for entry in entries:
+        if isinstance(entry, str):
+            generic.append((entry, _fields(entry)))
+        else:
+            spec, text = entry
+            tagged.append((_conditions(spec), text, _fields(text)))
+    return tuple(tagged), tuple(generic)
+
+
+def compile_pack(pack):
+    groups = {name: _compile_group(entries) for name, entries in pack["groups"].items()}
+    layouts = []
+    for spec, slots in pack["layouts"]:
+        for group, _, _ in slots:
+            if group not in groups:
+                raise ValueError(f"Layout refers to unknown phrase group: {group}")
+        layouts.append((_conditions(spec), tuple((g, int(k), frame) for g, k, frame in slots)))
+    vocab = {name: tuple(words) for name, words in pack.get("vocab", {}).items()}
+    return {"groups": groups, "layouts": tuple(layouts), "vocab": vocab}
+
+
+def _load_packs():
+    packs = dict(PACKS)
+    if PACKS_FILE:
+        with open(PACKS_FILE, "r", encoding="utf-8") as f:
+            packs.update(json.load(f))
+    return {name: compile_pack(pack) for name, pack in packs.items()}
+
+
+resources.register("feedback_packs", _load_packs)
+
+
+def get_pack(name):
+    packs = resources.get("feedback_packs")
+    if name not in packs:
+        raise ValueError(f"Unknown feedback pack: {name}")
+    return packs[name]
+
+
+# ---------- metrics -> tags ----------
+def tags_for(metrics):
+    # Condition tags that hold for a report's metrics. Recognised keys (all
+    # optional): word_count, filler_count, speaking_rate (wpm), speaking_ratio,
+    # polarity, mood_score, expression (a label such as "Confident"), smile.
+    tags = set()
+    words = metrics.get("word_count")
+    if words is not None and words < SHORT_WORDS:
+        tags.add("short")
+    if metrics.get("filler_count") is not None and words:
+        tags.add("fillers_high" if metrics["filler_count"] / words >= FILLER_RATE else "fillers_low")
+    wpm = metrics.get("speaking_rate")
+    if wpm:
+        tags.add("pace_slow" if wpm < SLOW_WPM else "pace_fast" if wpm > FAST_WPM else "pace_ok")
+    if metrics.get("speaking_ratio") is not None:
+        tags.add("fluent" if metrics["speaking_ratio"] >= FLUENT_RATIO else "hesitant")
+    p = metrics.get("polarity")
+    if p is not None:
+        tags.add("sentiment_positive" if p > SENTIMENT_THRESHOLD
+                 else "sentiment_negative" if p < -SENTIMENT_THRESHOLD else "sentiment_neutral")
+    if metrics.get("mood_score") is not None:
+        tags.add("upbeat" if metrics["mood_score"] >= 0.5 else "needs_work")
+    if metrics.get("expression"):
+        tags.update(("expression", "expression_" + str(metrics["expression"]).lower()))
+    if metrics.get("smile") is not None:
+        tags.add("expressive" if metrics["smile"] > SMILE_THRESHOLD else "expression_flat")
+    return tags
+
+
+# ---------- rendering ----------
+def seed_for(*parts):
+    # Stable 64-bit seed from content (bytes, text, or anything with a stable repr)
+    h = sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = repr(part).encode("utf-8")
+        h.update(part)
+        h.update(b"\0")
+    return int.from_bytes(h.digest()[:8], "big")
+
+
+def _matches(conditions, tags):
+    return any(c <= tags for c in conditions)
+
+
+def select(pack_name, metrics=None, seed=None):
+    # [(group, sentence), ...] in report order. The same pack, metrics and
+    # seed always give the same sentences; without a seed the metrics are the seed.
+    metrics = metrics or {}
+    pack = get_pack(pack_name)
+    tags = tags_for(metrics)
+    rng = random.Random(seed_for(pack_name, seed if seed is not None else sorted(metrics.items())))
+    slots = next((s for cond, s in pack["layouts"] if _matches(cond, tags)), ())
+
+    used = set()
+    drawn = {}  # vocab name -> words already used in this report
+    out = []
+    for group, k, frame in slots:
+        tagged, generic = pack["groups"][group]
+        matched, other = [], []
+        for cond, text, fields in tagged:
+            (matched if _matches(cond, tags) else other).append((text, fields))
+        # metric-matched phrases first, then generic ones, then any other
+        # tagged phrase if the group would run out; each in seeded order
+        candidates = (rng.sample(matched, len(matched)) + rng.sample(generic, len(generic))
+                      + rng.sample(other, len(other)))
+        for text, fields in candidates:
+            if k == 0:
+                break
+            if text in used or any(f not in metrics and f not in pack["vocab"] for f in fields):
+                continue
+            used.add(text)
+            k -= 1
+            if fields:
+                values = {}
+                for f in fields:
+                    if f in metrics:
+                        values[f] = metrics[f]
+                    else:
+                        taken = drawn.setdefault(f, set())
+                        words = [w for w in pack["vocab"][f] if w not in taken] or list(pack["vocab"][f])
+                        values[f] = rng.choice(words)
+                        taken.add(values[f])
+                text = text.format_map(values)
+            out.append((group, text if frame == "{}" else frame.format(text)))
+    return out
+
+
+def render(pack_name, metrics=None, seed=None, sep=" "):
+    return sep.join(text for _, text in select(pack_name, metrics, seed))
+
+
+def sections(pack_name, metrics=None, seed=None):
+    # {group: [sentences]} for report pages that lay sections out separately
+    out = {}
+    for group, text in select(pack_name, metrics, seed):
+        out.setdefault(group, []).append(text)
+    return out
+
+
+def phrases(pack_name):
+    # Every sentence the pack can produce that doesn't depend on metric or
+    # vocabulary fields (e.g. to pre-render its voice clips)
+    pack = get_pack(pack_name)
+    out = {}
+    for _, slots in pack["layouts"]:
+        for group, _, frame in slots:
+            tagged, generic = pack["groups"][group]
+            for text, fields in [(t, f) for _, t, f in tagged] + list(generic):
+                if not fields:
+                    out[text if frame == "{}" else frame.format(text)] = None
+    return list(out)
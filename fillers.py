@@ -0,0 +1,44 @@
+# fillers.py
+# Filler / disfluency counting with one precompiled word-boundary regex:
+# a single linear pass over the transcript, whole words only (so "so" does not
+# match "also" and "like" does not match "likely"), multi-word entries allowed.
+import re
+from functools import lru_cache
+
+DEFAULT_FILLERS = ("um", "uh", "like", "so", "actually", "basically", "you know", "right")
+
+
+def _normalize(phrase):
+    return " ".join(phrase.lower().split())
+
+
+@lru_cache(maxsize=16)
+def _compile(lexicon):
+    # Longest entries first so "you know" wins over a shorter overlapping entry
+    phrases = sorted({_normalize(p) for p in lexicon if p.strip()}, key=len, reverse=True)
+    if not phrases:
+        return None
+    alternation = "|".join(r"\s+".join(map(re.escape, p.split())) for p in phrases)
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+
+def find_fillers(text, lexicon=DEFAULT_FILLERS, duration_seconds=None):
+    # Returns {"count", "counts": {filler: n}, "positions": [(start, end, filler)],
+    # "per_minute", "rates": {filler: per minute}}; rates need duration_seconds.
+    pattern = _compile(tuple(lexicon))
+    counts = {_normalize(p): 0 for p in lexicon if p.strip()}
+    positions = []
+    if pattern is not None:
+        for m in pattern.finditer(text):
+            filler = _normalize(m.group(0))
+            counts[filler] += 1
+            positions.append((m.start(), m.end(), filler))
+    total = len(positions)
+    minutes = duration_seconds / 60.0 if duration_seconds else 0.0
+    return {
+        "count": total,
+        "counts": counts,
+        "positions": positions,
+        "per_minute": total / minutes if minutes else None,
+        "rates": {k: v / minutes for k, v in counts.items()} if minutes else None,
+    }
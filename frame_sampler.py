@@ -0,0 +1,118 @@
+# frame_sampler.py
+# Decodes only the frames we actually analyse, instead of cap.read() on every frame.
+import time
+
+from resources import lazy_import
+
+cv2 = lazy_import("cv2")  # imported when the first clip is decoded
+
+
+class FrameSampler:
+    # Samples frames from a video either evenly (max_frames over the whole clip)
+    # or by time (per_second frames for every second of video).
+    #
+    # Large gaps are crossed with a CAP_PROP_POS_FRAMES seek (the decoder jumps to
+    # the previous keyframe and only decodes forward from there); small gaps are
+    # crossed with grab(), which skips the colour conversion of frames we drop.
+    # A seek is trusted only if the decoded frame's timestamp (CAP_PROP_POS_MSEC)
+    # is the target's; the reported frame position can be right while the
+    # decoder sits elsewhere. If a seek misses, the clip is reopened and we fall
+    # back to grab-only skipping for the rest of it.
+
+    def __init__(self, video_path, max_frames=150, per_second=None, seek_threshold=None, indices=None):
+        self.video_path = video_path
+        self.max_frames = max_frames
+        self.per_second = per_second
+        self.seek_threshold = seek_threshold
+        # Explicit, sorted frame indices to sample (overrides max_frames / per_second)
+        self.indices = indices
+        self.stats = {
+            "sampled": 0,
+            "grabbed": 0,
+            "seeks": 0,
+            "decode_seconds": 0.0,
+            "seek_supported": True,
+        }
+
+    def target_indices(self, total, fps):
+        if self.indices is not None:
+            return [i for i in self.indices if i < total]
+        if total <= 0:
+            return []
+        if self.per_second:
+            step = max(1.0, fps / float(self.per_second))
+        else:
+            step = max(1.0, total / float(self.max_frames or total))
+        indices = []
+        pos = 0.0
+        while pos < total:
+            idx = int(pos)
+            if not indices or idx != indices[-1]:
+                indices.append(idx)
+            pos += step
+        if self.max_frames:
+            indices = indices[: self.max_frames]
+        return indices
+
+    def __iter__(self):
+        # Yields (frame_index, timestamp_seconds, bgr_frame)
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            # Default threshold: about one GOP (2 s); below that, grabbing is cheaper than a seek
+            threshold = self.seek_threshold or max(2, int(fps * 2))
+
+            pos = 0  # index of the next frame the decoder will return
+            for target in self.target_indices(total, fps):
+                t0 = time.perf_counter()
+                gap = target - pos
+                if gap > threshold and self.stats["seek_supported"]:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                    ret, frame = cap.read()
+                    # within half a frame of where the target frame should be
+                    if ret and abs(cap.get(cv2.CAP_PROP_POS_MSEC) - target * 1000.0 / fps) <= 500.0 / fps:
+                        self.stats["seeks"] += 1
+                        self.stats["decode_seconds"] += time.perf_counter() - t0
+                        pos = target + 1
+                        self.stats["sampled"] += 1
+                        yield target, target / fps, frame
+                        continue
+                    # Seek landed somewhere else: start over from the first frame
+                    # (a seek back could miss too) and stop seeking
+                    self.stats["seek_supported"] = False
+                    cap.release()
+                    cap = cv2.VideoCapture(self.video_path)
+                    gap = target
+                ok = True
+                for _ in range(gap):
+                    if not cap.grab():
+                        ok = False
+                        break
+                    self.stats["grabbed"] += 1
+                if not ok:
+                    break
+                ret, frame = cap.read()
+                self.stats["decode_seconds"] += time.perf_counter() - t0
+                if not ret:
+                    break
+                pos = target + 1
+                self.stats["sampled"] += 1
+                yield target, target / fps, frame
+        finally:
+            cap.release()
+
+    def cost_per_frame(self):
+        # Average wall time (seconds) spent seeking/grabbing/decoding per sampled frame
+        if not self.stats["sampled"]:
+            return 0.0
+        return self.stats["decode_seconds"] / self.stats["sampled"]
+
+
+def probe(video_path):
+    # (frame_count, fps) as reported by the container
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), (cap.get(cv2.CAP_PROP_FPS) or 25)
+    finally:
+        cap.release()
@@ -0,0 +1,232 @@
+# grammar_check.py
+# Spelling and light grammar checks for transcripts, replacing TextBlob's
+# correct() (an edit-distance search over the whole corpus for every word).
+#
+# Spelling uses a symmetric-delete index (as in SymSpell): every dictionary
+# word is stored under all strings reachable by deleting up to MAX_EDIT
+# characters from its prefix, so a lookup only generates deletes of the input
+# and compares against the few words sharing one. The index is built once per
+# process (and pickled next to the result cache); word corrections are
+# LRU-cached on top of it.
+import hashlib
+import os
+import pickle
+import re
+from collections import deque
+from functools import lru_cache
+
+import resources
+from result_cache import CACHE_DIR
+
+MAX_EDIT = 2
+PREFIX_LENGTH = 7
+MAX_SENTENCE_WORDS = 40
+DICTIONARY = os.environ.get("HA_SPELLING_DICT")  # "word count" per line; default: TextBlob's en-spelling.txt
+
+_SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+
+def edit_distance(a, b, limit):
+    # Optimal-string-alignment distance, or None once it must exceed `limit`
+    if abs(len(a) - len(b)) > limit:
+        return None
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+            row_min = min(row_min, d)
+        if row_min > limit:
+            return None
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else None
+
+
+def _deletes(word, max_edit):
+    found = {word}
+    frontier = [word]
+    for _ in range(max_edit):
+        nxt = []
+        for w in frontier:
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in found:
+                    found.add(d)
+                    nxt.append(d)
+        frontier = nxt
+    return found
+
+
+class SpellIndex:
+
+    def __init__(self, counts, max_edit=MAX_EDIT, prefix_length=PREFIX_LENGTH):
+        # counts: {word: frequency}; frequency breaks ties between equally close words
+        self.counts = dict(counts)
+        self.max_edit = max_edit
+        self.prefix_length = prefix_length
+        self.deletes = {}
+        for word in self.counts:
+            for d in _deletes(word[:prefix_length], max_edit):
+                self.deletes.setdefault(d, []).append(word)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def lookup(self, word):
+        # Closest dictionary word as (suggestion, distance), or None if nothing
+        # is within max_edit
+        if word in self.counts:
+            return word, 0
+        best, best_distance, best_count = None, self.max_edit + 1, 0
+        prefix = word[:self.prefix_length]
+        seen = {prefix}
+        candidates = deque([prefix])
+        while candidates:
+            candidate = candidates.popleft()
+            if len(prefix) - len(candidate) > best_distance:
+                break  # candidates come in order of deletions made
+            for suggestion in self.deletes.get(candidate, ()):
+                if abs(len(suggestion) - len(word)) > best_distance:
+                    continue
+                distance = edit_distance(word, suggestion, min(best_distance, self.max_edit))
+                if distance is None:
+                    continue
+                count = self.counts[suggestion]
+                if distance < best_distance or count > best_count:
+                    best, best_distance, best_count = suggestion, distance, count
+            if len(prefix) - len(candidate) < self.max_edit:
+                for i in range(len(candidate)):
+                    d = candidate[:i] + candidate[i + 1:]
+                    if d not in seen:
+                        seen.add(d)
+                        candidates.append(d)
+        return (best, best_distance) if best is not None else None
+
+
+def _dictionary_path():
+    if DICTIONARY:
+        return DICTIONARY
+    try:
+        import textblob
+    except ImportError:
+        return None
+    path = os.path.join(os.path.dirname(textblob.__file__), "en", "en-spelling.txt")
+    return path if os.path.exists(path) else None
+
+
+def load_counts(path):
+    counts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(";;;"):
+                continue
+            parts = line.split()
+            if parts and parts[0].isalpha():
+                word = parts[0].lower()
+                counts[word] = counts.get(word, 0) + (int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1)
+    return counts
+
+
+def _build_index():
+    # None if no dictionary is available. The pickled copy makes later
+    # processes start in well under a second.
+    path = _dictionary_path()
+    if path is None:
+        return None
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    pickled = os.path.join(CACHE_DIR, f"spell_index_{digest}_{MAX_EDIT}_{PREFIX_LENGTH}.pickle")
+    try:
+        with open(pickled, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    index = SpellIndex(load_counts(path))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{pickled}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, pickled)
+    except OSError:
+        pass
+    return index
+
+
+resources.register("spell_index", _build_index, teardown=lambda index: correct_word.cache_clear())
+
+
+def get_index():
+    # The process-wide index, built on first use
+    return resources.get("spell_index")
+
+
+@lru_cache(maxsize=50000)
+def correct_word(word):
+    # (suggestion, distance) for a lower-case word; distance 0 = known word,
+    # None = unknown with no close match
+    index = get_index()
+    if index is None:
+        return word, 0
+    return index.lookup(word)
+
+
+def check_text(text):
+    # Per-sentence issue report. Every issue is
+    # {"kind", "start", "end", "text", "suggestion", "message"} with character
+    # offsets into `text`.
+    sentences = []
+    word_count = 0
+    for s_match in _SENTENCE.finditer(text):
+        sentence = s_match.group()
+        if not sentence.strip():
+            continue
+        offset = s_match.start()
+        issues = []
+        words = list(_WORD.finditer(sentence))
+        word_count += len(words)
+        prev = None
+        for n, w in enumerate(words):
+            token = w.group()
+            start, end = offset + w.start(), offset + w.end()
+            lower = token.lower()
+            if n == 0 and token[0].islower():
+                issues.append({"kind": "capitalization", "start": start, "end": end, "text": token,
+                               "suggestion": token[0].upper() + token[1:],
+                               "message": "Sentence should start with a capital letter."})
+            elif token == "i":
+                issues.append({"kind": "capitalization", "start": start, "end": end, "text": token,
+                               "suggestion": "I", "message": "Capitalise 'I'."})
+            if prev is not None and lower == prev:
+                issues.append({"kind": "repetition", "start": start, "end": end, "text": token,
+                               "suggestion": "", "message": f"Repeated word '{token}'."})
+            prev = lower
+            # capitalised words mid-sentence are usually names; contractions aren't in the dictionary
+            if "'" in token or len(token) < 2 or (n > 0 and token[0].isupper()):
+                continue
+            found = correct_word(lower)
+            if found is None:
+                issues.append({"kind": "spelling", "start": start, "end": end, "text": token,
+                               "suggestion": "", "message": f"Unknown word '{token}'."})
+            elif found[1] > 0:
+                issues.append({"kind": "spelling", "start": start, "end": end, "text": token,
+                               "suggestion": found[0], "message": f"Did you mean '{found[0]}'?"})
+        if len(words) > MAX_SENTENCE_WORDS:
+            issues.append({"kind": "long_sentence", "start": offset, "end": s_match.end(), "text": "",
+                           "suggestion": "", "message": f"Long sentence ({len(words)} words) — consider splitting it."})
+        sentences.append({"start": offset, "end": s_match.end(), "issues": issues})
+    issue_count = sum(len(s["issues"]) for s in sentences)
+    return {
+        "sentences": sentences,
+        "word_count": word_count,
+        "issue_count": issue_count,
+        "spelling_issues": sum(1 for s in sentences for i in s["issues"] if i["kind"] == "spelling"),
+        "dictionary": get_index() is not None,
+    }
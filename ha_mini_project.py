@@ -1,57 +1,37 @@
 import streamlit as st
-import cv2
-from pydub import AudioSegment
-import random
+from feedback_engine import select
+from vad import detect_speech, pace_metrics
+from upload_ingest import session_ingest
+from workspace import QuotaExceeded
+from admission import admit, trim_notice, AdmissionError
+from audio_extract import load_pcm
+from analysis import analyze_frames, face_metrics
 
 # -----------------------------
 # Helper functions (all in one file)
 # -----------------------------
 
-def extract_audio_frames(video_file):
-    # Save uploaded video
-    video_path = "temp_video.mp4"
-    with open(video_path, "wb") as f:
-        f.write(video_file.getbuffer())
+def extract_audio(video_path):
+    # Extract audio as a 16 kHz mono PCM buffer, without writing a WAV file
+    return load_pcm(video_path)
 
-    # Extract frames
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    cap.release()
+def analyze_emotions(face, seed=None):
+    # `face` is an analysis.analyze_frames() result: the frames were decoded once,
+    # for the face mesh, and its stats say how many could be read
+    if face["stats"]["sampled"] == 0:
+        return ["No frames could be read from the video."]
 
-    # Extract audio
-    audio_path = "temp_audio.wav"
-    audio = AudioSegment.from_file(video_path)
-    audio.export(audio_path, format="wav")
+    # Phrases come from the "expressions" pack, steered by the smile / expression
+    # measured on the face mesh; the same seed gives the same feedback
+    metrics = face_metrics(face["points"])
+    return [text for _, text in select("expressions", metrics, seed=seed)]
 
-    return audio_path, frames
-
-def analyze_emotions(frames):
-    emotions = ["Happy", "Neutral", "Sad", "Angry", "Confident", "Nervous"]
-    strength = random.choice(emotions)
-    weakness = random.choice([e for e in emotions if e != strength])
-    feedback = [
-        f"Strength: You mostly appear {strength} in your expressions.",
-        f"Weakness: Try to reduce {weakness} expressions.",
-        "Body language: Looks confident." if random.random() > 0.3 else "Body language: Work on posture and gestures."
-    ]
-    return feedback
-
-def analyze_speech(audio_path):
-    speech_options = [
-        "Your speech clarity is good.",
-        "Try to speak more slowly for clarity.",
-        "Grammar is mostly correct.",
-        "Some grammar mistakes detected, practice speaking.",
-        "Voice tone is confident.",
-        "Voice tone could be improved."
-    ]
-    feedback = random.sample(speech_options, 3)
-    return feedback
+def analyze_speech(audio, seed=None):
+    # How much of the clip is speech (from the VAD) steers the clarity/tone phrases
+    metrics = {}
+    if len(audio):
+        metrics["speaking_ratio"] = round(pace_metrics(detect_speech(audio))["speaking_ratio"], 2)
+    return [text for _, text in select("speech", metrics, seed=seed)]
 
 def get_course_suggestions():
     courses = [
@@ -66,7 +46,7 @@ def get_course_suggestions():
 # -----------------------------
 st.set_page_config(page_title="Human Analytics", page_icon="👤")
 st.title("👤 Human Analytics Mini Project")
-st.markdown("Upload a short video (≤2 min) to get random feedback on your speech, expressions, grammar, and body language.")
+st.markdown("Upload a short video (≤2 min) to get feedback on your speech, expressions, grammar, and body language.")
 
 uploaded_file = st.file_uploader("Upload a video file", type=["mp4", "mov"])
 
@@ -76,12 +56,23 @@ if uploaded_file:
     if st.button("Analyze Video"):
         st.info("Processing...")
 
-        # Extract audio & frames
-        audio_path, frames = extract_audio_frames(uploaded_file)
-
-        # Get random feedback
-        emotion_feedback = analyze_emotions(frames)
-        speech_feedback = analyze_speech(audio_path)
+        # Extract audio & face landmarks from the upload, spooled once to a content-addressed file
+        # (shared with other sessions uploading the same video; never a fixed path)
+        try:
+            # overlong clips are cut to the limit (from the header's duration) before decoding
+            upload, clip = admit(session_ingest(st.session_state, uploaded_file, suffix=".mp4"))
+            if trim_notice(clip):
+                st.warning(trim_notice(clip))
+            with upload:
+                audio = extract_audio(upload.path)
+
+                # Feedback is seeded by the upload's content hash, so re-analysing a video gives the same report
+                face = analyze_frames(upload.path, upload.digest)  # cached under the content hash
+                emotion_feedback = analyze_emotions(face, seed=upload.digest)
+                speech_feedback = analyze_speech(audio, seed=upload.digest)
+        except (AdmissionError, QuotaExceeded) as e:
+            st.error(str(e))
+            st.stop()
 
         # Display feedback
         st.success("Analysis Complete!")
@@ -1,43 +1,65 @@
 import streamlit as st
-import moviepy.editor as mp
-import speech_recognition as sr
-from textblob import TextBlob
-import pandas as pd
-import os
+from sentiment import analyze_sentiment, warm_up
+from result_cache import get_cache
+from upload_ingest import session_ingest
+from workspace import QuotaExceeded
+from admission import admit, trim_notice, AdmissionError
+from analysis import analyze_audio_file, audio_key
+from jobs import get_job_manager, poll_job, JobQueueFull
+from results_store import get_store
+from vad import pace_metrics
+from fillers import find_fillers
+
+warm_up()  # load the sentiment lexicon while the user picks a file
 
 st.title("Human Analytics Mini Project")
 st.write("Upload a 2-minute video. The app will analyse your communication skills and give feedback.")
 
 # Upload Section
 uploaded_file = st.file_uploader("Upload your video (mp4/mov)", type=["mp4", "mov"])
+speaker = st.text_input("Your name (optional, to track progress)").strip()
 
 if uploaded_file:
     st.video(uploaded_file)
 
-    # Save video temporarily
-    with open("uploaded_video.mp4", "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # Extraction + transcription run as a background job (cached on disk under the
+    # upload's content hash); the page polls it and keeps the result across reruns
+    try:
+        # duration/resolution come from the container header; overlong clips are cut before decoding
+        upload, clip = admit(session_ingest(st.session_state, uploaded_file, suffix=".mp4"))
+    except (AdmissionError, QuotaExceeded) as e:
+        st.error(str(e))
+        st.stop()
+    if trim_notice(clip):
+        st.warning(trim_notice(clip))
+    state_key = f"audio_{upload.digest}"
+    job_key = f"job_{upload.digest}"
+    result = st.session_state.get(state_key) or get_cache().get(audio_key(upload.digest))
 
-    st.info("Extracting audio from video... Please wait...")
+    if result is None:
+        if job_key not in st.session_state:
+            try:
+                st.session_state[job_key] = get_job_manager().submit(
+                    analyze_audio_file, upload.path, upload.digest, cleanup=upload.hold())
+            except (QuotaExceeded, JobQueueFull) as e:
+                st.error(str(e))
+                st.stop()
+        st.info("Extracting audio from video... Please wait...")
+        job = poll_job(st.session_state[job_key])  # reruns the page until the job finishes
+        del st.session_state[job_key]
+        if job is None or job["status"] == "failed":
+            st.error("Audio extract nahi hua. Try another video.")
+            st.stop()
+        result = job["result"]
+    st.session_state[state_key] = result
+    upload.close()
 
-    # Extract audio from the uploaded video
-    try:
-        video = mp.VideoFileClip("uploaded_video.mp4")
-        video.audio.write_audiofile("audio.wav")
-        st.success("Audio extracted successfully!")
-    except Exception as e:
+    if result["duration"] == 0:
         st.error("Audio extract nahi hua. Try another video.")
         st.stop()
-
-    # Speech Recognition
-    recognizer = sr.Recognizer()
-    try:
-        with sr.AudioFile("audio.wav") as source:
-            audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio)
-    except:
+    text = result["text"]
+    if not text:
         st.error("Speech detect nahi hua. Video me awaaz clear honi chahiye.")
-        text = ""
 
     # Show transcript
     if text:
@@ -47,8 +69,8 @@ if uploaded_file:
     # Sentiment / Tone Analysis
     st.subheader("Feedback:")
     if text:
-        blob = TextBlob(text)
-        sentiment = blob.sentiment.polarity
+        tone = analyze_sentiment(text, result["segments"])
+        sentiment = tone["polarity"]
 
         if sentiment > 0.4:
             st.success("✔ Excellent tone! You sound confident and positive.")
@@ -56,6 +78,9 @@ if uploaded_file:
             st.info("✔ Good tone. Lekin thodi energy aur clarity improve karo.")
         else:
             st.warning("⚠ Tone weak laga. Confidence aur clarity improve karo.")
+        if len(tone["timeline"]) > 1:
+            st.caption("Tone over the talk (polarity per sentence)")
+            st.line_chart({"polarity": [t["polarity"] for t in tone["timeline"]]})
 
     # Strengths & Weaknesses (Simple Rules)
     st.subheader("Strengths & Weaknesses")
@@ -69,15 +94,33 @@ if uploaded_file:
     st.write("- Spoken English & Grammar Basics")
     st.write("- Body Language Mastery")
 
-    # Save Performance Data
-    if not os.path.exists("performance.csv"):
-        pd.DataFrame(columns=["Text_Length", "Sentiment"]).to_csv("performance.csv", index=False)
-
-    if text:
-        new_data = pd.DataFrame({
-            "Text_Length": [len(text)],
-            "Sentiment": [sentiment]
+    # Save Performance Data (batched into the shared SQLite store, once per analysis)
+    saved_key = f"saved_{state_key}"
+    if text and not st.session_state.get(saved_key):
+        st.session_state[saved_key] = True
+        word_count = len(text.split())
+        pace = pace_metrics(result["vad"], word_count=word_count)
+        fillers = find_fillers(text, duration_seconds=result["duration"])
+        get_store().record({
+            "content_hash": upload.digest,
+            "speaker": speaker or None,
+            "source": "human_app",
+            "duration": result["duration"],
+            "word_count": word_count,
+            "text_length": len(text),
+            "sentiment": sentiment,
+            "speaking_rate": pace["speaking_rate"],
+            "articulation_rate": pace["articulation_rate"],
+            "speaking_ratio": pace["speaking_ratio"],
+            "pause_count": pace["pause_count"],
+            "long_pause_count": pace["long_pause_count"],
+            "filler_count": fillers["count"],
+            "fillers_per_minute": fillers["per_minute"],
         })
-
-        new_data.to_csv("performance.csv", mode="a", header=False, index=False)
         st.success("Performance saved successfully!")
+
+    if speaker:
+        history = get_store().daily_counts(speaker=speaker)
+        if len(history) > 1:
+            st.subheader("Your progress")
+            st.line_chart(history.set_index("day")["sentiment"])
@@ -0,0 +1,242 @@
+# instrumentation.py
+# Per-stage timers and counters for the analysis pipeline.
+#
+#   with timer("transcribe"):
+#       ...
+#   inc("audio_seconds", duration)
+#
+# Every stage keeps a Prometheus-style histogram plus a bounded reservoir of
+# recent samples for p50/p95/p99. snapshot() feeds the app's KPI cards;
+# prometheus() renders the text exposition format, which can also be written
+# to HA_METRICS_FILE (textfile collector) or served on HA_METRICS_PORT.
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get("HA_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("HA_METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("HA_METRICS_HOST", "127.0.0.1")
+FILE_INTERVAL = 5.0      # seconds between metrics file rewrites
+RESERVOIR_SIZE = 2048    # recent samples kept per stage for quantiles
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_captured = None  # event list while capture() is active in this process
+
+
+def _quantile(ordered, q):
+    # nearest-rank quantile of an already sorted list
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(q * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class _Stage:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Registry:
+
+    def __init__(self, metrics_file=METRICS_FILE):
+        self.metrics_file = metrics_file
+        self.started = time.time()
+        self.last = None
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._file_written = 0.0
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self._stages.setdefault(stage, _Stage()).observe(seconds)
+            self.last = time.time()
+        self._record_capture(("observe", stage, seconds))
+        self._maybe_write_file()
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        self._record_capture(("inc", name, value))
+
+    @contextmanager
+    def timer(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    @staticmethod
+    def _record_capture(event):
+        events = _captured
+        if events is not None:
+            events.append(event)
+
+    def replay(self, events):
+        # Apply events captured in another process (see capture())
+        for kind, name, value in events:
+            if kind == "observe":
+                self.observe(name, value)
+            else:
+                self.inc(name, value)
+
+    def snapshot(self):
+        # {"stages": {name: {count, total, mean, max, p50, p95, p99}}, "counters", "started", "last"}
+        with self._lock:
+            stages = {}
+            for name, s in self._stages.items():
+                ordered = sorted(s.samples)
+                stages[name] = {
+                    "count": s.count,
+                    "total": s.total,
+                    "mean": s.total / s.count if s.count else 0.0,
+                    "max": s.max,
+                    **{f"p{int(q * 100)}": _quantile(ordered, q) for q in QUANTILES},
+                }
+            return {"stages": stages, "counters": dict(self._counters),
+                    "started": self.started, "last": self.last}
+
+    def bottleneck(self):
+        # (stage, seconds) of the stage with the most total time, or None
+        snap = self.snapshot()["stages"]
+        if not snap:
+            return None
+        name = max(snap, key=lambda n: snap[n]["total"])
+        return name, snap[name]["total"]
+
+    def prometheus(self):
+        snap = self.snapshot()
+        with self._lock:
+            buckets = {name: list(s.buckets) for name, s in self._stages.items()}
+        lines = [
+            "# HELP ha_stage_duration_seconds Time spent in each pipeline stage.",
+            "# TYPE ha_stage_duration_seconds histogram",
+        ]
+        for name, s in sorted(snap["stages"].items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets[name]):
+                cumulative += n
+                lines.append(f'ha_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'ha_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {s["count"]}')
+            lines.append(f'ha_stage_duration_seconds_sum{{stage="{name}"}} {s["total"]:.6f}')
+            lines.append(f'ha_stage_duration_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines += [
+            "# HELP ha_stage_latency_seconds Recent per-stage latency quantiles.",
+            "# TYPE ha_stage_latency_seconds gauge",
+        ]
+        for name, s in sorted(snap["stages"].items()):
+            for q in QUANTILES:
+                lines.append(f'ha_stage_latency_seconds{{stage="{name}",quantile="{q}"}} {s[f"p{int(q * 100)}"]:.6f}')
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"# TYPE ha_{name}_total counter")
+            lines.append(f"ha_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def _maybe_write_file(self):
+        if not self.metrics_file:
+            return
+        now = time.monotonic()
+        if now - self._file_written < FILE_INTERVAL:
+            return
+        self._file_written = now
+        try:
+            self.write_prometheus(self.metrics_file)
+        except OSError:
+            pass  # metrics must never break an analysis
+
+
+@contextmanager
+def capture():
+    # Collects this process's observations (from every thread, e.g. the
+    # transcription pool) as well as recording them, so a worker process can
+    # send them back to the parent's registry (jobs.py). Process-wide: meant
+    # for job worker processes, which run one job at a time.
+    global _captured
+    _captured = events = []
+    try:
+        yield events
+    finally:
+        _captured = None
+
+
+def serve(registry, port, host=METRICS_HOST):
+    # Plain-text /metrics endpoint on a daemon thread (localhost unless HA_METRICS_HOST says otherwise)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    # One registry per process (the server, or a worker that forwards via capture())
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            # worker processes forward to the server instead of exporting themselves
+            main = multiprocessing.parent_process() is None
+            _registry = Registry(metrics_file=METRICS_FILE if main else None)
+            if METRICS_PORT and main:
+                try:
+                    serve(_registry, METRICS_PORT)
+                except OSError:
+                    pass  # port already taken by another server process
+        return _registry
+
+
+def timer(stage):
+    return get_registry().timer(stage)
+
+
+def observe(stage, seconds):
+    get_registry().observe(stage, seconds)
+
+
+def inc(name, value=1):
+    get_registry().inc(name, value)
+
+
+def snapshot():
+    return get_registry().snapshot()
@@ -0,0 +1,184 @@
+# jobs.py
+# Background job queue so analyses don't run on the Streamlit script thread.
+# submit() returns a job id (kept in st.session_state by the pages); the work
+# runs on a bounded thread or process pool and reports per-stage progress that
+# the page polls. The manager is process-wide, so results survive reruns.
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from instrumentation import capture, get_registry, inc
+
+JOB_MODE = os.environ.get("HA_JOB_MODE", "thread")  # "thread" or "process"
+JOB_WORKERS = int(os.environ.get("HA_JOB_WORKERS", "4"))
+MAX_PENDING = 64
+MAX_RETAINED = 256
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class _Reporter:
+    # Passed to the job function as `progress`; picklable in process mode
+    def __init__(self, job_id, sink):
+        self.job_id = job_id
+        self.sink = sink
+
+    def __call__(self, stage, fraction=None):
+        self.sink.put((self.job_id, stage, fraction))
+
+
+def _run(fn, args, kwargs, progress):
+    progress("running", 0.0)
+    return fn(*args, progress=progress, **kwargs)
+
+
+def _run_captured(fn, args, kwargs, progress):
+    # Process mode: stage timings recorded in the worker are returned with the
+    # result and replayed into the server's metrics registry
+    with capture() as events:
+        result = _run(fn, args, kwargs, progress)
+    return result, events
+
+
+class JobManager:
+
+    def __init__(self, max_workers=JOB_WORKERS, mode=JOB_MODE):
+        self.mode = mode
+        self.max_workers = max_workers
+        if mode == "process":
+            import multiprocessing
+            ctx = multiprocessing.get_context("spawn")
+            self._mp_manager = ctx.Manager()
+            self._updates = self._mp_manager.Queue()
+            self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
+        elif mode == "thread":
+            self._mp_manager = None
+            self._updates = queue.Queue()
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ha-job")
+        else:
+            raise ValueError(f"Unknown job mode: {mode}")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._drain = threading.Thread(target=self._drain_updates, daemon=True)
+        self._drain.start()
+
+    def submit(self, fn, *args, cleanup=None, **kwargs):
+        # fn(*args, progress=..., **kwargs); in process mode fn must be importable.
+        # `cleanup` runs in this process once the job has finished either way,
+        # or straight away if the job can't be queued (so a hold taken for it
+        # is never leaked).
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j["status"] in (QUEUED, RUNNING))
+            if pending >= MAX_PENDING:
+                if cleanup is not None:
+                    cleanup()
+                raise JobQueueFull(f"{pending} analyses are already queued — please try again shortly.")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id, "status": QUEUED, "stage": "queued", "progress": 0.0,
+                "result": None, "error": None,
+                "submitted": time.time(), "started": None, "finished": None,
+            }
+        run = _run_captured if self.mode == "process" else _run
+        try:
+            future = self._pool.submit(run, fn, args, kwargs, _Reporter(job_id, self._updates))
+        except BaseException:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            if cleanup is not None:
+                cleanup()
+            raise
+        future.add_done_callback(lambda f: self._finish(job_id, f, cleanup))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _finish(self, job_id, future, cleanup):
+        try:
+            result, error = future.result(), None
+            if self.mode == "process":
+                result, events = result
+                get_registry().replay(events)
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        inc("jobs_failed" if error else "jobs_completed")
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(result=result, error=error, finished=time.time(),
+                           status=FAILED if error else DONE,
+                           stage="failed" if error else "done",
+                           progress=job["progress"] if error else 1.0)
+            self._prune()
+        if cleanup is not None:
+            cleanup()
+
+    def _drain_updates(self):
+        while not self._closed:
+            try:
+                job_id, stage, fraction = self._updates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in (DONE, FAILED):
+                    continue
+                if job["status"] == QUEUED:
+                    job["status"], job["started"] = RUNNING, time.time()
+                job["stage"] = stage
+                if fraction is not None:
+                    job["progress"] = fraction
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j["status"] in (DONE, FAILED)]
+        if len(finished) > MAX_RETAINED:
+            finished.sort(key=lambda j: j["finished"])
+            for j in finished[: len(finished) - MAX_RETAINED]:
+                del self._jobs[j["id"]]
+
+    def shutdown(self, wait=True):
+        self._closed = True
+        self._pool.shutdown(wait=wait)
+        if self._mp_manager is not None:
+            self._mp_manager.shutdown()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    # One manager per server process, shared by every session and rerun
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def poll_job(job_id, interval=0.5):
+    # Streamlit helper: while the job is queued/running, show its stage and
+    # progress and rerun the page after `interval` seconds (other widgets stay
+    # responsive meanwhile). Returns the job record once it has finished, or
+    # None if the job id is unknown.
+    import streamlit as st
+    job = get_job_manager().get(job_id)
+    if job is None or job["status"] in (DONE, FAILED):
+        return job
+    label = "Waiting for a free worker..." if job["status"] == QUEUED else f"{job['stage'].capitalize()}..."
+    st.progress(min(1.0, max(0.0, job["progress"])), text=label)
+    time.sleep(interval)
+    st.rerun()
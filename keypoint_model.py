@@ -0,0 +1,82 @@
+# keypoint_model.py
+# Vectorised activity scorer over pose keypoints (MediaPipe Pose naming:
+# "<joint>_x", "<joint>_y" per row, image coordinates with y pointing down).
+# Scores a whole block of rows with one matrix product + softmax.
+import numpy as np
+
+LABELS = ("walk", "run", "sit", "stand")
+
+JOINTS = (
+    "left_shoulder", "right_shoulder", "left_wrist", "right_wrist",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+)
+KEYPOINT_COLUMNS = tuple(f"{j}_{axis}" for j in JOINTS for axis in ("x", "y"))
+
+FEATURES = ("thigh_drop", "knee_bend", "stride", "arm_swing", "torso_lean")
+
+# Hand-set baseline weights (FEATURES x LABELS); replace with trained ones via load()
+DEFAULT_WEIGHTS = np.array([
+    #  walk   run   sit  stand
+    [  1.5,  1.0, -4.0,  2.0],   # thigh_drop: knees well below hips unless sitting
+    [  0.5,  2.0,  3.0, -2.0],   # knee_bend
+    [  3.0,  5.0, -2.0, -3.0],   # stride: ankle separation
+    [  1.0,  3.0, -1.0, -1.5],   # arm_swing
+    [  0.0,  2.0,  0.5, -0.5],   # torso_lean
+], dtype=np.float32)
+DEFAULT_BIAS = np.array([-1.5, -3.0, 0.0, 1.0], dtype=np.float32)
+
+
+def _xy(block, joint):
+    return block[:, KEYPOINT_COLUMNS.index(f"{joint}_x")], block[:, KEYPOINT_COLUMNS.index(f"{joint}_y")]
+
+
+def keypoint_features(block):
+    # block: (n, len(KEYPOINT_COLUMNS)) float32 -> (n, len(FEATURES)), all
+    # distances normalised by torso length so camera distance doesn't matter
+    sx = (_xy(block, "left_shoulder")[0] + _xy(block, "right_shoulder")[0]) / 2
+    sy = (_xy(block, "left_shoulder")[1] + _xy(block, "right_shoulder")[1]) / 2
+    hx = (_xy(block, "left_hip")[0] + _xy(block, "right_hip")[0]) / 2
+    hy = (_xy(block, "left_hip")[1] + _xy(block, "right_hip")[1]) / 2
+    ky = (_xy(block, "left_knee")[1] + _xy(block, "right_knee")[1]) / 2
+    ay = (_xy(block, "left_ankle")[1] + _xy(block, "right_ankle")[1]) / 2
+    torso = np.hypot(sx - hx, sy - hy)
+    torso = np.where(torso > 1e-6, torso, np.nan)
+
+    lax, _ = _xy(block, "left_ankle")
+    rax, _ = _xy(block, "right_ankle")
+    lwx, lwy = _xy(block, "left_wrist")
+    rwx, rwy = _xy(block, "right_wrist")
+
+    thigh_drop = (ky - hy) / torso
+    knee_bend = 1.0 - np.clip((ay - hy) / (2 * torso), 0, 1)
+    stride = np.abs(lax - rax) / torso
+    arm_swing = np.hypot(lwx - rwx, lwy - rwy) / torso
+    torso_lean = np.abs(sx - hx) / torso
+    feats = np.stack([thigh_drop, knee_bend, stride, arm_swing, torso_lean], axis=1)
+    return np.nan_to_num(feats, nan=0.0).astype(np.float32)
+
+
+class ActivityModel:
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, bias=DEFAULT_BIAS, labels=LABELS):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels = np.asarray(labels)
+
+    @classmethod
+    def load(cls, path):
+        # .npz with "weights", "bias" and "labels"
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], data["labels"])
+
+    def predict_proba(self, features):
+        logits = features @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        e = np.exp(logits)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, features):
+        # -> (labels, confidences) for every row
+        proba = self.predict_proba(features)
+        best = proba.argmax(axis=1)
+        return self.labels[best], proba[np.arange(len(best)), best]
@@ -0,0 +1,128 @@
+# landmarks.py
+# Collects face-mesh landmarks for all sampled frames into one (frames, 468, 3)
+# float32 array and computes expression metrics over the whole clip at once.
+import numpy as np
+
+N_LANDMARKS = 468
+
+# Face-mesh indices used by the metrics
+MOUTH_LEFT, MOUTH_RIGHT, LIP_TOP, LIP_BOTTOM = 61, 291, 13, 14
+LEFT_EYE_OUTER, LEFT_EYE_INNER, LEFT_EYE_TOP, LEFT_EYE_BOTTOM = 33, 133, 159, 145
+RIGHT_EYE_INNER, RIGHT_EYE_OUTER, RIGHT_EYE_TOP, RIGHT_EYE_BOTTOM = 362, 263, 386, 374
+NOSE_TIP, FOREHEAD, CHIN = 1, 10, 152
+
+
+class LandmarkStore:
+    # Append-only store; landmarks are kept in pixel coordinates (x*w, y*h, z*w)
+    # so distances are not distorted by the frame's aspect ratio.
+
+    def __init__(self, capacity=150):
+        self._data = np.empty((max(1, capacity), N_LANDMARKS, 3), dtype=np.float32)
+        self._frames = []
+        self._times = []
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def add(self, landmarks, width, height, frame_index=None, timestamp=None):
+        # `landmarks` is a mediapipe NormalizedLandmarkList.landmark sequence
+        if self._n == len(self._data):
+            grown = np.empty((len(self._data) * 2, N_LANDMARKS, 3), dtype=np.float32)
+            grown[: self._n] = self._data[: self._n]
+            self._data = grown
+        row = self._data[self._n]
+        row[:] = [(p.x, p.y, p.z) for p in landmarks[:N_LANDMARKS]]
+        row *= np.array([width, height, width], dtype=np.float32)
+        self._frames.append(frame_index if frame_index is not None else self._n)
+        self._times.append(timestamp if timestamp is not None else float(self._n))
+        self._n += 1
+
+    def add_array(self, points, frame_index=None, timestamp=None):
+        # `points` is an already-converted (468, 3) pixel-space array
+        if self._n == len(self._data):
+            grown = np.empty((len(self._data) * 2, N_LANDMARKS, 3), dtype=np.float32)
+            grown[: self._n] = self._data[: self._n]
+            self._data = grown
+        self._data[self._n] = points
+        self._frames.append(frame_index if frame_index is not None else self._n)
+        self._times.append(timestamp if timestamp is not None else float(self._n))
+        self._n += 1
+
+    @property
+    def points(self):
+        return self._data[: self._n]
+
+    @property
+    def frame_indices(self):
+        return np.asarray(self._frames, dtype=np.int64)
+
+    @property
+    def timestamps(self):
+        return np.asarray(self._times, dtype=np.float64)
+
+    def metrics(self):
+        return expression_metrics(self.points)
+
+    def summary(self):
+        return summarize(self.metrics())
+
+
+def _dist(pts, a, b):
+    return np.linalg.norm(pts[:, a, :2] - pts[:, b, :2], axis=1)
+
+
+def _safe_div(num, den):
+    out = np.full(num.shape, np.nan, dtype=np.float32)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def mouth_ratio(pts):
+    # Mouth opening relative to mouth width (the old per-frame "smile index")
+    return _safe_div(_dist(pts, LIP_TOP, LIP_BOTTOM), _dist(pts, MOUTH_LEFT, MOUTH_RIGHT))
+
+
+def eye_openness(pts):
+    left = _safe_div(_dist(pts, LEFT_EYE_TOP, LEFT_EYE_BOTTOM), _dist(pts, LEFT_EYE_OUTER, LEFT_EYE_INNER))
+    right = _safe_div(_dist(pts, RIGHT_EYE_TOP, RIGHT_EYE_BOTTOM), _dist(pts, RIGHT_EYE_INNER, RIGHT_EYE_OUTER))
+    return (left + right) / 2
+
+
+def head_pose(pts):
+    # Rough yaw / pitch / roll proxies (no camera model):
+    #   yaw   -> nose offset from the eye midpoint, in inter-ocular distances
+    #   pitch -> nose height between forehead and chin (0.5 ~ looking straight)
+    #   roll  -> angle of the eye line in degrees
+    le = pts[:, LEFT_EYE_OUTER, :2]
+    re = pts[:, RIGHT_EYE_OUTER, :2]
+    nose = pts[:, NOSE_TIP, :2]
+    eye_mid = (le + re) / 2
+    ocular = np.linalg.norm(re - le, axis=1)
+    yaw = _safe_div(nose[:, 0] - eye_mid[:, 0], ocular)
+    face_h = pts[:, CHIN, 1] - pts[:, FOREHEAD, 1]
+    pitch = _safe_div(nose[:, 1] - pts[:, FOREHEAD, 1], face_h)
+    roll = np.degrees(np.arctan2(re[:, 1] - le[:, 1], re[:, 0] - le[:, 0])).astype(np.float32)
+    return yaw, pitch, roll
+
+
+def expression_metrics(pts):
+    # One time series per metric, aligned with the store's frames
+    yaw, pitch, roll = head_pose(pts)
+    return {
+        "mouth_ratio": mouth_ratio(pts),
+        "eye_openness": eye_openness(pts),
+        "yaw": yaw,
+        "pitch": pitch,
+        "roll": roll,
+    }
+
+
+def summarize(series):
+    out = {}
+    for name, values in series.items():
+        if len(values) and not np.all(np.isnan(values)):
+            out[name] = {"mean": float(np.nanmean(values)), "std": float(np.nanstd(values))}
+        else:
+            out[name] = {"mean": float("nan"), "std": float("nan")}
+    return out
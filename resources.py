@@ -0,0 +1,114 @@
+# resources.py
+# Lazy imports and process-wide heavy objects.
+#
+# Streamlit re-executes a page on every interaction, and a cold worker used to
+# import mediapipe, cv2, textblob and friends before drawing anything. Modules
+# now bind heavy libraries with lazy_import() (the real import happens on
+# first attribute access, i.e. when the stage actually runs), and expensive
+# objects (FaceMesh, Pose, recognisers, lexicons) are registered here once
+# and created on first get(), like st.cache_resource but usable from jobs and
+# the batch CLI too. teardown() releases them explicitly (also at exit).
+import atexit
+import importlib
+import threading
+import time
+
+_import_seconds = {}
+
+
+def load(name):
+    # importlib.import_module, recording how long the first (cold) import took
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_seconds.setdefault(name, time.perf_counter() - t0)
+    return module
+
+
+class LazyModule:
+    # Stands in for a module until one of its attributes is first used
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = load(self.__dict__["_name"])
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def import_times():
+    # {module: seconds} for the lazy imports done so far in this process
+    return dict(_import_seconds)
+
+
+# ---------- process-wide resources ----------
+_factories = {}    # name -> (factory, teardown)
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+_teardown_hooks = []
+
+
+def register(name, factory, teardown=None):
+    # factory() builds the object on first get(); teardown(obj) releases it
+    with _registry_lock:
+        _factories[name] = (factory, teardown)
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    lock = _locks[name]
+    with lock:
+        if name not in _instances:
+            _instances[name] = _factories[name][0]()
+        return _instances[name]
+
+
+def loaded(name):
+    return name in _instances
+
+
+def warm(*names):
+    # Build resources on a background thread so the first request doesn't pay for them
+    missing = [n for n in names if n not in _instances]
+    if missing:
+        threading.Thread(target=lambda: [get(n) for n in missing], daemon=True).start()
+
+
+def on_teardown(fn):
+    # Extra cleanup to run from teardown() (e.g. shutting down process pools)
+    _teardown_hooks.append(fn)
+    return fn
+
+
+def teardown(name=None):
+    # Release one resource, or everything (resources and hooks) when name is None
+    names = [name] if name is not None else list(_instances)
+    for n in names:
+        with _locks[n]:
+            obj = _instances.pop(n, None)
+            release = _factories[n][1]
+        if obj is not None and release is not None:
+            try:
+                release(obj)
+            except Exception:
+                pass
+    if name is None:
+        for hook in list(_teardown_hooks):
+            try:
+                hook()
+            except Exception:
+                pass
+
+
+atexit.register(teardown)
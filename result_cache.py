@@ -0,0 +1,160 @@
+# result_cache.py
+# Persistent on-disk cache for analysis results, keyed by the content of the
+# upload (streaming SHA-256) plus the pipeline version and parameters.
+# Each entry is <key>.json (plain values) and, if needed, <key>.npz (arrays).
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+# Bump when any stage changes its output so old entries stop matching
+PIPELINE_VERSION = "2"
+
+CACHE_DIR = os.environ.get("HA_CACHE_DIR", ".ha_cache")
+CACHE_MAX_BYTES = int(os.environ.get("HA_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_upload(source, chunk_size=CHUNK_SIZE):
+    # SHA-256 of a file path or file-like object (e.g. a Streamlit UploadedFile),
+    # read in chunks so the whole upload is never copied.
+    h = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    if hasattr(source, "getbuffer"):
+        buf = source.getbuffer()
+        try:
+            for i in range(0, buf.nbytes, chunk_size):
+                h.update(buf[i:i + chunk_size])
+        finally:
+            buf.release()
+        return h.hexdigest()
+    pos = source.tell()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        h.update(chunk)
+    source.seek(pos)
+    return h.hexdigest()
+
+
+def cache_key(content_hash, stage, version=PIPELINE_VERSION, params=None):
+    payload = json.dumps([content_hash, stage, version, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    # LRU by file mtime: reads touch the entry, writes evict the least recently
+    # used entries once the directory grows past max_bytes.
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key + ext)
+
+    def get(self, key):
+        meta_path = self._path(key, ".json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        arrays = value.pop("__arrays__", [])
+        if arrays:
+            try:
+                with np.load(self._path(key, ".npz")) as data:
+                    for name in arrays:
+                        value[name] = data[name]
+            except (OSError, KeyError, ValueError):
+                return None
+            self._touch(self._path(key, ".npz"))
+        self._touch(meta_path)
+        return value
+
+    def put(self, key, value):
+        meta = {k: v for k, v in value.items() if not isinstance(v, np.ndarray)}
+        arrays = {k: v for k, v in value.items() if isinstance(v, np.ndarray)}
+        meta["__arrays__"] = sorted(arrays)
+        if arrays:
+            self._atomic_write(self._path(key, ".npz"), lambda f: np.savez(f, **arrays))
+        # json last: an entry only becomes visible once all its parts exist
+        self._atomic_write(self._path(key, ".json"),
+                           lambda f: f.write(json.dumps(meta, default=_json_default).encode("utf-8")))
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        with self._lock:
+            entries = {}
+            total = 0
+            for e in os.scandir(self.root):
+                if not e.is_file() or e.name.startswith("."):
+                    continue
+                st = e.stat()
+                key = e.name.split(".", 1)[0]
+                size, mtime = entries.get(key, (0, 0))
+                entries[key] = (size + st.st_size, max(mtime, st.st_mtime))
+                total += st.st_size
+            if total <= self.max_bytes:
+                return
+            for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+                for ext in (".json", ".npz"):
+                    try:
+                        os.remove(self._path(key, ext))
+                    except OSError:
+                        pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _atomic_write(self, path, write):
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Not JSON serializable: {type(obj).__name__}")
+
+
+_cache = None
+
+
+def get_cache():
+    # One cache object per process, shared by every session
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
@@ -0,0 +1,192 @@
+# results_store.py
+# SQLite (WAL mode) store for analysis results, replacing the unlocked
+# performance.csv append. Writes from all sessions go through one background
+# writer thread that commits them in batches; reads use their own connection
+# and can run while a batch is being written.
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+RESULTS_DB = os.environ.get("HA_RESULTS_DB", "results.db")
+BATCH_SIZE = 200
+FLUSH_SECONDS = 0.25
+
+# Metric columns; anything else passed to record() goes into the JSON `extra` column
+COLUMNS = [
+    ("content_hash", "TEXT"),
+    ("speaker", "TEXT"),
+    ("created_at", "REAL NOT NULL"),  # unix time
+    ("source", "TEXT"),               # which app / batch run wrote the row
+    ("duration", "REAL"),
+    ("word_count", "INTEGER"),
+    ("text_length", "INTEGER"),
+    ("sentiment", "REAL"),
+    ("speaking_rate", "REAL"),
+    ("articulation_rate", "REAL"),
+    ("speaking_ratio", "REAL"),
+    ("pause_count", "INTEGER"),
+    ("long_pause_count", "INTEGER"),
+    ("filler_count", "INTEGER"),
+    ("fillers_per_minute", "REAL"),
+    ("mouth_ratio_mean", "REAL"),
+    ("eye_openness_mean", "REAL"),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{name} {kind}" for name, kind in COLUMNS)},
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_speaker_time ON analyses (speaker, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_time ON analyses (created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_hash ON analyses (content_hash);
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ResultsStore:
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        with _connect(path) as conn:
+            conn.executescript(SCHEMA)
+        self._queue = queue.Queue()
+        self._read_conn = _connect(path)
+        self._read_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    # ---------- writes ----------
+    def record(self, row):
+        # Queue one analysis for the next batch; returns immediately
+        row = dict(row)
+        row.setdefault("created_at", time.time())
+        values = [row.pop(name, None) for name in COLUMN_NAMES]
+        values.append(json.dumps(row, default=str) if row else None)
+        self._queue.put(values)
+
+    def flush(self, timeout=5.0):
+        # Wait until everything queued so far is committed; False if that took
+        # longer than `timeout` seconds (None waits as long as it takes)
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        sql = (f"INSERT INTO analyses ({', '.join(COLUMN_NAMES)}, extra) "
+               f"VALUES ({', '.join('?' * (len(COLUMN_NAMES) + 1))})")
+        while True:
+            batch, events = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while True:
+                if isinstance(item, threading.Event):
+                    events.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(sql, batch)
+                except sqlite3.Error as e:
+                    print(f"results_store: dropped {len(batch)} rows: {e}", file=sys.stderr)
+            for event in events:
+                event.set()
+
+    # ---------- reads ----------
+    def query(self, speaker=None, since=None, until=None, columns=None, limit=None):
+        # Rows as a DataFrame, newest first, filtered on the indexed columns
+        import pandas as pd
+        cols = columns or (["id"] + COLUMN_NAMES)
+        where, params = [], []
+        if speaker is not None:
+            where.append("speaker = ?")
+            params.append(speaker)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        sql = f"SELECT {', '.join(cols)} FROM analyses"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._read_lock:
+            return pd.read_sql_query(sql, self._read_conn, params=params)
+
+    def speaker_summary(self, since=None):
+        # Per-speaker aggregates computed inside SQLite, so dashboards don't
+        # have to load every row
+        import pandas as pd
+        sql = ("SELECT speaker, COUNT(*) AS analyses, MAX(created_at) AS last_at, "
+               "AVG(sentiment) AS sentiment, AVG(speaking_rate) AS speaking_rate, "
+               "AVG(fillers_per_minute) AS fillers_per_minute FROM analyses")
+        params = []
+        if since is not None:
+            sql += " WHERE created_at >= ?"
+            params.append(since)
+        sql += " GROUP BY speaker ORDER BY analyses DESC"
+        with self._read_lock:
+            return pd.read_sql_query(sql, self._read_conn, params=params)
+
+    def daily_counts(self, speaker=None, since=None):
+        import pandas as pd
+        sql = ("SELECT date(created_at, 'unixepoch') AS day, COUNT(*) AS analyses, "
+               "AVG(sentiment) AS sentiment FROM analyses")
+        where, params = [], []
+        if speaker is not None:
+            where.append("speaker = ?")
+            params.append(speaker)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY day ORDER BY day"
+        with self._read_lock:
+            return pd.read_sql_query(sql, self._read_conn, params=params)
+
+    def import_csv(self, csv_path="performance.csv"):
+        # One-off migration of the old performance.csv (Text_Length, Sentiment)
+        import pandas as pd
+        created = os.path.getmtime(csv_path)
+        for chunk in pd.read_csv(csv_path, chunksize=10000):
+            for text_length, sentiment in zip(chunk["Text_Length"], chunk["Sentiment"]):
+                self.record({"text_length": int(text_length), "sentiment": float(sentiment),
+                             "source": "performance.csv", "created_at": created})
+        self.flush(timeout=None)  # a large CSV can take longer than the default to commit
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # One store (and writer thread) per server process
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+        return _store
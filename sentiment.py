@@ -0,0 +1,87 @@
+# sentiment.py
+# One shared polarity engine for every page. TextBlob's pattern analyzer loads
+# its lexicon on first use; here that happens once per process (warm_up()
+# starts it in the background when a page is first imported) instead of on
+# the first request, and the same analyzer scores whole transcripts,
+# sentences and transcript segments in one batch call.
+import re
+
+import resources
+
+_SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+
+
+def _make_analyzer():
+    analyzer = resources.load("textblob.sentiments").PatternAnalyzer()
+    analyzer.analyze("warm up")  # forces the lexicon load
+    return analyzer
+
+
+resources.register("sentiment", _make_analyzer)
+
+
+def get_analyzer():
+    return resources.get("sentiment")
+
+
+def warm_up():
+    # Load the lexicon on a background thread so the first analysis doesn't wait for it
+    resources.warm("sentiment")
+
+
+def score_texts(texts):
+    # [(polarity, subjectivity), ...] for a batch of texts; repeated texts are scored once
+    analyzer = get_analyzer()
+    scores = {}
+    for text in texts:
+        if text not in scores:
+            s = analyzer.analyze(text) if text.strip() else (0.0, 0.0)
+            scores[text] = (float(s[0]), float(s[1]))
+    return [scores[text] for text in texts]
+
+
+def polarity(text):
+    return score_texts([text])[0][0]
+
+
+def split_sentences(text):
+    # [(start_char, sentence), ...]
+    return [(m.start(), m.group().strip()) for m in _SENTENCE.finditer(text) if m.group().strip()]
+
+
+def analyze_sentiment(text, segments=None):
+    # Returns {"polarity", "subjectivity", "sentences", "timeline"}.
+    # sentences: [{"start_char", "text", "polarity"}]
+    # timeline: [{"start", "end", "text", "polarity"}] per sentence, timed by
+    # spreading each transcript segment's duration over its words (empty
+    # without `segments`).
+    sentences = split_sentences(text)
+    timed = []
+    for seg in segments or []:
+        parts = split_sentences(seg["text"])
+        total = sum(len(p.split()) for _, p in parts) or 1
+        duration = seg["end"] - seg["start"]
+        done = 0
+        for _, part in parts:
+            n = len(part.split())
+            timed.append({"start": seg["start"] + duration * done / total,
+                          "end": seg["start"] + duration * (done + n) / total,
+                          "text": part})
+            done += n
+
+    # one batch: whole text, its sentences, then the timed sentences
+    scores = score_texts([text] + [s for _, s in sentences] + [t["text"] for t in timed])
+    overall, rest = scores[0], scores[1:]
+    for entry, (p, _) in zip(timed, rest[len(sentences):]):
+        entry["polarity"] = p
+    return {
+        "polarity": overall[0],
+        "subjectivity": overall[1],
+        "sentences": [{"start_char": start, "text": s, "polarity": p}
+                      for (start, s), (p, _) in zip(sentences, rest[:len(sentences)])],
+        "timeline": timed,
+    }
+
+
+def label(polarity_value):
+    return "Positive" if polarity_value > 0.1 else ("Negative" if polarity_value < -0.1 else "Neutral")
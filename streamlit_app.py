@@ -1,39 +1,69 @@
 import streamlit as st
-from moviepy.editor import VideoFileClip
-import tempfile, os
-import speech_recognition as sr
+import os, hashlib
 import numpy as np
-import mediapipe as mp
-import cv2
-from textblob import TextBlob
+from sentiment import analyze_sentiment, label, warm_up
+from landmarks import expression_metrics, summarize
+from grammar_check import check_text
+from result_cache import get_cache, cache_key
+from upload_ingest import session_ingest
+from workspace import QuotaExceeded
+from admission import admit, trim_notice, open_resumable, upload_server, AdmissionError
+from vad import pace_metrics
+from analysis import analyze_video_file, cached_video_analysis
+from jobs import get_job_manager, poll_job, JobQueueFull
 
 st.set_page_config(page_title="Human Analytics", layout="centered")
+warm_up()  # load the sentiment lexicon while the user picks a file
 
 st.title("Human Analytics — Quick Feedback 🎥🗣️")
 st.write("Upload a short video (max 2 minutes). The app will transcribe audio, check pace & sentiment, and give simple expression feedback.")
 
 uploaded = st.file_uploader("Upload your video (mp4/mov)", type=["mp4","mov","mkv","webm"])
-if uploaded:
-    tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    tfile.write(uploaded.read())
-    video_path = tfile.name
-
-    st.video(video_path, start_time=0)
-
-    # --- Extract audio ---
-    st.info("Extracting audio and transcribing (may take 10–60s)...")
-    clip = VideoFileClip(video_path)
-    audio_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-    clip.audio.write_audiofile(audio_path, verbose=False, logger=None)
-
-    # --- Transcribe using Google Web Speech (speech_recognition) ---
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_path) as source:
-        audio_data = recognizer.record(source)
+# large files can also be sent in resumable chunks to the upload endpoint (see README)
+resume_port = upload_server()
+resume_id = st.text_input(f"…or the ID of a finished resumable upload (port {resume_port})").strip() if resume_port else ""
+if uploaded or resume_id:
+    # Streamlit reruns this script on every widget change, so the analysis runs as a
+    # background job once per upload; its result (also cached on disk under the
+    # upload's content hash) is kept in the session for later reruns
     try:
-        text = recognizer.recognize_google(audio_data)
+        # duration/resolution come from the container header; overlong clips are cut before decoding
+        upload = session_ingest(st.session_state, uploaded, suffix=".mp4") if uploaded else open_resumable(resume_id)
+        upload, clip = admit(upload)
+    except (AdmissionError, QuotaExceeded) as e:
+        st.error(str(e))
+        st.stop()
+    digest = upload.digest
+    if trim_notice(clip):
+        st.warning(trim_notice(clip))
+    st.video(uploaded if uploaded and not clip["trimmed"] else upload.path, start_time=0)
+
+    state_key = f"analysis_{digest}"
+    job_key = f"job_{digest}"
+    analysis = st.session_state.get(state_key) or cached_video_analysis(digest)
+    if analysis is None:
+        if job_key not in st.session_state:
+            try:
+                st.session_state[job_key] = get_job_manager().submit(
+                    analyze_video_file, upload.path, digest, cleanup=upload.hold())
+            except (QuotaExceeded, JobQueueFull) as e:
+                st.error(str(e))
+                st.stop()
+        st.info("Extracting audio, transcribing and analysing facial expression (may take 10–60s)...")
+        job = poll_job(st.session_state[job_key])  # reruns the page until the job finishes
+        del st.session_state[job_key]
+        if job is None or job["status"] == "failed":
+            st.error("Analysis failed — please try another video.")
+            st.stop()
+        analysis = job["result"]
+    st.session_state[state_key] = analysis
+    audio_result = analysis["audio"]
+    frames_result = analysis["frames"]
+
+    text = audio_result["text"]
+    if text:
         st.success("Transcription done.")
-    except Exception as e:
+    else:
         st.warning("Auto-transcription failed or not available. You can paste/type transcript below.")
         text = st.text_area("Paste / type transcript (if auto-transcribe failed):", height=150)
 
@@ -41,80 +71,77 @@ if uploaded:
         st.subheader("Transcript")
         st.write(text)
 
-        # Speaking rate
+        # Speaking rate and pauses, measured from the waveform
         words = text.split()
-        duration_sec = clip.duration
-        wpm = (len(words) / duration_sec) * 60 if duration_sec > 0 else 0
+        pace = pace_metrics(audio_result["vad"], word_count=len(words))
+        wpm = pace["speaking_rate"]
         st.metric("Speaking rate (words per minute)", f"{wpm:.0f} wpm")
-
-        # Sentiment / grammar rough check
-        tb = TextBlob(text)
-        polarity = tb.sentiment.polarity
-        sentiment = "Positive" if polarity > 0.1 else ("Negative" if polarity < -0.1 else "Neutral")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Articulation rate", f"{pace['articulation_rate']:.0f} wpm")
+        c2.metric("Speaking time", f"{pace['speaking_ratio'] * 100:.0f}%")
+        c3.metric("Pauses (> 1 s)", f"{pace['pause_count']} ({pace['long_pause_count']})")
+
+        # Sentiment and spelling/grammar check (cached per transcript text)
+        # (the timeline needs the transcript's segments, so not for a typed-in text)
+        segments = audio_result["segments"] if text == audio_result["text"] else None
+        def text_metrics():
+            return {"sentiment": analyze_sentiment(text, segments), "grammar": check_text(text)}
+        text_key = cache_key(hashlib.sha256(text.encode("utf-8")).hexdigest(), "streamlit_app.text",
+                             params={"grammar": "symspell", "sentiment": "timeline", "timed": segments is not None})
+        text_result = get_cache().get_or_compute(text_key, text_metrics)
+        polarity = text_result["sentiment"]["polarity"]
+        sentiment = label(polarity)
         st.metric("Sentiment", sentiment)
         st.write(f"Sentiment polarity: {polarity:.2f}")
+        timeline = text_result["sentiment"]["timeline"]
+        if len(timeline) > 1:
+            st.caption("Polarity over the talk (per sentence, by time)")
+            st.line_chart({"polarity": [t["polarity"] for t in timeline]})
+
+        grammar = text_result["grammar"]
+        if grammar["issue_count"]:
+            with st.expander(f"Spelling & grammar: {grammar['issue_count']} possible issues"):
+                for sentence in grammar["sentences"]:
+                    for issue in sentence["issues"]:
+                        st.write(f"- “{text[sentence['start']:sentence['end']].strip()}” — {issue['message']}")
 
-        # Simple grammar hint (very light)
         lang_errors = []
-        if len(list(tb.correct().split())) < len(words) - 2:
+        if grammar["issue_count"] > max(2, 0.05 * len(words)):
             lang_errors.append("Possible typos or grammar issues detected — consider clearer sentences.")
         if wpm < 100:
             lang_errors.append("Pace: A bit slow — try to speak a little faster.")
         if wpm > 160:
             lang_errors.append("Pace: A bit fast — slow down for clarity.")
+        if pace["long_pause_count"] > 3:
+            lang_errors.append("Pauses: several long silences — plan transitions between points.")
         if lang_errors:
             for e in lang_errors:
                 st.warning(e)
         else:
             st.success("Pace and basic grammar look good.")
 
-    # --- Frame analysis: detect face and simple smile metric using MediaPipe Face Mesh ---
-    st.info("Analyzing facial expression (smile detection)... this may take a little time.")
-    mp_face = mp.solutions.face_mesh
-    face_mesh = mp_face.FaceMesh(static_image_mode=True, max_num_faces=1)
-
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25
-    frame_count = int(min(150, cap.get(cv2.CAP_PROP_FRAME_COUNT)))  # sample up to 150 frames
-    step = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / frame_count))
-
-    smile_scores = []
-    i = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if i % step != 0:
-            i += 1
-            continue
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb)
-        if results.multi_face_landmarks:
-            lm = results.multi_face_landmarks[0].landmark
-            h, w, _ = frame.shape
-            # choose mouth corners and upper/lower lip points
-            def p(idx): return np.array([lm[idx].x * w, lm[idx].y * h])
-            left = p(61)   # approximate left mouth corner
-            right = p(291) # approximate right mouth corner
-            top = p(13)    # upper lip
-            bottom = p(14) # lower lip
-            mouth_width = np.linalg.norm(right - left)
-            mouth_open = np.linalg.norm(bottom - top)
-            if mouth_width > 0:
-                score = mouth_open / mouth_width
-                smile_scores.append(score)
-        i += 1
-
-    cap.release()
-    face_mesh.close()
-
-    if smile_scores:
-        avg_smile = np.mean(smile_scores)
+    # --- Frame analysis: face mesh landmarks were computed by the background job ---
+    frame_stats = frames_result["stats"]
+    cost = frame_stats["decode_seconds"] / frame_stats["sampled"] if frame_stats["sampled"] else 0.0
+    st.caption(f"Sampled {frame_stats['sampled']} frames on {frame_stats['workers']} workers "
+               f"({cost * 1000:.1f} ms decode per frame, {frame_stats['seeks']} seeks)")
+
+    # All expression metrics in one vectorised pass over the (frames, 468, 3) array
+    expr = expression_metrics(frames_result["points"])
+    smile_scores = expr["mouth_ratio"][~np.isnan(expr["mouth_ratio"])]
+    if len(smile_scores):
+        avg_smile = float(np.mean(smile_scores))
         st.metric("Smile index (higher = more open mouth / possible speaking or smile)", f"{avg_smile:.3f}")
         if avg_smile > 0.25:
             st.success("Good expressiveness detected — you use mouth movements well (smile/talk).")
         else:
             st.info("Neutral expressiveness — try to smile more or show facial variety.")
+        summary = summarize(expr)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Eye openness", f"{summary['eye_openness']['mean']:.2f}")
+        c2.metric("Head turn (yaw std)", f"{summary['yaw']['std']:.2f}")
+        c3.metric("Head tilt (roll std)", f"{summary['roll']['std']:.1f}°")
+        st.line_chart({"mouth ratio": expr["mouth_ratio"], "eye openness": expr["eye_openness"]})
     else:
         st.warning("No face detected in sampled frames. Make sure face is visible and well lit.")
 
@@ -122,8 +149,10 @@ if uploaded:
     st.header("Quick Feedback Summary")
     st.write("- **Pace:**", f"{wpm:.0f} wpm" if text else "N/A")
     st.write("- **Sentiment:**", sentiment if text else "N/A")
-    if smile_scores:
+    if len(smile_scores):
         st.write(f"- **Expression:** avg score {avg_smile:.3f}")
     st.write("")
     st.write("**Suggestions:**")
     st.write("• Keep sentences short and clear.  • Use more facial expressions and smile.  • Practice speaking at ~120–140 wpm for clarity.")
+
+    upload.close()
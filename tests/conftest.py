@@ -0,0 +1,13 @@
+# Test setup: the repo's modules live at the top level, and several read their
+# scratch/cache directories from the environment at import time, so point
+# those at a throwaway directory before any test module imports them.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_scratch = tempfile.mkdtemp(prefix="ha-tests-")
+for var, name in (("HA_WORK_DIR", "work"), ("HA_UPLOAD_DIR", "uploads"), ("HA_CACHE_DIR", "cache")):
+    os.environ.setdefault(var, os.path.join(_scratch, name))
@@ -0,0 +1,229 @@
+import http.client
+import os
+import struct
+import time
+
+import pytest
+
+import admission
+import workspace
+from admission import (AdmissionError, ChunkedUpload, OffsetMismatch, UnknownUpload, admit, probe_mp4,
+                       probe_wav, open_resumable, trim_notice)
+from upload_ingest import ingest
+
+
+def box(kind, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def mvhd(timescale, duration, version=0):
+    if version == 1:
+        return box(b"mvhd", bytes([1, 0, 0, 0]) + bytes(16) + struct.pack(">IQ", timescale, duration) + bytes(80))
+    return box(b"mvhd", bytes(4) + bytes(8) + struct.pack(">II", timescale, duration) + bytes(80))
+
+
+def trak(handler, codec, width=0, height=0):
+    tkhd = box(b"tkhd", bytes(76) + struct.pack(">II", width << 16, height << 16))
+    hdlr = box(b"hdlr", bytes(8) + handler + bytes(12) + b"\0")
+    stsd = box(b"stsd", bytes(4) + struct.pack(">I", 1) + struct.pack(">I4s", 16, codec) + bytes(8))
+    stbl = box(b"stbl", stsd)
+    return box(b"trak", tkhd + box(b"mdia", box(b"mdhd", bytes(24)) + hdlr + box(b"minf", stbl)))
+
+
+def mp4(seconds=95.0, width=1920, height=1080, mdat=4096, moov_first=False, version=0):
+    ftyp = box(b"ftyp", b"isom" + bytes(4) + b"isomavc1")
+    moov = box(b"moov", mvhd(1000, int(seconds * 1000), version)
+               + trak(b"vide", b"avc1", width, height) + trak(b"soun", b"mp4a"))
+    media = box(b"mdat", bytes(mdat))
+    return ftyp + (moov + media if moov_first else media + moov)
+
+
+def wav(seconds=2.0, rate=16000, extra_chunk=b"LIST"):
+    data = bytes(int(seconds * rate) * 2)
+    fmt = box_le(b"fmt ", struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16))
+    odd = box_le(extra_chunk, b"abc") + b"\0"  # odd-sized chunk plus its pad byte
+    body = b"WAVE" + odd + fmt + box_le(b"data", data)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def box_le(kind, payload):
+    return struct.pack("<4sI", kind, len(payload)) + payload
+
+
+def reader(data):
+    return lambda offset, n: data[offset:offset + n]
+
+
+# ---------- header probes ----------
+@pytest.mark.parametrize("moov_first", [False, True])
+@pytest.mark.parametrize("version", [0, 1])
+def test_probe_mp4_reads_moov(moov_first, version):
+    data = mp4(moov_first=moov_first, version=version)
+    info = probe_mp4(reader(data), len(data))
+    assert info["duration"] == pytest.approx(95.0)
+    assert (info["width"], info["height"]) == (1920, 1080)
+    assert (info["video_codec"], info["audio_codec"]) == ("avc1", "mp4a")
+
+
+def test_probe_mp4_without_moov_yet():
+    data = mp4()
+    partial = data[:len(data) - 20]
+    # the declared size is known, but the moov box hasn't fully arrived
+    assert probe_mp4(reader(partial), len(data)) is None
+
+
+def test_probe_mp4_refuses_oversized_moov(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_MOOV_BYTES", 64)
+    data = mp4()
+    with pytest.raises(AdmissionError):
+        probe_mp4(reader(data), len(data))
+
+
+def test_probe_wav_walks_chunks():
+    data = wav(seconds=2.5)
+    info = probe_wav(reader(data), len(data))
+    assert info["format"] == "wav" and info["duration"] == pytest.approx(2.5)
+    assert probe_wav(reader(b"RIFX" + data[4:]), len(data)) is None
+
+
+# ---------- admission ----------
+def test_admit_passes_and_memoises_probe():
+    upload = ingest(mp4(seconds=30), suffix=".mp4")
+    admitted, info = admit(upload)
+    assert admitted is upload and not info["trimmed"] and trim_notice(info) is None
+    assert admission._probed[upload.digest]["duration"] == pytest.approx(30)
+    upload.close()
+
+
+def test_admit_rejects_size_and_resolution():
+    with pytest.raises(AdmissionError, match="too large"):
+        admit(ingest(mp4(), suffix=".mp4"), max_bytes=100)
+    with pytest.raises(AdmissionError, match="resolution"):
+        admit(ingest(mp4(width=7680, height=4320), suffix=".mp4"))
+
+
+def test_admit_rejects_long_clip_by_policy():
+    with pytest.raises(AdmissionError, match="limit is 2:30"):
+        admit(ingest(mp4(seconds=600), suffix=".mp4"), policy="reject")
+
+
+def test_trim_without_ffmpeg_leaves_nothing_behind(monkeypatch):
+    def missing():
+        raise admission.AudioExtractError("ffmpeg not found")
+    monkeypatch.setattr(admission, "ffmpeg_exe", missing)
+    upload = ingest(mp4(seconds=600), suffix=".mp4")
+    upload.path
+    with pytest.raises(AdmissionError, match="Can't shorten"):
+        admit(upload)
+    assert not [n for n in os.listdir(upload.upload_dir) if n.startswith(".part-")]
+    upload.close()
+
+
+# ---------- resumable uploads ----------
+def test_chunked_upload_offsets(tmp_path):
+    data = mp4(seconds=20)
+    upload = ChunkedUpload.create(len(data), "clip.MP4", upload_dir=str(tmp_path))
+    assert upload.offset == 0 and upload.suffix == ".mp4"
+    assert upload.write(0, data[:100]) == 100
+    with pytest.raises(OffsetMismatch):
+        upload.write(50, data[50:150])
+    with pytest.raises(AdmissionError, match="declared upload length"):
+        upload.write(100, data[100:] + b"extra")
+
+    # a new handle (e.g. after a dropped connection) resumes at the same offset
+    again = ChunkedUpload(upload.id, upload_dir=str(tmp_path))
+    assert again.offset == 100
+    assert again.write(100, data[100:]) == len(data)
+    assert os.path.exists(again.done) and not os.path.exists(again.part)
+    assert again.offset == len(data)
+    assert ChunkedUpload(upload.id, upload_dir=str(tmp_path)).meta["probe"]["duration"] == pytest.approx(20)
+
+
+def test_chunked_upload_rejected_once_header_arrives(tmp_path):
+    data = mp4(width=7680, height=4320, moov_first=True)
+    upload = ChunkedUpload.create(len(data), "big.mp4", upload_dir=str(tmp_path))
+    with pytest.raises(AdmissionError, match="resolution"):
+        upload.write(0, data[:600])
+    assert os.listdir(tmp_path) == []  # cancelled
+
+
+def test_unknown_and_malformed_ids(tmp_path):
+    with pytest.raises(UnknownUpload):
+        ChunkedUpload("../../etc/passwd", upload_dir=str(tmp_path))
+    with pytest.raises(UnknownUpload):
+        ChunkedUpload("0" * 32, upload_dir=str(tmp_path))
+
+
+def test_reaper_keeps_metadata_of_paused_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "_watched", {})
+    workspace.watch(str(tmp_path), in_use=admission._meta_in_use)
+    upload = ChunkedUpload.create(1000, "a.wav", upload_dir=str(tmp_path))
+    upload.write(0, b"x" * 10)
+    old = time.time() - 10_000
+    os.utime(upload.meta_path, (old, old))
+    workspace.reap(max_idle=3600)
+    assert os.path.exists(upload.meta_path)  # its .part is still fresh
+    os.utime(upload.part, (old, old))
+    workspace.reap(max_idle=3600)
+    assert not os.path.exists(upload.part)
+    workspace.reap(max_idle=3600)
+    assert not os.path.exists(upload.meta_path)
+
+
+# ---------- HTTP endpoint ----------
+@pytest.fixture
+def server():
+    srv = admission.serve(0, host="127.0.0.1", token="secret")
+    yield srv.server_address[1]
+    srv.shutdown()
+    srv.server_close()
+
+
+def request(port, method, path, headers=None, body=None, token="secret"):
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    return resp
+
+
+def test_endpoint_requires_token(server):
+    assert request(server, "POST", "/uploads", {"Upload-Length": "10"}, token=None).status == 401
+    assert request(server, "POST", "/uploads", {"Upload-Length": "10"}, token="wrong").status == 401
+
+
+def test_endpoint_tus_flow(server):
+    data = wav(seconds=1.0)
+    created = request(server, "POST", "/uploads", {"Upload-Length": str(len(data)), "Upload-Name": "a.wav"})
+    assert created.status == 201
+    location = created.getheader("Location")
+    upload_id = location.rsplit("/", 1)[1]
+
+    first = request(server, "PATCH", location, {"Upload-Offset": "0"}, data[:1000])
+    assert first.status == 204 and first.getheader("Upload-Offset") == "1000"
+    assert request(server, "PATCH", location, {"Upload-Offset": "0"}, data[:1000]).status == 409
+    assert request(server, "HEAD", location).getheader("Upload-Offset") == "1000"
+    with pytest.raises(AdmissionError, match="incomplete"):
+        open_resumable(upload_id)
+
+    last = request(server, "PATCH", location, {"Upload-Offset": "1000"}, data[1000:])
+    assert last.getheader("Upload-Offset") == str(len(data))
+    upload = open_resumable(upload_id)
+    assert upload.size == len(data)
+    upload.close()
+    assert request(server, "DELETE", location).status == 204
+    assert request(server, "HEAD", location).status == 404
+
+
+def test_endpoint_rejects_bad_lengths(server):
+    location = request(server, "POST", "/uploads", {"Upload-Length": "100"}).getheader("Location")
+    assert request(server, "PATCH", location, {"Upload-Offset": "0", "Content-Length": "-5"}).status == 400
+    too_big = request(server, "PATCH", location, {"Upload-Offset": "0",
+                                                  "Content-Length": str(admission.MAX_CHUNK + 1)})
+    assert too_big.status == 413
+    assert request(server, "POST", "/uploads", {"Upload-Length": "-1"}).status == 413
+    assert request(server, "POST", "/uploads", {"Upload-Length": "abc"}).status == 400
@@ -0,0 +1,37 @@
+import pytest
+
+from fillers import find_fillers
+
+
+def test_whole_words_only():
+    result = find_fillers("I also likely said so, like, um, basically everything.")
+    assert result["counts"]["so"] == 1      # not the "so" in "also"
+    assert result["counts"]["like"] == 1    # not "likely"
+    assert result["counts"]["um"] == 1 and result["counts"]["basically"] == 1
+    assert result["count"] == 4
+
+
+def test_case_and_multi_word_entries():
+    result = find_fillers("You  know, it's, you\nknow... RIGHT? Alright.")
+    assert result["counts"]["you know"] == 2
+    assert result["counts"]["right"] == 1  # "Alright" is not a match
+    assert [text for _, _, text in result["positions"]] == ["you know", "you know", "right"]
+
+
+def test_positions_point_into_the_text():
+    text = "well um yes uh"
+    for start, end, filler in find_fillers(text)["positions"]:
+        assert text[start:end].lower() == filler
+
+
+def test_custom_lexicon_and_rates():
+    result = find_fillers("kind of like kind of", lexicon=("kind of",), duration_seconds=30)
+    assert result["counts"] == {"kind of": 2}
+    assert result["per_minute"] == pytest.approx(4.0)
+    assert result["rates"] == {"kind of": pytest.approx(4.0)}
+
+
+def test_no_duration_no_rates():
+    result = find_fillers("um")
+    assert result["per_minute"] is None and result["rates"] is None
+    assert find_fillers("", lexicon=())["count"] == 0
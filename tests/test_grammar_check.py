@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+import grammar_check
+from grammar_check import SpellIndex, edit_distance, check_text
+
+COUNTS = {"the": 500, "they": 200, "then": 150, "there": 120, "presentation": 5, "present": 30,
+          "speech": 20, "speed": 25, "spelling": 8, "audience": 10, "was": 300, "good": 90,
+          "goods": 2, "a": 400, "talk": 40}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    idx = SpellIndex(COUNTS)
+    monkeypatch.setattr(grammar_check, "get_index", lambda: idx)
+    grammar_check.correct_word.cache_clear()
+    yield idx
+    grammar_check.correct_word.cache_clear()
+
+
+def test_edit_distance_with_transpositions_and_limit():
+    assert edit_distance("speech", "speech", 2) == 0
+    assert edit_distance("spech", "speech", 2) == 1
+    assert edit_distance("teh", "the", 2) == 1  # one transposition
+    assert edit_distance("audience", "talk", 2) is None
+
+
+def test_lookup_exact_close_and_missing():
+    idx = SpellIndex(COUNTS)
+    assert idx.lookup("speech") == ("speech", 0)
+    assert idx.lookup("presentaton") == ("presentation", 1)
+    assert idx.lookup("adience") == ("audience", 1)
+    assert idx.lookup("xyzzyq") is None
+
+
+def test_lookup_prefers_the_more_frequent_word_at_equal_distance():
+    # "thex" is one edit from both "the" and "they"; "the" is more common
+    assert SpellIndex(COUNTS).lookup("thex") == ("the", 1)
+
+
+def test_lookup_agrees_with_brute_force():
+    idx = SpellIndex(COUNTS)
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    for _ in range(300):
+        word = list(rng.choice(list(COUNTS)))
+        for _ in range(rng.randint(0, 3)):
+            i = rng.randrange(len(word) + 1)
+            op = rng.choice("ids")
+            if op == "i":
+                word.insert(i, rng.choice(letters))
+            elif word and i < len(word):
+                if op == "d":
+                    del word[i]
+                else:
+                    word[i] = rng.choice(letters)
+        word = "".join(word)
+        distances = {w: edit_distance(word, w, 2) for w in COUNTS}
+        distances = {w: d for w, d in distances.items() if d is not None}
+        found = idx.lookup(word)
+        if not distances:
+            assert found is None, word
+            continue
+        assert found is not None, word
+        assert found[1] == min(distances.values()), word
+
+
+def test_check_text_reports_offsets(index):
+    text = "the speech was goood. I think i talk talk fast."
+    report = check_text(text)
+    assert report["dictionary"] and len(report["sentences"]) == 2
+    issues = [i for s in report["sentences"] for i in s["issues"]]
+    kinds = {(i["kind"], i["text"]) for i in issues}
+    assert ("capitalization", "the") in kinds
+    assert ("spelling", "goood") in kinds
+    assert ("capitalization", "i") in kinds
+    assert ("repetition", "talk") in kinds
+    for issue in issues:
+        assert text[issue["start"]:issue["end"]] == issue["text"]
+    goood = next(i for i in issues if i["text"] == "goood")
+    assert goood["suggestion"] == "good"
+
+
+def test_check_text_flags_long_sentences(index):
+    report = check_text(" ".join(["talk"] * (grammar_check.MAX_SENTENCE_WORDS + 1)) + ".")
+    assert any(i["kind"] == "long_sentence" for i in report["sentences"][0]["issues"])
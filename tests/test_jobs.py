@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+import jobs
+from jobs import JobManager, JobQueueFull
+
+
+@pytest.fixture
+def manager():
+    m = JobManager(max_workers=1, mode="thread")
+    yield m
+    m.shutdown(wait=False)
+
+
+def test_cleanup_runs_when_queue_is_full(manager, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_PENDING", 1)
+    gate = threading.Event()
+    released = []
+    first = manager.submit(lambda progress: gate.wait(5), cleanup=lambda: released.append("first"))
+    with pytest.raises(JobQueueFull):
+        manager.submit(lambda progress: None, cleanup=lambda: released.append("second"))
+    assert released == ["second"]  # the rejected job's hold is released at once
+    gate.set()
+    manager._pool.shutdown(wait=True)
+    assert manager.get(first)["status"] == jobs.DONE
+    assert released == ["second", "first"]
+
+
+def test_cleanup_runs_when_pool_refuses(manager):
+    manager._pool.shutdown(wait=True)
+    released = []
+    with pytest.raises(RuntimeError):
+        manager.submit(lambda progress: None, cleanup=lambda: released.append(True))
+    assert released == [True]
+    assert manager._jobs == {}
@@ -0,0 +1,66 @@
+import os
+import time
+
+import numpy as np
+
+from result_cache import ResultCache, cache_key, hash_upload
+
+
+def _age(cache, key, seconds_ago):
+    t = time.time() - seconds_ago
+    for ext in (".json", ".npz"):
+        path = os.path.join(cache.root, key + ext)
+        if os.path.exists(path):
+            os.utime(path, (t, t))
+
+
+def test_round_trip_with_arrays(tmp_path):
+    cache = ResultCache(root=str(tmp_path))
+    cache.put("k", {"text": "hi", "n": np.int64(3), "points": np.arange(6, dtype=np.float32).reshape(2, 3)})
+    value = cache.get("k")
+    assert value["text"] == "hi" and value["n"] == 3
+    np.testing.assert_array_equal(value["points"], np.arange(6, dtype=np.float32).reshape(2, 3))
+    assert cache.get("missing") is None
+
+
+def test_key_depends_on_stage_version_and_params():
+    base = cache_key("abc", "audio")
+    assert cache_key("abc", "audio") == base
+    assert cache_key("abc", "frames") != base
+    assert cache_key("abc", "audio", version="0") != base
+    assert cache_key("abc", "audio", params={"max_frames": 150}) != base
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ResultCache(root=str(tmp_path), max_bytes=10 ** 9)
+    blob = "x" * 1000
+    for key in ("old", "mid", "new"):
+        cache.put(key, {"blob": blob})
+    _age(cache, "old", 300)
+    _age(cache, "mid", 200)
+    _age(cache, "new", 100)
+    cache.get("old")  # a read makes it the most recently used
+
+    entry = os.path.getsize(os.path.join(cache.root, "new.json"))
+    cache.max_bytes = 2 * entry
+    cache.evict()
+    assert cache.get("mid") is None
+    assert cache.get("old") is not None and cache.get("new") is not None
+
+
+def test_eviction_removes_both_parts_of_an_entry(tmp_path):
+    cache = ResultCache(root=str(tmp_path), max_bytes=10 ** 9)
+    cache.put("a", {"points": np.zeros(1000, dtype=np.float32)})
+    _age(cache, "a", 100)
+    cache.put("b", {"text": "small"})
+    cache.max_bytes = os.path.getsize(os.path.join(cache.root, "b.json"))
+    cache.evict()
+    assert not os.path.exists(os.path.join(cache.root, "a.json"))
+    assert not os.path.exists(os.path.join(cache.root, "a.npz"))
+
+
+def test_hash_upload_matches_for_path_and_buffer(tmp_path):
+    import io
+    path = tmp_path / "clip.bin"
+    path.write_bytes(b"abc" * 1000)
+    assert hash_upload(str(path)) == hash_upload(io.BytesIO(b"abc" * 1000))
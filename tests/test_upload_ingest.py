@@ -0,0 +1,93 @@
+import gc
+import hashlib
+import io
+import os
+
+import pytest
+
+import upload_ingest
+from upload_ingest import ingest, session_ingest, IngestedUpload
+
+DATA = os.urandom(3 * upload_ingest.CHUNK_SIZE + 17)
+DIGEST = hashlib.sha256(DATA).hexdigest()
+
+
+class FakeUploadedFile(io.BytesIO):
+    # what Streamlit hands the page: a BytesIO with a name and a file_id
+    def __init__(self, data, name="clip.mp4", file_id="f1"):
+        super().__init__(data)
+        self.name = name
+        self.file_id = file_id
+
+
+def test_digest_without_spooling(tmp_path):
+    upload = IngestedUpload(FakeUploadedFile(DATA), upload_dir=str(tmp_path))
+    assert upload.digest == DIGEST
+    assert upload.size == len(DATA)
+    assert upload.suffix == ".mp4"
+    assert upload.read_at(5, 10) == DATA[5:15]
+    assert os.listdir(tmp_path) == []
+    upload.close()
+
+
+def test_spooled_once_under_content_hash_and_shared(tmp_path):
+    a = IngestedUpload(DATA, suffix=".wav", upload_dir=str(tmp_path))
+    b = IngestedUpload(bytearray(DATA), suffix=".wav", upload_dir=str(tmp_path))
+    assert a.path == b.path == os.path.join(str(tmp_path), DIGEST + ".wav")
+    with open(a.path, "rb") as f:
+        assert f.read() == DATA
+    a.close()
+    assert os.path.exists(b.path)  # still used by b
+    b.close()
+    assert not os.path.exists(a.path)
+
+
+def test_hold_outlives_the_upload_object(tmp_path):
+    upload = IngestedUpload(DATA, suffix=".mp4", upload_dir=str(tmp_path))
+    path = upload.path
+    release = upload.hold()
+    del upload
+    gc.collect()
+    assert os.path.exists(path)
+    release()
+    release()  # second call is a no-op
+    assert not os.path.exists(path)
+
+
+def test_file_on_disk_is_linked_not_rehashed_when_digest_known(tmp_path):
+    source = tmp_path / "trimmed.mp4"
+    source.write_bytes(DATA)
+    spool = tmp_path / "spool"
+    upload = IngestedUpload(str(source), upload_dir=str(spool))
+    assert upload.digest == DIGEST and upload.read_at(0, 4) == DATA[:4]
+    again = IngestedUpload(str(source), upload_dir=str(spool), digest="f" * 64)
+    assert again.digest == "f" * 64  # trusted, not recomputed
+    assert source.exists()  # the source is linked/copied, never taken over
+    upload.close()
+    again.close()
+
+
+def test_session_ingest_hashes_once_per_file_id(monkeypatch):
+    state = {}
+    first = session_ingest(state, FakeUploadedFile(DATA))
+    assert state["_upload_digests"] == {"f1": DIGEST}
+
+    calls = []
+    real_sha256 = hashlib.sha256
+    monkeypatch.setattr(upload_ingest.hashlib, "sha256", lambda *a: calls.append(1) or real_sha256(*a))
+    again = session_ingest(state, FakeUploadedFile(DATA))
+    assert again.digest == DIGEST and calls == []
+    other = session_ingest(state, FakeUploadedFile(b"other", file_id="f2"))
+    assert calls and other.digest == hashlib.sha256(b"other").hexdigest()
+    for upload in (first, again, other):
+        upload.close()
+
+
+def test_spool_respects_quota(tmp_path, monkeypatch):
+    import workspace
+    monkeypatch.setattr(workspace, "TOTAL_QUOTA", len(DATA) - 1)
+    monkeypatch.setattr(workspace, "WORK_ROOT", str(tmp_path / "work"))
+    upload = ingest(DATA, suffix=".bin")
+    with pytest.raises(workspace.QuotaExceeded):
+        upload.path
+    upload.close()
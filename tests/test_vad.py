@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from vad import detect_speech, pace_metrics, chunk_bounds
+
+SR = 16000
+
+
+def _clip(pattern):
+    # pattern: [(seconds, is_speech), ...] -> int16 PCM with a 220 Hz tone for
+    # speech and faint noise for silence
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds, speech in pattern:
+        n = int(seconds * SR)
+        if speech:
+            t = np.arange(n) / SR
+            parts.append(8000 * np.sin(2 * np.pi * 220 * t))
+        else:
+            parts.append(rng.normal(0, 20, n))
+    return np.concatenate(parts).astype(np.int16)
+
+
+def test_segments_and_pauses():
+    vad = detect_speech(_clip([(0.5, False), (2.0, True), (1.5, False), (1.0, True), (0.5, False)]))
+    assert vad["duration"] == pytest.approx(5.5)
+    assert len(vad["segments"]) == 2
+    (s1, e1), (s2, e2) = vad["segments"]
+    assert s1 == pytest.approx(0.5, abs=0.05) and e1 == pytest.approx(2.5, abs=0.05)
+    assert s2 == pytest.approx(4.0, abs=0.05) and e2 == pytest.approx(5.0, abs=0.05)
+    assert len(vad["pauses"]) == 1
+
+
+def test_short_gaps_are_bridged():
+    vad = detect_speech(_clip([(0.5, False), (1.0, True), (0.1, False), (1.0, True), (0.5, False)]))
+    assert len(vad["segments"]) == 1 and vad["pauses"] == []
+
+
+def test_pace_metrics():
+    vad = {"duration": 60.0, "segments": [(0.0, 20.0), (21.5, 40.0), (40.5, 55.0)],
+           "pauses": [(20.0, 21.5), (40.0, 40.5)]}
+    pace = pace_metrics(vad, word_count=120)
+    assert pace["speech_seconds"] == pytest.approx(53.0)
+    assert pace["speaking_ratio"] == pytest.approx(53.0 / 60.0)
+    assert pace["pause_count"] == 2 and pace["long_pause_count"] == 1
+    assert pace["mean_pause"] == pytest.approx(1.0) and pace["max_pause"] == pytest.approx(1.5)
+    assert pace["speaking_rate"] == pytest.approx(120.0)
+    assert pace["articulation_rate"] == pytest.approx(120 / 53.0 * 60)
+
+
+def test_pace_metrics_of_empty_audio():
+    pace = pace_metrics(detect_speech(np.zeros(0, dtype=np.int16)), word_count=0)
+    assert pace["speaking_ratio"] == 0.0 and pace["speaking_rate"] == 0.0 and pace["pause_count"] == 0
+
+
+def test_chunks_cover_the_buffer_and_cut_in_pauses():
+    vad = {"duration": 40.0, "segments": [], "pauses": [(9.0, 10.0), (29.0, 30.0)]}
+    chunks = chunk_bounds(vad, sample_rate=SR, max_chunk=15.0)
+    assert chunks[0][0] == 0 and chunks[-1][1] == 40 * SR
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(e - s <= 15 * SR for s, e in chunks)
+    assert chunks[0] == (0, int(9.5 * SR))
@@ -0,0 +1,106 @@
+import http.client
+import io
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import tts
+import voice_stream
+from result_cache import ResultCache
+from tts import StubBackend, split_sentences
+
+REPORT = "Nice steady pace. You paused well between points. Try fewer fillers next time."
+
+
+class SlowBackend(StubBackend):
+    # The report's first sentence is quick; every other one takes `delay` seconds
+    name = "slow-stub"
+
+    def __init__(self, delay):
+        super().__init__(seconds_per_word=0.05)
+        self.delay = delay
+
+    def synthesize(self, text, sample_rate):
+        if text != split_sentences(REPORT)[0]:
+            time.sleep(self.delay)
+        return super().synthesize(text, sample_rate)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, "_cache", ResultCache(root=str(tmp_path / "tts")))
+
+
+@pytest.fixture(scope="module")
+def port():
+    server = voice_stream.serve(0)
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def _get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", path)
+    return conn, conn.getresponse()
+
+
+def test_first_sentence_arrives_while_the_rest_renders(port):
+    stream = voice_stream.start_stream(REPORT, SlowBackend(delay=1.0), fmt="wav")
+    t0 = time.perf_counter()
+    conn, resp = _get(port, f"/voice/{stream.id}")
+    first = resp.read1()
+    elapsed = time.perf_counter() - t0
+    assert resp.status == 200 and resp.getheader("Content-Type") == "audio/wav"
+    assert resp.getheader("Transfer-Encoding") == "chunked"
+    assert first.startswith(b"RIFF") and elapsed < 0.3
+    assert not stream.done  # later sentences are still being synthesised
+    body = first + resp.read()
+    conn.close()
+    assert stream.done and stream.error is None
+
+    # what was streamed is the complete report, and data() is a proper WAV of it
+    with wave.open(io.BytesIO(stream.data())) as f:
+        pcm = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    assert body[44:] == pcm.tobytes()
+    gap = int(tts.GAP_SECONDS * tts.SAMPLE_RATE)
+    backend = SlowBackend(delay=0)  # same name, so these clips come from the cache
+    expected = sum(len(tts.clip(s, backend)) + gap for s in split_sentences(REPORT))
+    assert len(pcm) == expected
+
+
+def test_finished_stream_is_served_whole(port):
+    stream = voice_stream.start_stream(REPORT, StubBackend(seconds_per_word=0.05), fmt="wav")
+    assert stream.data(timeout=10)
+    conn, resp = _get(port, f"/voice/{stream.id}")
+    body = resp.read()
+    conn.close()
+    assert resp.getheader("Content-Length") == str(len(body))
+    assert body == stream.data()
+
+
+def test_unknown_and_failed_streams(port):
+    conn, resp = _get(port, "/voice/" + "0" * 32)
+    resp.read()
+    conn.close()
+    assert resp.status == 404
+
+    class Broken(StubBackend):
+        name = "broken"
+
+        def synthesize(self, text, sample_rate):
+            raise tts.TTSError("service unavailable")
+
+    stream = voice_stream.start_stream(REPORT, Broken(), fmt="wav")
+    conn, resp = _get(port, f"/voice/{stream.id}")
+    assert resp.status == 503 and b"service unavailable" in resp.read()
+    conn.close()
+    assert stream.data() == b""
+
+
+def test_streams_are_bounded(monkeypatch):
+    monkeypatch.setattr(voice_stream, "_streams", voice_stream.OrderedDict())
+    monkeypatch.setattr(voice_stream, "MAX_STREAMS", 3)
+    ids = [voice_stream.start_stream("Hi.", StubBackend(), fmt="wav").id for _ in range(5)]
+    assert [voice_stream.get_stream(i) is not None for i in ids] == [False, False, True, True, True]
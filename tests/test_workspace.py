@@ -0,0 +1,115 @@
+import gc
+import os
+import time
+
+import pytest
+
+import workspace
+from workspace import Workspace, QuotaExceeded, session_workspace
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    work = tmp_path / "work"
+    monkeypatch.setattr(workspace, "WORK_ROOT", str(work))
+    monkeypatch.setattr(workspace, "_watched", {})
+    return str(work)
+
+
+def _age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_directory_removed_with_last_reference(root):
+    ws = Workspace(root=root)
+    path = ws.path("../../escape.csv")
+    assert os.path.dirname(path) == ws.dir  # names can't leave the workspace
+    release = ws.hold()
+    ws.close()
+    assert ws.closed and os.path.isdir(ws.dir)  # still held by the "job"
+    release()
+    assert not os.path.exists(ws.dir)
+
+
+def test_hold_does_not_keep_the_session_object_alive(root):
+    ws = Workspace(root=root)
+    directory = ws.dir
+    release = ws.hold()
+    del ws
+    gc.collect()
+    assert os.path.isdir(directory)
+    release()
+    assert not os.path.exists(directory)
+
+
+def test_session_quota(root):
+    ws = Workspace(root=root, quota=100)
+    with open(ws.path("a.bin"), "wb") as f:
+        f.write(b"x" * 60)
+    ws.reserve(40)
+    with pytest.raises(QuotaExceeded):
+        ws.reserve(41)
+    ws.close()
+
+
+def test_total_quota_counts_watched_dirs_once(root, tmp_path, monkeypatch):
+    spool = tmp_path / "spool"
+    nested = spool / "nested"
+    nested.mkdir(parents=True)
+    (spool / "a").write_bytes(b"x" * 50)
+    (nested / "b").write_bytes(b"x" * 50)
+    workspace.watch(str(spool))
+    workspace.watch(str(nested))
+    assert workspace.total_usage() == 100
+    monkeypatch.setattr(workspace, "TOTAL_QUOTA", 120)
+    workspace.check_quota(20)
+    with pytest.raises(QuotaExceeded):
+        workspace.check_quota(21)
+
+
+def test_check_quota_reaps_before_giving_up(root, tmp_path, monkeypatch):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    stale = spool / "old"
+    stale.write_bytes(b"x" * 100)
+    _age(stale, 10_000)
+    workspace.watch(str(spool))
+    monkeypatch.setattr(workspace, "TOTAL_QUOTA", 150)
+    monkeypatch.setattr(workspace, "MAX_IDLE", 3600)
+    workspace.check_quota(100)
+    assert not stale.exists()
+
+
+def test_reap_spares_fresh_held_and_in_use(root, tmp_path):
+    held = Workspace(root=root)
+    _age(held.dir, 10_000)
+    orphan = os.path.join(root, "ws-orphan")
+    os.makedirs(orphan)
+    _age(orphan, 10_000)
+    fresh = os.path.join(root, "ws-fresh")
+    os.makedirs(fresh)
+
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    for name in ("busy", "idle", "new"):
+        (spool / name).write_bytes(b"x" * 10)
+    _age(spool / "busy", 10_000)
+    _age(spool / "idle", 10_000)
+    workspace.watch(str(spool), in_use=lambda path: path.endswith("busy"))
+
+    freed = workspace.reap(max_idle=3600)
+    assert freed == 10
+    assert os.path.isdir(held.dir) and os.path.isdir(fresh) and not os.path.exists(orphan)
+    assert sorted(os.listdir(spool)) == ["busy", "new"]
+    held.close()
+
+
+def test_session_workspace_is_reused_and_replaced_when_gone(root):
+    state = {}
+    ws = session_workspace(state)
+    assert session_workspace(state) is ws
+    ws.close()
+    replacement = session_workspace(state)
+    assert replacement is not ws and os.path.isdir(replacement.dir)
+    replacement.close()
@@ -0,0 +1,134 @@
+# transcription.py
+# Splits the PCM buffer on silence into bounded chunks and transcribes them
+# concurrently through a pluggable recogniser backend, so latency follows the
+# longest chunk instead of the clip length.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import resources
+from audio_extract import SAMPLE_RATE, to_audio_data
+from vad import detect_speech, chunk_bounds
+
+sr = resources.lazy_import("speech_recognition")
+# recognize_* calls don't mutate the Recognizer, so one is shared by all chunks
+resources.register("recognizer", lambda: sr.Recognizer())
+
+MAX_CHUNK_SECONDS = 15.0
+MIN_CHUNK_SECONDS = 1.0
+WORKERS = 8
+
+
+class TranscriptionError(RuntimeError):
+    # Raised by a backend when the recogniser itself is unavailable
+    # (network down, model missing), as opposed to "no speech in this chunk".
+    pass
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class GoogleBackend:
+    name = "google"
+
+    def __init__(self, language="en-US"):
+        self.language = language
+
+    def transcribe(self, pcm, sample_rate):
+        audio = to_audio_data(pcm, sample_rate)
+        try:
+            return resources.get("recognizer").recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise TranscriptionError(str(e))
+
+
+class SphinxBackend:
+    # Offline recogniser (needs the pocketsphinx package)
+    name = "sphinx"
+
+    def __init__(self, language="en-US"):
+        self.language = language
+
+    def transcribe(self, pcm, sample_rate):
+        audio = to_audio_data(pcm, sample_rate)
+        try:
+            return resources.get("recognizer").recognize_sphinx(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise TranscriptionError(str(e))
+
+
+class StubBackend:
+    # Deterministic, offline: emits one placeholder word per ~0.4 s of audio.
+    # Used by tests and benchmarks so the pipeline runs without a recogniser.
+    name = "stub"
+
+    def __init__(self, word="word", seconds_per_word=0.4):
+        self.word = word
+        self.seconds_per_word = seconds_per_word
+
+    def transcribe(self, pcm, sample_rate):
+        n = int(len(pcm) / float(sample_rate) / self.seconds_per_word)
+        return " ".join([self.word] * n)
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "sphinx": SphinxBackend,
+    "stub": StubBackend,
+}
+
+
+def get_backend(name=None, **kwargs):
+    name = name or os.environ.get("HA_ASR_BACKEND", "google")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name](**kwargs)
+
+
+# -----------------------------
+# Chunking
+# -----------------------------
+def split_on_silence(pcm, sample_rate=SAMPLE_RATE, max_chunk=MAX_CHUNK_SECONDS, min_chunk=MIN_CHUNK_SECONDS):
+    # Returns [(start_sample, end_sample), ...] covering the whole buffer, cut
+    # in the middle of the pauses found by the VAD (force-cut at max_chunk).
+    return chunk_bounds(detect_speech(pcm, sample_rate), sample_rate, max_chunk=max_chunk, min_chunk=min_chunk)
+
+
+# -----------------------------
+# Transcription
+# -----------------------------
+def transcribe(pcm, sample_rate=SAMPLE_RATE, backend=None, workers=WORKERS, chunks=None):
+    # Returns {"text", "segments": [{"start", "end", "text"}], "complete"}.
+    # "complete" is False if the backend failed on any chunk, so the
+    # caller can avoid caching a partial transcript.
+    backend = backend or get_backend()
+    if chunks is None:
+        chunks = split_on_silence(pcm, sample_rate)
+    if not chunks:
+        return {"text": "", "segments": [], "complete": True}
+
+    def run(chunk):
+        start, end = chunk
+        try:
+            return backend.transcribe(pcm[start:end], sample_rate), True
+        except Exception:
+            # a backend failure of any kind (service down, a chunk the decoder
+            # rejects, ...) costs only this chunk; the transcript is marked partial
+            return "", False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        results = list(pool.map(run, chunks))
+
+    segments = []
+    for (start, end), (text, _) in zip(chunks, results):
+        text = text.strip()
+        if text:
+            segments.append({"start": start / float(sample_rate), "end": end / float(sample_rate), "text": text})
+    return {
+        "text": " ".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "complete": all(ok for _, ok in results),
+    }
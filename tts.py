@@ -0,0 +1,281 @@
+# tts.py
+# Voice feedback from cached, sentence-level clips.
+#
+# Feedback reports are assembled from a fixed set of phrases, so each sentence
+# is synthesised once per backend/language and kept as PCM in its own result
+# cache (LRU-evicted at TTS_MAX_BYTES). A report is the concatenation of its
+# sentences' clips with short gaps, returned as in-memory WAV bytes: nothing
+# is written to the working directory, and a report whose sentences are all
+# cached is ready without calling the backend at all. stream_report() yields
+# the same report sentence by sentence, as encoded chunks that can simply be
+# appended to one another (see voice_stream.py for playback).
+import io
+import os
+import re
+import struct
+import subprocess
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+
+import numpy as np
+
+import resources
+from audio_extract import ffmpeg_exe, AudioExtractError
+from result_cache import ResultCache, CACHE_DIR, cache_key
+
+SAMPLE_RATE = 24000
+GAP_SECONDS = 0.15
+WORKERS = 4
+TTS_DIR = os.environ.get("HA_TTS_CACHE_DIR", os.path.join(CACHE_DIR, "tts"))
+TTS_MAX_BYTES = int(os.environ.get("HA_TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+STREAM_FORMATS = {"mp3": "audio/mpeg", "wav": "audio/wav"}  # formats whose chunks concatenate
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TTSError(RuntimeError):
+    pass
+
+
+def decode_audio(data, sample_rate=SAMPLE_RATE):
+    # Any encoded audio (mp3, wav, ...) -> mono int16 PCM at sample_rate, via ffmpeg
+    cmd = [ffmpeg_exe(), "-nostdin", "-v", "error", "-i", "pipe:0",
+           "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+    proc = subprocess.run(cmd, input=data, capture_output=True)
+    if proc.returncode != 0:
+        raise AudioExtractError(proc.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+    return np.frombuffer(proc.stdout[: len(proc.stdout) // 2 * 2], dtype=np.int16)
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class GTTSBackend:
+    # Google TTS (network)
+    name = "gtts"
+
+    def __init__(self, lang="en"):
+        self.lang = lang
+
+    def synthesize(self, text, sample_rate):
+        gtts = resources.load("gtts")
+        buf = io.BytesIO()
+        try:
+            gtts.gTTS(text=text, lang=self.lang, slow=False).write_to_fp(buf)
+        except Exception as e:  # gTTSError, requests errors
+            raise TTSError(str(e))
+        return decode_audio(buf.getvalue(), sample_rate)
+
+
+class Pyttsx3Backend:
+    # Offline system voices (SAPI5 / NSSpeechSynthesizer / espeak)
+    name = "pyttsx3"
+    _lock = threading.Lock()  # the engine is not thread-safe
+
+    def __init__(self, rate=None):
+        self.rate = rate
+
+    def synthesize(self, text, sample_rate):
+        import tempfile
+        with self._lock:
+            engine = resources.get("pyttsx3_engine")
+            if self.rate:
+                engine.setProperty("rate", self.rate)
+            fd, path = tempfile.mkstemp(suffix=".wav")
+            os.close(fd)
+            try:
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+                with open(path, "rb") as f:
+                    data = f.read()
+            finally:
+                os.remove(path)
+        return decode_audio(data, sample_rate)
+
+
+resources.register("pyttsx3_engine", lambda: resources.load("pyttsx3").init(), teardown=lambda e: e.stop())
+
+
+class StubBackend:
+    # Deterministic, offline: a soft tone per word. Used by tests and benchmarks.
+    name = "stub"
+
+    def __init__(self, seconds_per_word=0.3):
+        self.seconds_per_word = seconds_per_word
+
+    def synthesize(self, text, sample_rate):
+        n = int(max(1, len(text.split())) * self.seconds_per_word * sample_rate)
+        t = np.arange(n) / sample_rate
+        return (0.1 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+
+
+BACKENDS = {
+    "gtts": GTTSBackend,
+    "pyttsx3": Pyttsx3Backend,
+    "stub": StubBackend,
+}
+
+
+def get_backend(name=None, **kwargs):
+    name = name or os.environ.get("HA_TTS_BACKEND", "gtts")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}")
+    return BACKENDS[name](**kwargs)
+
+
+# -----------------------------
+# Cached synthesis
+# -----------------------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(root=TTS_DIR, max_bytes=TTS_MAX_BYTES)
+        return _cache
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _clip_key(backend, sentence, sample_rate):
+    params = {"backend": backend.name, "lang": getattr(backend, "lang", None), "rate": sample_rate}
+    return cache_key(sha256(sentence.encode("utf-8")).hexdigest(), "tts", params=params)
+
+
+def clip(sentence, backend=None, sample_rate=SAMPLE_RATE):
+    # PCM for one sentence, synthesised at most once per backend/language
+    backend = backend or get_backend()
+    cache = get_tts_cache()
+    key = _clip_key(backend, sentence, sample_rate)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached["pcm"]
+    pcm = backend.synthesize(sentence, sample_rate)
+    cache.put(key, {"pcm": pcm, "text": sentence})
+    return pcm
+
+
+def clips(sentences, backend=None, sample_rate=SAMPLE_RATE, workers=WORKERS):
+    # PCM for each sentence; cache misses are synthesised concurrently
+    backend = backend or get_backend()
+    unique = list(dict.fromkeys(sentences))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(unique) or 1))) as pool:
+        rendered = dict(zip(unique, pool.map(lambda s: clip(s, backend, sample_rate), unique)))
+    return [rendered[s] for s in sentences]
+
+
+def prerender(phrases, backend=None, sample_rate=SAMPLE_RATE, fmt=None):
+    # Fill the cache for a known set of sentences (e.g. a template pack), in the
+    # background; with `fmt`, their stream chunks are encoded ahead of time too
+    backend = backend or get_backend()
+
+    def run():
+        try:
+            clips(phrases, backend, sample_rate)
+            if fmt is not None:
+                for sentence in phrases:
+                    stream_chunk(sentence, backend, sample_rate, fmt)
+        except (TTSError, AudioExtractError):
+            pass  # rendered on demand instead
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def to_wav(pcm, sample_rate=SAMPLE_RATE):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def wav_stream_header(sample_rate=SAMPLE_RATE):
+    # WAV header for a stream of unknown length: the RIFF/data sizes are left at
+    # their maximum, which players read as "until the connection closes"
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF - 36))
+
+
+def encode(pcm, sample_rate=SAMPLE_RATE, fmt="wav", stream=False):
+    # "wav", or any ffmpeg output format such as "mp3"/"ogg" (much smaller on slow links).
+    # stream=True gives a headerless chunk (raw PCM for wav, MP3 frames without
+    # ID3/Xing tags) that can be appended to the previous one.
+    if fmt == "wav":
+        return pcm.tobytes() if stream else to_wav(pcm, sample_rate)
+    if stream and fmt not in STREAM_FORMATS:
+        raise ValueError(f"Can't stream {fmt}; use one of {', '.join(STREAM_FORMATS)}")
+    cmd = [ffmpeg_exe(), "-nostdin", "-v", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1",
+           "-i", "pipe:0", "-b:a", "48k", "-f", fmt]
+    if stream:
+        cmd += ["-write_xing", "0", "-id3v2_version", "0"]
+    cmd += ["pipe:1"]
+    proc = subprocess.run(cmd, input=pcm.tobytes(), capture_output=True)
+    if proc.returncode != 0:
+        raise AudioExtractError(proc.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+    return proc.stdout
+
+
+def render_report(text, backend=None, sample_rate=SAMPLE_RATE, fmt="wav"):
+    # The whole report as one clip (WAV bytes, or `fmt` via encode()): cached
+    # sentence clips joined by short gaps
+    sentences = split_sentences(text)
+    if not sentences:
+        return encode(np.zeros(0, dtype=np.int16), sample_rate, fmt)
+    gap = np.zeros(int(GAP_SECONDS * sample_rate), dtype=np.int16)
+    parts = []
+    for pcm in clips(sentences, backend, sample_rate):
+        parts += [pcm, gap]
+    return encode(np.concatenate(parts[:-1]), sample_rate, fmt)
+
+
+def _chunk_key(backend, sentence, sample_rate, fmt):
+    params = {"backend": backend.name, "lang": getattr(backend, "lang", None), "rate": sample_rate,
+              "fmt": fmt, "gap": GAP_SECONDS}
+    return cache_key(sha256(sentence.encode("utf-8")).hexdigest(), "tts_chunk", params=params)
+
+
+def stream_chunk(sentence, backend=None, sample_rate=SAMPLE_RATE, fmt="mp3"):
+    # One sentence and the gap after it, encoded for streaming. Compressed
+    # chunks are cached next to the PCM, so a cached sentence goes out without
+    # starting ffmpeg.
+    backend = backend or get_backend()
+    compressed = fmt != "wav"
+    if compressed:
+        cache = get_tts_cache()
+        key = _chunk_key(backend, sentence, sample_rate, fmt)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached["data"].tobytes()
+    gap = np.zeros(int(GAP_SECONDS * sample_rate), dtype=np.int16)
+    data = encode(np.concatenate([clip(sentence, backend, sample_rate), gap]), sample_rate, fmt, stream=True)
+    if compressed:
+        cache.put(key, {"data": np.frombuffer(data, dtype=np.uint8), "fmt": fmt})
+    return data
+
+
+def stream_report(text, backend=None, sample_rate=SAMPLE_RATE, fmt="mp3", workers=WORKERS):
+    # Yields (index, sentence, chunk) in report order as soon as each sentence
+    # is ready, while the following sentences are still being synthesised on
+    # background workers. The first chunk only waits for the first sentence.
+    sentences = split_sentences(text)
+    if not sentences:
+        return
+    backend = backend or get_backend()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(sentences))))
+    try:
+        futures = [pool.submit(stream_chunk, s, backend, sample_rate, fmt) for s in sentences]
+        for i, (sentence, future) in enumerate(zip(sentences, futures)):
+            yield i, sentence, future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
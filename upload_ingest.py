@@ -0,0 +1,188 @@
+# upload_ingest.py
+# Single entry point for uploaded files: hash the upload straight from its
+# memoryview, spool it to disk at most once under its content hash, and share
+# that one file with every stage that needs a path. The spool directory
+# counts towards the server's scratch quota, and spooled files no session
+# holds any more are removed by the workspace reaper once they go stale.
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+from workspace import check_quota, watch
+
+UPLOAD_DIR = os.environ.get("HA_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "human_analytics_uploads"))
+CHUNK_SIZE = 1024 * 1024
+
+_refs = {}  # spooled path -> number of live IngestedUpload objects using it
+_lock = threading.Lock()
+watch(UPLOAD_DIR, in_use=lambda path: path in _refs)
+
+
+def _buffer(uploaded):
+    # Zero-copy view of the upload (Streamlit UploadedFile / BytesIO / bytes)
+    if hasattr(uploaded, "getbuffer"):
+        return uploaded.getbuffer()
+    return memoryview(uploaded)
+
+
+def _acquire(path):
+    with _lock:
+        _refs[path] = _refs.get(path, 0) + 1
+
+
+def _release(path):
+    with _lock:
+        n = _refs.get(path, 0) - 1
+        if n > 0:
+            _refs[path] = n
+            return
+        _refs.pop(path, None)
+        # removed under the lock so a concurrent _acquire never sees a file about to vanish
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class IngestedUpload:
+    # .digest is available immediately; .path spools the file on first use.
+    # The spooled file is removed when the last upload object using it is
+    # closed (or garbage collected at the end of the script run).
+
+    def __init__(self, uploaded, suffix="", upload_dir=UPLOAD_DIR, digest=None):
+        if isinstance(uploaded, (str, os.PathLike)):
+            self._init_file(os.fspath(uploaded), suffix, upload_dir, digest)
+            return
+        self._buf = _buffer(uploaded)
+        self.size = self._buf.nbytes
+        self.suffix = suffix or os.path.splitext(getattr(uploaded, "name", ""))[1]
+        self.upload_dir = upload_dir
+        if digest is None:
+            h = hashlib.sha256()
+            for i in range(0, self.size, CHUNK_SIZE):
+                h.update(self._buf[i:i + CHUNK_SIZE])
+            digest = h.hexdigest()
+        self.digest = digest
+        self._path = None
+        self._finalizer = None
+
+    def _init_file(self, source, suffix, upload_dir, digest=None):
+        # A file already on disk (a trimmed clip, a finished resumable upload):
+        # linked into the spool under its content hash, not copied. Callers
+        # that already know the file's digest pass it to skip re-hashing.
+        self._buf = None
+        self.size = os.path.getsize(source)
+        self.suffix = suffix or os.path.splitext(source)[1]
+        self.upload_dir = upload_dir
+        if digest is None:
+            h = hashlib.sha256()
+            with open(source, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+        self.digest = digest
+        path = os.path.join(upload_dir, self.digest + self.suffix)
+        _acquire(path)
+        self._finalizer = weakref.finalize(self, _release, path)
+        os.makedirs(upload_dir, exist_ok=True)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copyfile(source, path)
+        self._path = path
+
+    @property
+    def path(self):
+        if self._path is None:
+            path = os.path.join(self.upload_dir, self.digest + self.suffix)
+            # take the reference before spooling so the file can't be released under us
+            _acquire(path)
+            self._finalizer = weakref.finalize(self, _release, path)
+            self._spool(path)
+            self._path = path
+        return self._path
+
+    def _spool(self, path):
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # same content already spooled by another run/session; keep it off the reaper
+                return
+            except OSError:
+                pass  # reaped in the meantime
+        check_quota(self.size)  # raises workspace.QuotaExceeded
+        os.makedirs(self.upload_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.upload_dir, prefix=".part-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for i in range(0, self.size, CHUNK_SIZE):
+                    f.write(self._buf[i:i + CHUNK_SIZE])
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def hold(self):
+        # Extra reference to the spooled file for work that outlives this object
+        # (e.g. a background job); call the returned function once to release it
+        path = self.path
+        _acquire(path)
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                _release(path)
+        return release
+
+    def read_at(self, offset, size):
+        # Up to `size` bytes from `offset`, without spooling (for header probes)
+        if self._buf is not None:
+            return bytes(self._buf[offset:offset + size])
+        with open(self._path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def mmap(self):
+        # Read-only memory map of the spooled file
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        if self._buf is not None:
+            self._buf.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ingest(uploaded, suffix="", digest=None):
+    # `uploaded`: a Streamlit UploadedFile / BytesIO / bytes, or the path of a
+    # file on disk (with its sha256 `digest` if the caller already knows it)
+    return IngestedUpload(uploaded, suffix=suffix, digest=digest)
+
+
+def session_ingest(state, uploaded, suffix="", key="_upload_digests"):
+    # ingest() for a Streamlit UploadedFile, hashed once per session (pass
+    # st.session_state): the digest is kept under the upload's file_id, so the
+    # reruns while a job is polled don't hash the whole file again
+    digests = state.setdefault(key, {})
+    file_id = getattr(uploaded, "file_id", None)
+    upload = ingest(uploaded, suffix=suffix, digest=digests.get(file_id))
+    if file_id is not None:
+        digests[file_id] = upload.digest
+    return upload
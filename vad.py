@@ -0,0 +1,112 @@
+# vad.py
+# Energy + zero-crossing voice activity detection over the PCM buffer, done
+# with NumPy strides in one pass. Produces speech segments, pauses and pace
+# metrics, and the pause positions that chunked transcription cuts on.
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio_extract import SAMPLE_RATE
+
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+MIN_PAUSE_SECONDS = 0.25   # shorter gaps are treated as part of the speech
+MIN_SPEECH_SECONDS = 0.10  # shorter bursts are treated as noise
+LONG_PAUSE_SECONDS = 1.0
+
+
+def frame_features(pcm, sample_rate=SAMPLE_RATE):
+    # (energy_db, zcr) per hop; energy relative to int16 full scale
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    hop = max(1, int(sample_rate * HOP_SECONDS))
+    if len(pcm) < frame:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    x = pcm.astype(np.float32) / 32768.0
+    frames = sliding_window_view(x, frame)[::hop]
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame - 1)
+    return energy_db.astype(np.float32), zcr.astype(np.float32)
+
+
+def _runs(mask):
+    # [(start, end), ...] of consecutive True values
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(energy_db, zcr):
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    floor = np.percentile(energy_db, 10)
+    voiced = energy_db > max(floor + 10, -50)
+    # quieter, noisy frames (fricatives like "s", "f") still count as speech
+    unvoiced = (energy_db > max(floor + 5, -55)) & (zcr > 0.25)
+    mask = voiced | unvoiced
+
+    # fill short gaps, then drop short bursts
+    min_gap = int(MIN_PAUSE_SECONDS / HOP_SECONDS)
+    starts, ends = _runs(~mask)
+    for s, e in zip(starts, ends):
+        if e - s < min_gap and s > 0 and e < len(mask):
+            mask[s:e] = True
+    min_len = int(MIN_SPEECH_SECONDS / HOP_SECONDS)
+    starts, ends = _runs(mask)
+    for s, e in zip(starts, ends):
+        if e - s < min_len:
+            mask[s:e] = False
+    return mask
+
+
+def detect_speech(pcm, sample_rate=SAMPLE_RATE):
+    # Returns {"duration", "segments": [(start_s, end_s), ...], "pauses": [(start_s, end_s), ...]}
+    duration = len(pcm) / float(sample_rate)
+    energy_db, zcr = frame_features(pcm, sample_rate)
+    mask = speech_mask(energy_db, zcr)
+    starts, ends = _runs(mask)
+    segments = [(s * HOP_SECONDS, min(duration, e * HOP_SECONDS + FRAME_SECONDS))
+                for s, e in zip(starts, ends)]
+    pauses = [(segments[k][1], segments[k + 1][0]) for k in range(len(segments) - 1)
+              if segments[k + 1][0] - segments[k][1] >= MIN_PAUSE_SECONDS]
+    return {"duration": duration, "segments": segments, "pauses": pauses}
+
+
+def pace_metrics(vad, word_count=None):
+    duration = vad["duration"]
+    speech = sum(e - s for s, e in vad["segments"])
+    pauses = [e - s for s, e in vad["pauses"]]
+    metrics = {
+        "duration": duration,
+        "speech_seconds": speech,
+        "speaking_ratio": speech / duration if duration > 0 else 0.0,
+        "pause_count": len(pauses),
+        "long_pause_count": sum(1 for p in pauses if p >= LONG_PAUSE_SECONDS),
+        "mean_pause": float(np.mean(pauses)) if pauses else 0.0,
+        "max_pause": max(pauses) if pauses else 0.0,
+    }
+    if word_count is not None:
+        metrics["speaking_rate"] = word_count / duration * 60 if duration > 0 else 0.0
+        # words per minute of actual speech, pauses excluded
+        metrics["articulation_rate"] = word_count / speech * 60 if speech > 0 else 0.0
+    return metrics
+
+
+def chunk_bounds(vad, sample_rate=SAMPLE_RATE, max_chunk=15.0, min_chunk=1.0):
+    # [(start_sample, end_sample), ...] covering the whole buffer, cut in the
+    # middle of pauses and never longer than max_chunk seconds
+    n = int(round(vad["duration"] * sample_rate))
+    if n == 0:
+        return []
+    cuts = [int((s + e) / 2 * sample_rate) for s, e in vad["pauses"]]
+    max_len = int(max_chunk * sample_rate)
+    min_len = int(min_chunk * sample_rate)
+    chunks = []
+    start = 0
+    for cut in cuts + [n]:
+        while cut - start > max_len:
+            chunks.append((start, start + max_len))
+            start += max_len
+        if cut - start >= min_len or cut == n:
+            if cut > start:
+                chunks.append((start, cut))
+            start = cut
+    return chunks
@@ -0,0 +1,231 @@
+# voice_stream.py
+# Streamed voice feedback: the report is rendered sentence by sentence on a
+# background thread (tts.stream_report) and served over chunked HTTP while it
+# is still being rendered, so the browser starts playing the first sentence as
+# soon as it is ready instead of waiting for the whole report.
+#
+#   stream = start_stream(text)     # returns at once; rendering runs in the background
+#   play(stream)                    # Streamlit: an <audio> element fed from the endpoint
+#   stream.data()                   # the complete clip (e.g. for a download button)
+#
+# Each server process runs its own endpoint (GET /voice/<id>), on HA_VOICE_PORT
+# or any free port. Stream ids are random and unguessable, and a stream is
+# forgotten STREAM_TTL seconds after it finished.
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from audio_extract import AudioExtractError
+from instrumentation import observe, inc
+from tts import SAMPLE_RATE, STREAM_FORMATS, stream_report, to_wav, wav_stream_header
+
+VOICE_PORT = int(os.environ.get("HA_VOICE_PORT", "0"))  # 0: any free port
+VOICE_HOST = os.environ.get("HA_VOICE_HOST", "127.0.0.1")
+VOICE_URL = os.environ.get("HA_VOICE_URL", "")  # public URL of the endpoint, e.g. behind a proxy
+STREAM_FORMAT = os.environ.get("HA_VOICE_FORMAT", "mp3")
+MAX_STREAMS = 64
+STREAM_TTL = 600.0
+CHUNK_TIMEOUT = 60.0  # longest a reader waits for the next sentence
+
+
+class VoiceStream:
+    # One report being rendered. Chunks are appended as sentences finish;
+    # readers follow along from the start with chunks(), and data() is the
+    # complete clip once rendering is done.
+
+    def __init__(self, text, backend=None, sample_rate=SAMPLE_RATE, fmt=STREAM_FORMAT):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Can't stream {fmt}; use one of {', '.join(STREAM_FORMATS)}")
+        self.id = uuid.uuid4().hex
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.error = None
+        self.done = False
+        self.finished = None
+        self._chunks = []
+        self._cond = threading.Condition()
+        self._started = time.perf_counter()
+        threading.Thread(target=self._render, args=(text, backend), daemon=True).start()
+
+    @property
+    def mime(self):
+        return STREAM_FORMATS[self.fmt]
+
+    def _append(self, chunk):
+        with self._cond:
+            if not self._chunks:
+                observe("voice_first_chunk", time.perf_counter() - self._started)
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def _render(self, text, backend):
+        try:
+            try:
+                self._render_as(text, backend, self.fmt)
+            except AudioExtractError:
+                if self._chunks or self.fmt == "wav":
+                    raise
+                self.fmt = "wav"  # no ffmpeg to encode with: stream uncompressed instead
+                self._render_as(text, backend, "wav")
+        except Exception as e:  # TTSError, AudioExtractError, a failing backend
+            self.error = str(e) or type(e).__name__
+            inc("voice_streams_failed")
+        finally:
+            with self._cond:
+                self.done, self.finished = True, time.time()
+                self._cond.notify_all()
+
+    def _render_as(self, text, backend, fmt):
+        for i, _, chunk in stream_report(text, backend, self.sample_rate, fmt):
+            if i == 0 and fmt == "wav":
+                chunk = wav_stream_header(self.sample_rate) + chunk
+            self._append(chunk)
+
+    def wait_first(self, timeout=CHUNK_TIMEOUT):
+        # True once the first chunk is there (the format is then settled)
+        with self._cond:
+            self._cond.wait_for(lambda: self._chunks or self.done, timeout)
+            return bool(self._chunks)
+
+    def chunks(self, timeout=CHUNK_TIMEOUT):
+        # Every chunk from the start, each as soon as it has been rendered
+        i = 0
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: i < len(self._chunks) or self.done, timeout):
+                    return  # renderer stalled; end the stream rather than hang the reader
+                if i >= len(self._chunks):
+                    return
+                chunk = self._chunks[i]
+            yield chunk
+            i += 1
+
+    def data(self, timeout=None):
+        # The complete clip (b"" if rendering failed or hasn't finished within `timeout`)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.done, timeout) or not self._chunks:
+                return b""
+            joined = b"".join(self._chunks)
+        if self.fmt == "wav":
+            # a proper header now that the length is known
+            header = len(wav_stream_header(self.sample_rate))
+            return to_wav(np.frombuffer(joined[header:], dtype=np.int16), self.sample_rate)
+        return joined
+
+
+_streams = OrderedDict()  # id -> VoiceStream, oldest first
+_streams_lock = threading.Lock()
+
+
+def _prune():
+    now = time.time()
+    for stream_id, stream in list(_streams.items()):
+        expired = stream.done and now - stream.finished > STREAM_TTL
+        if expired or len(_streams) > MAX_STREAMS:
+            del _streams[stream_id]
+
+
+def start_stream(text, backend=None, sample_rate=SAMPLE_RATE, fmt=STREAM_FORMAT):
+    stream = VoiceStream(text, backend, sample_rate, fmt)
+    with _streams_lock:
+        _streams[stream.id] = stream
+        _prune()
+    return stream
+
+
+def get_stream(stream_id):
+    with _streams_lock:
+        return _streams.get(stream_id)
+
+
+def serve(port, host=VOICE_HOST):
+    # Voice streams over HTTP, on a daemon thread.
+    #   GET /voice/<id>   -> 200, chunked while the stream is being rendered
+    #                        (Content-Length once it is complete); 404 if unknown
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # chunked transfer encoding
+
+        def _reply(self, code, body=b""):
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            stream = get_stream(parts[1]) if len(parts) == 2 and parts[0] == "voice" else None
+            if stream is None:
+                self._reply(404, b"Unknown voice stream.")
+                return
+            if not stream.wait_first():
+                self._reply(503, (stream.error or "Voice feedback is unavailable.").encode("utf-8"))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", stream.mime)
+            self.send_header("Cache-Control", "no-store")
+            try:
+                if stream.done:
+                    body = stream.data()
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in stream.chunks():
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # player went away (e.g. the page reran)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def voice_server():
+    # Starts the endpoint once per server process; returns its port, or None
+    # if it couldn't be started (the pages then fall back to a rendered clip)
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = serve(VOICE_PORT)
+            except OSError:
+                _server = False  # HA_VOICE_PORT already taken by another server process
+        return _server.server_address[1] if _server else None
+
+
+def play(stream, height=64):
+    # Streamlit helper: an <audio> element that plays `stream` from the
+    # endpoint as it arrives. Without HA_VOICE_URL the endpoint is reached on
+    # the host name the browser used for the page.
+    import streamlit.components.v1 as components
+    port = voice_server()
+    path = f"/voice/{stream.id}"
+    components.html(f"""
+<audio id="voice" controls autoplay preload="auto" style="width:100%"></audio>
+<script>
+  let host = "localhost";
+  try {{ host = window.parent.location.hostname || host; }} catch (e) {{}}
+  const base = {json.dumps(VOICE_URL.rstrip("/"))} || `http://${{host}}:{port}`;
+  const audio = document.getElementById("voice");
+  audio.src = base + {json.dumps(path)};
+  audio.play().catch(() => {{}});  // autoplay may be blocked; the controls still work
+</script>
+""", height=height)
@@ -0,0 +1,251 @@
+# workspace.py
+# Per-session scratch space on a shared server.
+#
+# Every Streamlit session gets its own directory under WORK_ROOT for files it
+# writes (scored CSVs, exports, ...), so concurrent sessions never share a
+# path. Directories are reference-counted like spooled uploads: the session
+# holds one reference (dropped when its session_state is garbage collected),
+# background jobs take extra ones with hold(), and the directory is removed
+# when the last one goes. Writers reserve() space first, which enforces a
+# per-session and a server-wide quota (shared with directories registered via
+# watch(), e.g. the upload spool). A reaper thread periodically deletes what
+# crashed or abandoned sessions left behind.
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+import resources
+from instrumentation import inc
+
+WORK_ROOT = os.environ.get("HA_WORK_DIR", os.path.join(tempfile.gettempdir(), "human_analytics_work"))
+SESSION_QUOTA = int(os.environ.get("HA_SESSION_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+TOTAL_QUOTA = int(os.environ.get("HA_WORK_QUOTA_BYTES", str(10 * 1024 * 1024 * 1024)))
+MAX_IDLE = float(os.environ.get("HA_WORK_MAX_IDLE", str(2 * 3600)))  # seconds untouched before reaping
+REAP_INTERVAL = 300
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+_refs = {}     # workspace dir -> number of live references in this process
+_watched = {}  # directory -> in_use(path) for other scratch areas sharing the quota
+_lock = threading.Lock()
+
+
+def _acquire(path):
+    with _lock:
+        _refs[path] = _refs.get(path, 0) + 1
+
+
+def _release(path):
+    with _lock:
+        n = _refs.get(path, 0) - 1
+        if n > 0:
+            _refs[path] = n
+            return
+        _refs.pop(path, None)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _disk_usage(path):
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _disk_usage(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass  # removed while we were looking
+    return total
+
+
+class Workspace:
+    # A private scratch directory. path(name) gives a file path inside it;
+    # reserve(nbytes) before writing anything large.
+
+    def __init__(self, root=WORK_ROOT, quota=SESSION_QUOTA):
+        os.makedirs(root, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix="ws-", dir=root)
+        self.quota = quota
+        _acquire(self.dir)
+        self._finalizer = weakref.finalize(self, _release, self.dir)
+        start_reaper()
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def touch(self):
+        # Heartbeat for the reaper (other server processes sharing WORK_ROOT
+        # only see the directory's mtime)
+        try:
+            os.utime(self.dir)
+        except OSError:
+            pass
+
+    def path(self, name):
+        self.touch()
+        return os.path.join(self.dir, os.path.basename(name))
+
+    def usage(self):
+        return _disk_usage(self.dir)
+
+    def reserve(self, nbytes):
+        # Raises QuotaExceeded if writing nbytes more would go over this
+        # session's quota or the server-wide one
+        if self.usage() + nbytes > self.quota:
+            raise QuotaExceeded(f"Session scratch space is full ({self.quota // (1024 * 1024)} MB limit).")
+        check_quota(nbytes)
+
+    def hold(self):
+        # Extra reference for work that outlives the session's script run
+        # (e.g. a background job); call the returned function once to release it
+        path = self.dir  # not self: a pending job must not keep the session's object alive
+        _acquire(path)
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                _release(path)
+        return release
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def session_workspace(state, key="_workspace"):
+    # The workspace of a Streamlit session (pass st.session_state); it is
+    # released when the session's state is dropped
+    ws = state.get(key)
+    # also replaced if another server process reaped it after a long idle spell
+    if ws is None or ws.closed or not os.path.isdir(ws.dir):
+        ws = state[key] = Workspace()
+    ws.touch()
+    return ws
+
+
+def watch(directory, in_use=None):
+    # Count `directory` towards TOTAL_QUOTA and let the reaper delete its
+    # stale files; in_use(path) -> True protects files this process still uses
+    with _lock:
+        _watched[directory] = in_use or (lambda path: False)
+    start_reaper()
+
+
+def total_usage():
+    with _lock:
+        dirs = [WORK_ROOT] + list(_watched)
+    # a directory inside another one is already counted with it
+    dirs = [d for d in dirs if not any(d.startswith(o + os.sep) for o in dirs)]
+    return sum(_disk_usage(d) for d in dirs)
+
+
+def check_quota(nbytes):
+    # Server-wide check; reaps abandoned files once before giving up
+    if total_usage() + nbytes <= TOTAL_QUOTA:
+        return
+    reap()
+    if total_usage() + nbytes > TOTAL_QUOTA:
+        raise QuotaExceeded("The server is out of scratch space — please try again in a few minutes.")
+
+
+def _stale(path, cutoff):
+    try:
+        return os.stat(path).st_mtime < cutoff
+    except OSError:
+        return False
+
+
+def reap(max_idle=MAX_IDLE):
+    # Delete workspaces and watched files untouched for max_idle seconds that
+    # this process doesn't hold. Returns the number of bytes freed.
+    cutoff = time.time() - max_idle
+    freed = 0
+    with _lock:
+        held = set(_refs)
+        watched = list(_watched.items())
+    try:
+        entries = list(os.scandir(WORK_ROOT))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if entry.path in held or not _stale(entry.path, cutoff):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                size = _disk_usage(entry.path)
+                shutil.rmtree(entry.path)
+            else:
+                size = entry.stat(follow_symlinks=False).st_size
+                os.remove(entry.path)
+        except OSError:
+            continue
+        freed += size
+    for directory, in_use in watched:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False) or in_use(entry.path) or not _stale(entry.path, cutoff):
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            freed += size
+    if freed:
+        inc("scratch_bytes_reaped", freed)
+    return freed
+
+
+# ---------- background reaper ----------
+_reaper = None
+_stop = threading.Event()
+
+
+def _reap_loop(interval):
+    while not _stop.wait(interval):
+        try:
+            reap()
+        except OSError:
+            pass
+
+
+def start_reaper(interval=REAP_INTERVAL):
+    # One reaper thread per server process; job worker processes don't run one
+    global _reaper
+    with _lock:
+        if _reaper is not None or multiprocessing.parent_process() is not None:
+            return
+        _reaper = threading.Thread(target=_reap_loop, args=(interval,), daemon=True, name="workspace-reaper")
+        _reaper.start()
+
+
+@resources.on_teardown
+def _shutdown():
+    # Stop the reaper and remove this process's workspaces
+    _stop.set()
+    with _lock:
+        dirs = list(_refs)
+        _refs.clear()
+    for d in dirs:
+        shutil.rmtree(d, ignore_errors=True)